@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+"""Benchmarks for the hot paths, run against a synthetic library.
+
+Run with "./setup.py benchmark" or "python -m benchmarks". The results
+are written as JSON so they can be compared between versions.
+"""
+
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+
+import quodlibet
+
+# before anything imports Gtk, like tests.init_test_environ() does
+quodlibet.init_cli(no_translations=True)
+
+from quodlibet import const
+
+from .songs import generate_songs
+from .cases import CASES
+
+
+def run(size=10000, names=None, repeat=3, seed=0, output=sys.stdout):
+    """Runs the benchmarks and returns a dict with the results.
+
+    names -- the benchmarks to run, all if None
+    """
+
+    cases = [c for c in CASES if names is None or c.__name__ in names]
+    if names is not None:
+        unknown = set(names) - set(c.__name__ for c in cases)
+        if unknown:
+            raise ValueError("Unknown benchmarks: %s" % ", ".join(unknown))
+
+    start = time.time()
+    songs = generate_songs(size, seed)
+    output.write("Generated %d songs in %.2fs\n" % (
+        size, time.time() - start))
+
+    results = {}
+    temp = tempfile.mkdtemp(prefix="QL-BENCH-")
+    try:
+        for case in cases:
+            timed = case(songs, temp)
+            runs = []
+            for i in range(repeat):
+                start = time.time()
+                timed()
+                runs.append(time.time() - start)
+            results[case.__name__] = {
+                "min": min(runs),
+                "mean": sum(runs) / len(runs),
+                "runs": runs,
+            }
+            output.write("%-20s %8.3fs\n" % (case.__name__, min(runs)))
+    finally:
+        shutil.rmtree(temp)
+
+    return {
+        "version": const.VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "size": size,
+        "seed": seed,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="benchmarks")
+    parser.add_argument("names", nargs="*",
+                        help="benchmarks to run (default all)")
+    parser.add_argument("-s", "--size", type=int, default=10000,
+                        help="number of songs in the library")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="how often each benchmark is run")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed for generating the library")
+    parser.add_argument("-o", "--output",
+                        help="file to write the JSON results to")
+    parser.add_argument("-l", "--list", action="store_true",
+                        help="list all benchmarks")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for case in CASES:
+            print(case.__name__)
+        return 0
+
+    try:
+        result = run(args.size, args.names or None, args.repeat, args.seed,
+                     output=sys.stderr)
+    except ValueError as e:
+        parser.error(str(e))
+
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as h:
+            h.write(text + "\n")
+    else:
+        print(text)
+    return 0
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+import sys
+
+from benchmarks import main
+
+
+sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+"""The benchmarks.
+
+Each one gets passed the songs and a temporary directory, does its setup
+and returns a function which gets timed.
+"""
+
+import os
+import itertools
+
+from quodlibet.query import Query
+from quodlibet.formats import AudioFile
+from quodlibet.pattern import Pattern
+from quodlibet.pattern._pattern import result_cache
+from quodlibet.library.libraries import SongLibrary, SongFileLibrary
+from quodlibet.util.collection import Album
+
+
+CASES = []
+
+
+def case(func):
+    CASES.append(func)
+    return func
+
+
+QUERIES = [
+    u"love",
+    u"dream fire",
+    u"artist=\"Gold Road\"",
+    u"album=/^the/",
+    u"|(genre=jazz, genre=blues)",
+    u"&(genre=rock, !artist=night)",
+    u"#(playcount > 3)",
+    u"#(lastplayed < 1 month)",
+    u"&(#(rating >= 0.8), #(length > 3 minutes))",
+    u"&(#(date < 1980), |(love, heart))",
+    u"~people=straße",
+    u"~filename=/summer.*ogg/",
+]
+
+PATTERNS = [
+    u"<artist> - <title>",
+    u"<tracknumber|<tracknumber>. ><title~version>",
+    u"<albumartist|<albumartist>|<artist>>/<album>/<~filename>",
+    u"<~#rating> <~#playcount> <~length>",
+    u"[b]<title>[/b]<album|\n<album><discnumber| - Disc <discnumber>>>",
+]
+
+SORT_TAGS = ["artist", "~people", "title", "~#playcount", "date"]
+
+ALBUM_KEYS = [
+    "~#length", "~#rating", "~#playcount", "~#added", "~#tracks",
+    "~people", "genre", "~length", "date",
+]
+
+
+@case
+def query_parse(songs, temp):
+    def run():
+        for text in QUERIES:
+            Query(text)
+    return run
+
+
+@case
+def query_search(songs, temp):
+    queries = [Query(text) for text in QUERIES]
+
+    def run():
+        for query in queries:
+            search = query.search
+            for song in songs:
+                search(song)
+    return run
+
+
+@case
+def query_filter_index(songs, temp):
+    library = SongLibrary()
+    library.add(songs)
+    library.enable_tag_index()
+    queries = [Query(text) for text in QUERIES]
+    # index everything used once, so only the lookups get timed
+    for query in queries:
+        query.filter(library)
+
+    def run():
+        for query in queries:
+            query.filter(library)
+    return run
+
+
+@case
+def pattern_format(songs, temp):
+    patterns = [Pattern(text) for text in PATTERNS]
+
+    def run():
+        # only time the formatting, not the lookup of cached results
+        result_cache.clear()
+        for pattern in patterns:
+            format_ = pattern.format
+            for song in songs:
+                format_(song)
+    return run
+
+
+@case
+def pattern_cached(songs, temp):
+    patterns = [Pattern(text) for text in PATTERNS]
+    for pattern in patterns:
+        for song in songs:
+            pattern.format(song)
+
+    def run():
+        for pattern in patterns:
+            format_ = pattern.format
+            for song in songs:
+                format_(song)
+    return run
+
+
+@case
+def library_sort(songs, temp):
+    library = SongLibrary()
+    library.add(songs)
+    funcs = [lambda s: s.sort_key]
+    funcs.extend(AudioFile.sort_by_func(tag) for tag in SORT_TAGS)
+    names = [""] + SORT_TAGS
+    # fill the sort key cache once, so only sorting gets timed
+    for name, func in zip(names, funcs):
+        sorted(songs, key=library.sort_keys.get_func(name, func))
+
+    def run():
+        for name, func in zip(names, funcs):
+            sorted(songs, key=library.sort_keys.get_func(name, func))
+    return run
+
+
+@case
+def album_aggregate(songs, temp):
+    def run():
+        albums = {}
+        for song in songs:
+            key = song.album_key
+            if key not in albums:
+                albums[key] = Album(song)
+            albums[key].songs.add(song)
+        for album in albums.values():
+            album.finalize()
+            for key in ALBUM_KEYS:
+                album(key)
+    return run
+
+
+@case
+def album_library_load(songs, temp):
+    library = SongLibrary()
+    library.add(songs)
+
+    def run():
+        library.albums.load()
+        library.albums.destroy()
+        del library.albums
+    return run
+
+
+@case
+def library_save(songs, temp):
+    library = SongFileLibrary()
+    library._load_init(songs)
+    counter = itertools.count()
+
+    def run():
+        library.save(os.path.join(temp, "save-%d" % next(counter)))
+    return run
+
+
+@case
+def library_load(songs, temp):
+    filename = os.path.join(temp, "load")
+    library = SongFileLibrary()
+    library._load_init(songs)
+    library.save(filename)
+    library.destroy()
+
+    def run():
+        library = SongFileLibrary()
+        library.load(filename)
+        library.destroy()
+    return run
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+"""Synthetic libraries with tag distributions similar to real ones"""
+
+import random
+
+from senf import fsnative
+
+from quodlibet.formats import AudioFile
+
+
+WORDS = [
+    u"love", u"night", u"heart", u"time", u"world", u"life", u"light",
+    u"dream", u"fire", u"rain", u"blue", u"black", u"sun", u"road", u"home",
+    u"river", u"girl", u"boy", u"summer", u"winter", u"city", u"dance",
+    u"song", u"star", u"moon", u"sky", u"king", u"queen", u"ghost", u"gold",
+    u"wild", u"lost", u"last", u"first", u"silver", u"ocean", u"stone",
+    u"Björk", u"Straße", u"café", u"Ñandú", u"Zoë", u"東京", u"Москва",
+]
+"""Words to build names from, some of them non-ASCII"""
+
+GENRES = [
+    u"Rock", u"Pop", u"Electronic", u"Jazz", u"Classical", u"Hip-Hop",
+    u"Metal", u"Folk", u"Soundtrack", u"Blues", u"Reggae", u"Punk",
+    u"Country", u"Soul", u"Ambient", u"Indie", u"Latin", u"World",
+]
+
+
+def _name(rand, min_words, max_words):
+    count = rand.randint(min_words, max_words)
+    return u" ".join(rand.choice(WORDS) for i in range(count)).title()
+
+
+def _zipf_choice(rand, items):
+    # a few items are a lot more common than the rest
+    index = int(len(items) ** rand.random()) - 1
+    return items[index]
+
+
+def generate_songs(count, seed=0):
+    """Returns a list of count AudioFiles grouped into albums.
+
+    The same seed always results in the same songs.
+    """
+
+    rand = random.Random(seed)
+    now = 1500000000
+
+    artists = [_name(rand, 1, 3) for i in range(max(1, count // 60))]
+    genres = list(GENRES)
+    rand.shuffle(genres)
+
+    songs = []
+    album_index = 0
+    while len(songs) < count:
+        album_index += 1
+        artist = _zipf_choice(rand, artists)
+        album = _name(rand, 1, 4)
+        year = rand.randint(1955, 2017)
+        genre = _zipf_choice(rand, genres)
+        total = rand.randint(6, 16)
+        added = now - rand.randint(0, 3600 * 24 * 365 * 8)
+        various = rand.random() < 0.05
+
+        for track in range(1, total + 1):
+            if len(songs) >= count:
+                break
+
+            title = _name(rand, 1, 5)
+            filename = u"/music/%s/%s/%02d - %s.ogg" % (
+                artist, album, track, title)
+            song = AudioFile({
+                "~filename": fsnative(filename),
+                "~mountpoint": fsnative(u"/"),
+                "title": title,
+                "album": album,
+                "artist": _zipf_choice(rand, artists) if various else artist,
+                "albumartist": u"Various Artists" if various else artist,
+                "genre": genre,
+                "date": u"%d" % year,
+                "tracknumber": u"%d/%d" % (track, total),
+                "~#length": rand.randint(90, 480),
+                "~#bitrate": rand.choice([128, 192, 256, 320]),
+                "~#filesize": rand.randint(2, 15) * 1024 ** 2,
+                "~#added": added,
+                "~#mtime": added,
+            })
+            song["~#playcount"] = playcount = int(rand.expovariate(0.3))
+            if playcount:
+                song["~#lastplayed"] = now - rand.randint(0, 3600 * 24 * 400)
+            if rand.random() < 0.15:
+                song["~#rating"] = rand.choice([0.2, 0.4, 0.6, 0.8, 1.0])
+            if rand.random() < 0.1:
+                song["composer"] = _zipf_choice(rand, artists)
+            if rand.random() < 0.05:
+                song["performer"] = u"\n".join(
+                    _zipf_choice(rand, artists) for i in range(2))
+            if rand.random() < 0.2:
+                song["discnumber"] = u"1/%d" % rand.randint(1, 2)
+            if rand.random() < 0.1:
+                song["musicbrainz_albumid"] = u"%032x" % album_index
+            songs.append(song)
+
+    return songs
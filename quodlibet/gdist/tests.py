@@ -92,6 +92,38 @@ class quality_cmd(Command):
             raise SystemExit(status)
 
 
+class benchmark_cmd(Command):
+    description = "run benchmarks against a synthetic library"
+    user_options = [
+        ("to-run=", None, "list of benchmarks to run (default all)"),
+        ("size=", "s", "number of songs in the library (default 10000)"),
+        ("repeat=", "r", "how often each benchmark is run (default 3)"),
+        ("output=", "o", "file to write the JSON results to"),
+    ]
+
+    def initialize_options(self):
+        self.to_run = []
+        self.size = 10000
+        self.repeat = 3
+        self.output = None
+
+    def finalize_options(self):
+        if self.to_run:
+            self.to_run = self.to_run.split(",")
+        self.size = int(self.size)
+        self.repeat = int(self.repeat)
+
+    def run(self):
+        import benchmarks
+
+        args = ["--size", str(self.size), "--repeat", str(self.repeat)]
+        if self.output:
+            args.extend(["--output", self.output])
+        status = benchmarks.main(args + self.to_run)
+        if status != 0:
+            raise SystemExit(status)
+
+
 sdist = get_dist_class("sdist")
 
 
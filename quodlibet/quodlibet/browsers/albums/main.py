@@ -38,12 +38,12 @@ from quodlibet.qltk.x import SymbolicIconImage
 from quodlibet.qltk.searchbar import SearchBarBox
 from quodlibet.qltk.menubutton import MenuButton
 from quodlibet.qltk import Icons
-from quodlibet.util import copool, connect_destroy
-from quodlibet.util.library import background_filter
+from quodlibet.util import connect_destroy
+from quodlibet.util.library import background_filter, get_query
 from quodlibet.util import connect_obj, DeferredSignal, gdecode
 from quodlibet.qltk.cover import get_no_cover_pixbuf
 from quodlibet.qltk.image import add_border_widget, get_surface_for_pixbuf
-from quodlibet.compat import cmp
+from quodlibet.compat import cmp, itervalues
 
 
 def get_cover_size():
@@ -246,7 +246,8 @@ class VisibleUpdate(object):
         connect_destroy(
             sw.get_vadjustment(), "value-changed", self.__stop_update, view)
 
-        self.__pending_paths = []
+        # row value -> request returned by _update_row()
+        self.__requests = {}
         self.__update_deferred = DeferredSignal(
             self.__update_visible_rows, timeout=50, priority=GLib.PRIORITY_LOW)
         self.__column = column
@@ -254,30 +255,35 @@ class VisibleUpdate(object):
 
     def disable_row_update(self):
         if self.__update_deferred:
-            self.__update_deferred.abort
+            self.__update_deferred.abort()
             self.__update_deferred = None
 
-        if self.__pending_paths:
-            copool.remove(self.__scan_paths)
+        self.__cancel_requests(self.__requests)
 
         self.__column = None
-        self.__pending_paths = []
+        self.__requests = {}
 
     def _row_needs_update(self, model, iter_):
         """Should return True if the rows should be updated"""
 
         raise NotImplementedError
 
-    def _update_row(self, model, iter_):
-        """Do whatever is needed to update the row."""
+    def _update_row(self, model, iter_, priority):
+        """Do whatever is needed to update the row. Rows closer to the
+        center of the visible area get a lower priority value.
+
+        Can return a request, like a CoverRequest, which gets cancelled
+        once the row isn't visible anymore.
+        """
 
         raise NotImplementedError
 
+    def __cancel_requests(self, requests):
+        for request in itervalues(requests):
+            request.cancel()
+
     def __stop_update(self, adj, view):
-        if self.__pending_paths:
-            copool.remove(self.__scan_paths)
-            self.__pending_paths = []
-            self.__update_visibility(view)
+        self.__update_visibility(view)
 
     def __update_visibility(self, view, *args):
         if not self.__column.get_visible():
@@ -287,21 +293,9 @@ class VisibleUpdate(object):
         if self.__first_expose:
             self.__first_expose = False
             self.__update_visible_rows(view, 0)
-            for i in self.__scan_paths():
-                pass
 
         self.__update_deferred(view, self.PRELOAD_COUNT)
 
-    def __scan_paths(self):
-        while self.__pending_paths:
-            model, path = self.__pending_paths.pop()
-            try:
-                iter_ = model.get_iter(path)
-            except ValueError:
-                continue
-            self._update_row(model, iter_)
-            yield True
-
     def __update_visible_rows(self, view, preload):
         vrange = view.get_visible_range()
         if vrange is None:
@@ -331,22 +325,32 @@ class VisibleUpdate(object):
                 vlist_new.append(top.pop())
             if bottom:
                 vlist_new.append(bottom.pop())
-        vlist_new = filter(lambda s: s >= 0, vlist_new)
 
-        vlist_new = map(Gtk.TreePath, vlist_new)
+        # the middle rows end up last, give them the lowest priority values
+        vlist_new = [Gtk.TreePath(i) for i in reversed(vlist_new) if i >= 0]
 
-        visible_paths = []
-        for path in vlist_new:
+        old_requests = self.__requests
+        requests = {}
+        for priority, path in enumerate(vlist_new):
             try:
                 iter_ = model.get_iter(path)
             except ValueError:
                 continue
-            if self._row_needs_update(model, iter_):
-                visible_paths.append((model, path))
+            value = model.get_value(iter_)
+            request = old_requests.pop(value, None)
+            if request is not None and not request.done and \
+                    not request.is_cancelled():
+                request.set_priority(priority)
+            elif self._row_needs_update(model, iter_):
+                request = self._update_row(model, iter_, priority)
+            else:
+                continue
+            if request is not None:
+                requests[value] = request
 
-        if not self.__pending_paths and visible_paths:
-            copool.add(self.__scan_paths)
-        self.__pending_paths = visible_paths
+        # the rest isn't visible anymore
+        self.__cancel_requests(old_requests)
+        self.__requests = requests
 
 
 class AlbumList(Browser, util.InstanceTracker, VisibleUpdate,
@@ -557,7 +561,7 @@ class AlbumList(Browser, util.InstanceTracker, VisibleUpdate,
         item = model.get_value(iter_)
         return item.album is not None and not item.scanned
 
-    def _update_row(self, filter_model, iter_):
+    def _update_row(self, filter_model, iter_, priority):
         sort_model = filter_model.get_model()
         model = sort_model.get_model()
         iter_ = filter_model.convert_iter_to_child_iter(iter_)
@@ -571,9 +575,10 @@ class AlbumList(Browser, util.InstanceTracker, VisibleUpdate,
 
         item = model.get_value(iter_)
         scale_factor = self.get_scale_factor()
-        item.scan_cover(scale_factor=scale_factor,
-                        callback=callback,
-                        cancel=self._cover_cancel)
+        return item.scan_cover(scale_factor=scale_factor,
+                               callback=callback,
+                               cancel=self._cover_cancel,
+                               priority=priority)
 
     def __destroy(self, browser):
         self._cover_cancel.cancel()
@@ -590,7 +595,7 @@ class AlbumList(Browser, util.InstanceTracker, VisibleUpdate,
 
         self.__filter = None
         if not Query.match_all(text):
-            self.__filter = Query(text, star=["~people", "album"]).search
+            self.__filter = get_query(text, star=["~people", "album"]).search
         self.__bg_filter = background_filter()
 
         self.__inhibit()
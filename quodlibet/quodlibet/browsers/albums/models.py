@@ -16,6 +16,7 @@ class AlbumItem(object):
 
     cover = None
     scanned = False
+    __scan_id = None
 
     def __init__(self, album):
         self.album = album
@@ -28,19 +29,34 @@ class AlbumItem(object):
         return size
 
     def scan_cover(self, force=False, scale_factor=1,
-            callback=None, cancel=None):
+                   callback=None, cancel=None, priority=0):
+        """Loads the cover in a worker thread and calls callback once it
+        is set. Returns the CoverRequest or None.
+
+        If the request gets cancelled the item counts as not scanned again.
+        """
+
         if (self.scanned and not force) or not self.album or \
                 not self.album.songs:
             return
         self.scanned = True
+        # only the latest request decides
+        self.__scan_id = scan_id = object()
 
         def set_cover_cb(pixbuf):
+            if self.__scan_id is not scan_id or \
+                    (cancel is not None and cancel.is_cancelled()):
+                return
             self.cover = pixbuf
             callback()
 
+        def cancelled_cb():
+            if self.__scan_id is scan_id:
+                self.scanned = False
+
         s = self.COVER_SIZE * scale_factor
-        app.cover_manager.get_pixbuf_many_async(
-            self.album.songs, s, s, cancel, set_cover_cb)
+        return app.cover_manager.load_pixbuf_many(
+            self.album.songs, s, s, set_cover_cb, priority, cancelled_cb)
 
     def __repr__(self):
         return repr(self.album)
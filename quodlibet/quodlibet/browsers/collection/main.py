@@ -24,7 +24,7 @@ from quodlibet.qltk import Icons
 from quodlibet.qltk.image import add_border_widget, get_surface_for_pixbuf
 from quodlibet.qltk.x import ScrolledWindow, Align, SymbolicIconImage
 from quodlibet.util import connect_obj
-from quodlibet.util.library import background_filter
+from quodlibet.util.library import background_filter, get_query
 
 from .models import (CollectionTreeStore, CollectionSortModel,
     CollectionFilterModel, MultiNode, UnknownNode, AlbumNode)
@@ -189,7 +189,8 @@ class CollectionBrowser(Browser, util.InstanceTracker):
                 return item.cover
 
             scale_factor = self.get_scale_factor()
-            item.scan_cover(scale_factor=scale_factor)
+            item.scan_cover(scale_factor=scale_factor,
+                            callback=view.queue_draw)
             return item.cover
 
         def cell_data_pb(column, cell, model, iter_, data):
@@ -286,7 +287,7 @@ class CollectionBrowser(Browser, util.InstanceTracker):
         self.__filter = None
         if not Query.match_all(text):
             tags = self.__model.tags + ["album"]
-            self.__filter = Query(text, star=tags).search
+            self.__filter = get_query(text, star=tags).search
         self.__bg_filter = background_filter()
 
         self.view.get_model().refilter()
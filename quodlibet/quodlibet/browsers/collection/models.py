@@ -28,6 +28,8 @@ COUNT_PATTERN = " <span size='small' color='#777'>(%s)</span>"
 
 class AlbumNode(object):
 
+    cover = None
+
     def __init__(self, album):
         self.album = album
         self.scanned = False
@@ -39,14 +41,27 @@ class AlbumNode(object):
             size = 48
         return size
 
-    def scan_cover(self, scale_factor=1):
+    def scan_cover(self, scale_factor=1, callback=None):
+        """Loads the cover in a worker thread and calls callback once it
+        is set. Returns the CoverRequest or None.
+        """
+
         if self.scanned or not self.album.songs:
             return
         self.scanned = True
 
+        def set_cover_cb(pixbuf):
+            self.cover = pixbuf
+            if callback is not None:
+                callback()
+
+        def cancelled_cb():
+            self.scanned = False
+
         from quodlibet import app
         s = self.COVER_SIZE * scale_factor * 0.5
-        self.cover = app.cover_manager.get_pixbuf_many(self.album.songs, s, s)
+        return app.cover_manager.load_pixbuf_many(
+            self.album.songs, s, s, set_cover_cb, cancelled=cancelled_cb)
 
 
 UnknownNode = object()
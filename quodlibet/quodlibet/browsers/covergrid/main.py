@@ -39,7 +39,7 @@ from quodlibet.qltk.searchbar import SearchBarBox
 from quodlibet.qltk.menubutton import MenuButton
 from quodlibet.qltk import Icons
 from quodlibet.util import connect_destroy
-from quodlibet.util.library import background_filter
+from quodlibet.util.library import background_filter, get_query
 from quodlibet.util import connect_obj
 from quodlibet.qltk.cover import get_no_cover_pixbuf
 from quodlibet.qltk.image import add_border_widget, get_surface_for_pixbuf
@@ -364,7 +364,7 @@ class CoverGrid(Browser, util.InstanceTracker, VisibleUpdate,
         item = model.get_value(iter_)
         return item.album is not None and not item.scanned
 
-    def _update_row(self, filter_model, iter_):
+    def _update_row(self, filter_model, iter_, priority):
         sort_model = filter_model.get_model()
         model = sort_model.get_model()
         iter_ = filter_model.convert_iter_to_child_iter(iter_)
@@ -381,9 +381,10 @@ class CoverGrid(Browser, util.InstanceTracker, VisibleUpdate,
 
         item = model.get_value(iter_)
         scale_factor = self.get_scale_factor() * mag
-        item.scan_cover(scale_factor=scale_factor,
-                        callback=callback,
-                        cancel=self._cover_cancel)
+        return item.scan_cover(scale_factor=scale_factor,
+                               callback=callback,
+                               cancel=self._cover_cancel,
+                               priority=priority)
 
     def __destroy(self, browser):
         self._cover_cancel.cancel()
@@ -400,7 +401,7 @@ class CoverGrid(Browser, util.InstanceTracker, VisibleUpdate,
 
         self.__filter = None
         if not Query.match_all(text):
-            self.__filter = Query(text, star=["~people", "album"]).search
+            self.__filter = get_query(text, star=["~people", "album"]).search
         self.__bg_filter = background_filter()
 
         self.__inhibit()
@@ -22,7 +22,7 @@ from quodlibet.qltk.songlist import SongList
 from quodlibet.qltk.completion import LibraryTagCompletion
 from quodlibet.qltk.searchbar import SearchBarBox
 from quodlibet.qltk.x import ScrolledWindow, Align
-from quodlibet.util.library import background_filter
+from quodlibet.util.library import background_filter, get_query
 from quodlibet.util import connect_destroy
 from quodlibet.qltk.paned import ConfigMultiRHPaned
 
@@ -184,7 +184,7 @@ class PanedBrowser(Browser, util.InstanceTracker):
         if Query.is_parsable(text):
             star = dict.fromkeys(SongList.star)
             star.update(self.__star)
-            self._filter = Query(text, star.keys()).search
+            self._filter = get_query(text, star.keys()).search
             songs = filter(self._filter, self._library)
             bg = background_filter()
             if bg:
@@ -113,13 +113,33 @@ class AllEntry(BaseEntry):
         return "<%s>" % (type(self).__name__,)
 
 
-class PaneModel(ObjectStore):
+def _human_sort_key(text, has_markup, reg=re.compile('<.*?>')):
+    # remove the markup so it doesn't affect the sort order
+    if has_markup:
+        text = reg.sub("", text)
+    return util.human_sort_key(text)
+
+
+class PaneIndex(object):
+    """Maps the keys of a pane to the songs having them.
+
+    Songs get added once the pane gets filled with them and removed
+    through remove_songs(), so filling the pane again with a subset of
+    them doesn't need to look at every song.
+    """
 
     def __init__(self, pattern_config):
-        super(PaneModel, self).__init__()
-        self.__sort_cache = {} # text to sort text cache
-        self.__key_cache = {} # song to key cache
         self.config = pattern_config
+        self.__key_cache = {}  # song to key cache
+        self.__songs = set()
+        self.__unknown = set()
+        self.__groups = {}  # key to set of songs
+        self.__sort_texts = {}  # key to text used for sorting
+        self.__sort_keys = {}  # key to sort key
+        self.__order = None  # keys sorted by sort key
+
+    def __len__(self):
+        return len(self.__songs)
 
     def get_format_keys(self, song):
         try:
@@ -130,16 +150,140 @@ class PaneModel(ObjectStore):
                 lambda v: v[0], self.config.format(song))
             return self.__key_cache[song]
 
-    def __human_sort_key(self, text, reg=re.compile('<.*?>')):
+    def add_songs(self, songs):
+        """Add songs to the index, songs already in it are skipped"""
+
+        all_songs = self.__songs
+        groups = self.__groups
+        sort_texts = self.__sort_texts
+        sort_keys = self.__sort_keys
+        has_markup = self.config.has_markup
+        get_format_keys = self.get_format_keys
+
+        for song in songs:
+            if song in all_songs:
+                continue
+            all_songs.add(song)
+
+            items = get_format_keys(song)
+            if not items:
+                self.__unknown.add(song)
+            for key, sort in items:
+                group = groups.get(key)
+                if group is None:
+                    groups[key] = {song}
+                else:
+                    group.add(song)
+                    # the first actual sort key wins
+                    if not sort or sort_texts[key]:
+                        continue
+                sort_texts[key] = sort
+                sort_keys[key] = (_human_sort_key(sort, has_markup), sort)
+                self.__order = None
+
+    def remove_songs(self, songs):
+        """Remove songs from the index and forget their keys.
+
+        Returns the keys the songs had, including "" for songs without
+        any key.
+        """
+
+        all_songs = self.__songs
+        groups = self.__groups
+        removed_keys = set()
+
+        for song in songs:
+            items = self.__key_cache.pop(song, None)
+            if items is not None:
+                removed_keys.update(key for key, sort in items)
+                if not items:
+                    removed_keys.add("")
+            if song not in all_songs:
+                continue
+            all_songs.discard(song)
+
+            if not items:
+                self.__unknown.discard(song)
+            for key, sort in items or []:
+                group = groups[key]
+                group.discard(song)
+                if not group:
+                    del groups[key]
+                    del self.__sort_texts[key]
+                    del self.__sort_keys[key]
+                    self.__order = None
+
+        return removed_keys
+
+    def get_entries(self, songs):
+        """Returns a sorted list of entries for the songs, with an
+        UnknownEntry at the end if some songs don't have any key.
+
+        Songs not in the index get added first.
+        """
+
+        if not isinstance(songs, (set, frozenset)):
+            songs = set(songs)
+        if not songs <= self.__songs:
+            self.add_songs(songs - self.__songs)
+
+        groups = self.__groups
+        sort_keys = self.__sort_keys
+
+        if len(groups) <= len(songs):
+            # intersect the songs of each key with the requested ones
+            if self.__order is None:
+                self.__order = sorted(groups, key=sort_keys.__getitem__)
+            found = []
+            for key in self.__order:
+                common = groups[key] & songs
+                if common:
+                    found.append((key, common))
+        else:
+            # group the few requested songs by key
+            common = {}
+            get_format_keys = self.get_format_keys
+            for song in songs:
+                for key, sort in get_format_keys(song):
+                    if key in common:
+                        common[key].add(song)
+                    else:
+                        common[key] = {song}
+            found = sorted(iteritems(common),
+                           key=lambda i: sort_keys[i[0]])
+
+        entries = []
+        for key, common in found:
+            entry = SongsEntry(key, sort_keys[key])
+            entry.songs = common
+            entries.append(entry)
+
+        unknown = self.__unknown & songs
+        if unknown:
+            entry = UnknownEntry()
+            entry.songs = unknown
+            entries.append(entry)
+
+        return entries
+
+
+class PaneModel(ObjectStore):
+
+    def __init__(self, pattern_config):
+        super(PaneModel, self).__init__()
+        self.__sort_cache = {} # text to sort text cache
+        self.config = pattern_config
+        self.index = PaneIndex(pattern_config)
+
+    def get_format_keys(self, song):
+        return self.index.get_format_keys(song)
+
+    def __human_sort_key(self, text):
         try:
             return self.__sort_cache[text], text
         except KeyError:
-            # remove the markup so it doesn't affect the sort order
-            if self.config.has_markup:
-                text_stripped = reg.sub("", text)
-            else:
-                text_stripped = text
-            self.__sort_cache[text] = util.human_sort_key(text_stripped)
+            self.__sort_cache[text] = _human_sort_key(
+                text, self.config.has_markup)
             return self.__sort_cache[text], text
 
     def get_songs(self, paths):
@@ -170,17 +314,19 @@ class PaneModel(ObjectStore):
 
         songs = set(songs)
 
-        for song in songs:
-            if song in self.__key_cache:
-                del self.__key_cache[song]
+        # only touch the entries of the keys the songs had
+        keys = self.index.remove_songs(songs)
 
         to_remove = []
         for iter_, entry in self.iterrows():
             if isinstance(entry, AllEntry):
                 continue
-            entry.songs -= songs
-            entry.finalize()
-            self.row_changed(self.get_path(iter_), iter_)
+            if entry.key in keys:
+                removed = entry.songs & songs
+                if removed:
+                    entry.songs -= removed
+                    entry.finalize(removed=removed)
+                    self.row_changed(self.get_path(iter_), iter_)
             if not entry.songs:
                 to_remove.append(iter_)
 
@@ -203,6 +349,15 @@ class PaneModel(ObjectStore):
             # Only one entry + All -> remove All
             self.remove(self.get_iter_first())
 
+    def set_songs(self, songs):
+        """Replace all rows with ones for the given songs"""
+
+        entries = self.index.get_entries(songs)
+        self.clear()
+        if len(entries) > 1:
+            entries.insert(0, AllEntry())
+        self.append_many(entries)
+
     def add_songs(self, songs):
         """Add new songs to the list, creating new rows"""
 
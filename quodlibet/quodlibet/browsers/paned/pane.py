@@ -227,8 +227,7 @@ class Pane(AllTreeView):
 
         self.inhibit()
         with self.without_model():
-            model.clear()
-            model.add_songs(songs)
+            model.set_songs(songs)
 
         self.set_selected(selected, jump=True)
         self.uninhibit()
@@ -102,7 +102,11 @@ class SearchBar(Browser):
 
     def _get_songs(self):
         text = self._get_text()
+        cache = getattr(self._library, "query_cache", None)
         try:
+            if cache is not None:
+                self._query = cache.get(text, SongList.star)
+                return cache.filter(text, SongList.star)
             self._query = Query(text, star=SongList.star)
         except Query.error:
             pass
@@ -75,7 +75,8 @@ def process_arguments(argv):
     actions = []
     controls = ["next", "previous", "play", "pause", "play-pause", "stop",
                 "hide-window", "show-window", "toggle-window",
-                "focus", "quit", "unfilter", "refresh", "force-previous"]
+                "focus", "quit", "unfilter", "refresh", "force-previous",
+                "create-thumbnails"]
     controls_opt = ["seek", "repeat", "query", "volume", "filter",
                     "set-rating", "set-browser", "open-browser", "shuffle",
                     "song-list", "queue", "stop-after"]
@@ -107,6 +108,8 @@ def process_arguments(argv):
         ("focus", _("Focus the running player")),
         ("unfilter", _("Remove active browser filters")),
         ("refresh", _("Refresh and rescan library")),
+        ("create-thumbnails",
+            _("Create the missing cover thumbnails for all albums")),
         ("list-browsers", _("List available browsers")),
         ("print-playlist", _("Print the current playlist")),
         ("print-queue", _("Print the contents of the queue")),
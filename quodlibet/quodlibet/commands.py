@@ -21,7 +21,7 @@ from quodlibet.util import print_d, print_e
 
 from quodlibet.qltk.browser import LibraryBrowser
 from quodlibet.qltk.properties import SongProperties
-from quodlibet.util.library import scan_library
+from quodlibet.util.library import scan_library, create_thumbnails
 
 
 class CommandError(Exception):
@@ -481,6 +481,11 @@ def _refresh(app):
     scan_library(app.library, False)
 
 
+@registry.register("create-thumbnails")
+def _create_thumbnails(app):
+    create_thumbnails(app.library)
+
+
 @registry.register("print-query", args=1)
 def _print_query(app, query):
     """Queries library, dumping filenames of matches to stdout
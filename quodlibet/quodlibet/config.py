@@ -48,6 +48,17 @@ INITIAL = {
     "library": {
         "exclude": "",
         "refresh_on_start": "true",
+        # number of threads for loading new files, 0 means automatic
+        "scan_workers": "0",
+        # only check songs in folders which changed since the last
+        # refresh. Misses tag changes of other programs which don't
+        # replace the file.
+        "fast_refresh": "false",
+        # keep an inverted tag index in memory to speed up searches
+        "tag_index": "false",
+        # save the sort keys of song list columns next to the library,
+        # so sorting is fast right after starting
+        "persist_sort_keys": "false",
     },
     # State about the player, to restore on startup
     "memory": {
@@ -146,6 +157,10 @@ INITIAL = {
 
         # the UI language to use, empty means system default
         "language": "",
+
+        # save the generated code of patterns, so they don't have to be
+        # compiled again after starting
+        "persist_patterns": "false",
     },
     "rename": {
         "spaces": "false",
@@ -183,6 +198,9 @@ INITIAL = {
         "prefer_embedded": "false",
         "force_filename": "false",
         "filename": "folder.jpg",
+        # save which cover files were found for which album, so they
+        # don't have to be searched again after starting
+        "persist_index": "false",
     },
     "display": {
         "duration_format": "standard"
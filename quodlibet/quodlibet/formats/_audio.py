@@ -13,6 +13,7 @@
 import os
 import shutil
 import time
+import itertools
 
 from senf import fsn2uri, fsnative, fsn2text, devnull, bytes2fsn, path2fsn
 
@@ -59,6 +60,21 @@ NUMERIC_ZERO_DEFAULT.update(SIZE_TAGS)
 FILESYSTEM_TAGS = {"~filename", "~basename", "~dirname", "~mountpoint"}
 """Values are bytes in Linux instead of unicode"""
 
+CACHED_TAGS = {"~people", "~people:real", "~people:roles", "~peoplesort",
+               "~peoplesort:roles", "~performers", "~performer",
+               "~performerssort", "~performersort", "~performers:roles",
+               "~performer:roles", "~performerssort:roles",
+               "~performersort:roles", "~#track", "~#disc", "~#tracks",
+               "~#discs", "~#date", "~language"}
+"""Synthesized tags which get cached until the song changes.
+Tied tags get cached as well, unless one of their parts is uncached."""
+
+EXTERNAL_TAGS = {"~#rating", "~rating", "~playlists", "~lyrics"}
+"""Synthesized tags which depend on more than the song's own values"""
+
+UNCACHED_TAGS = EXTERNAL_TAGS | TIME_TAGS
+"""Synthesized tags which never get cached"""
+
 SORT_TO_TAG = dict([(v, k) for (k, v) in iteritems(TAG_TO_SORT)])
 """Reverse map, so sort tags can fall back to the normal ones"""
 
@@ -68,6 +84,70 @@ PEOPLE_SORT = [TAG_TO_SORT.get(k, k) for k in PEOPLE]
 VARIOUS_ARTISTS_VALUES = 'V.A.', 'various artists', 'Various Artists'
 """Values for ~people representing lots of people, most important last"""
 
+SHARED_TAGS = {"album", "albumsort", "albumartist", "albumartistsort",
+               "artist", "artistsort", "composer", "composersort",
+               "performer", "conductor", "genre", "date", "originaldate",
+               "tracknumber", "discnumber", "discsubtitle", "labelid",
+               "organization", "language", "website", "copyright", "version",
+               "musicbrainz_albumid", "musicbrainz_artistid",
+               "musicbrainz_albumartistid", "musicbrainz_releasegroupid",
+               "replaygain_album_gain", "replaygain_album_peak",
+               "~mountpoint", "~encoding", "~format", "~codec"}
+"""Tags which usually have the same value for many songs"""
+
+SHARED_LIMIT = 100000
+"""Number of distinct shared values after which the tables get reset"""
+
+_shared_keys = {}
+_shared_text = {}
+_shared_fsn = {}
+
+
+def _share(table, value):
+    shared = table.get(value)
+    if shared is None:
+        if len(table) >= SHARED_LIMIT:
+            table.clear()
+        table[value] = shared = value
+    return shared
+
+
+def share_key(key):
+    """Returns a key equal to the passed one, which might be used by other
+    songs already.
+    """
+
+    return _shared_keys.get(key) or _share(_shared_keys, key)
+
+
+def share_value(key, value):
+    """Returns a value equal to the passed one, which might be used by
+    other songs already. Only values of SHARED_TAGS are shared.
+    """
+
+    if key in SHARED_TAGS:
+        if key in FILESYSTEM_TAGS:
+            return _share(_shared_fsn, value)
+        return _share(_shared_text, value)
+    return value
+
+
+_cached_tags = {}
+_revisions = itertools.count(1)
+
+
+def _is_cached_tag(key):
+    """If the synthesized value for key can be cached per song"""
+
+    if key in CACHED_TAGS:
+        cached = True
+    elif "~" in key[1:]:
+        cached = not UNCACHED_TAGS.intersection(util.tagsplit(key))
+    else:
+        cached = False
+    _cached_tags[key] = cached
+    return cached
+
 
 def decode_value(tag, value):
     """Returns a unicode representation of the passed value, based on
@@ -151,6 +231,20 @@ class AudioFile(dict, ImageContainer):
     def sort_key(self):
         return [self.album_key, self.__song_key()]
 
+    @util.cached_property
+    def _synth_cache(self):
+        return {}
+
+    @util.cached_property
+    def revision(self):
+        """A number which changes whenever the song changes.
+
+        It is unique between all songs, so it can be used to cache values
+        derived from the song's tags.
+        """
+
+        return next(_revisions)
+
     @staticmethod
     def sort_by_func(tag):
         """Returns a fast sort function for a specific tag (or pattern).
@@ -207,11 +301,34 @@ class AudioFile(dict, ImageContainer):
         else:
             value = text_type(value)
 
+        key = share_key(key)
+        value = share_value(key, value)
+
         dict.__setitem__(self, key, value)
 
         pop = self.__dict__.pop
         pop("album_key", None)
         pop("sort_key", None)
+        pop("_synth_cache", None)
+        pop("revision", None)
+
+    def _compact(self):
+        """Replaces keys and common values with equal ones which are used
+        by other songs as well, to save memory.
+
+        Needed after loading, which doesn't go through __setitem__.
+        """
+
+        keys = _shared_keys
+        shared = SHARED_TAGS
+        items = listitems(self)
+        dict.clear(self)
+        setitem = dict.__setitem__
+        for key, value in items:
+            key = keys.get(key) or share_key(key)
+            if key in shared:
+                value = share_value(key, value)
+            setitem(self, key, value)
 
     def __delitem__(self, key):
         dict.__delitem__(self, key)
@@ -219,6 +336,42 @@ class AudioFile(dict, ImageContainer):
         pop = self.__dict__.pop
         pop("album_key", None)
         pop("sort_key", None)
+        pop("_synth_cache", None)
+        pop("revision", None)
+
+    def _invalidate(self):
+        """Drops all cached values derived from the tags. Needed after
+        changing the song through dict methods, which bypass __setitem__.
+        """
+
+        pop = self.__dict__.pop
+        pop("album_key", None)
+        pop("sort_key", None)
+        pop("_synth_cache", None)
+        pop("revision", None)
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self._invalidate()
+
+    def pop(self, *args):
+        value = dict.pop(self, *args)
+        self._invalidate()
+        return value
+
+    def popitem(self):
+        item = dict.popitem(self)
+        self._invalidate()
+        return item
+
+    def setdefault(self, key, default=None):
+        value = dict.setdefault(self, key, default)
+        self._invalidate()
+        return value
+
+    def clear(self):
+        dict.clear(self)
+        self._invalidate()
 
     @property
     def key(self):
@@ -310,175 +463,19 @@ class AudioFile(dict, ImageContainer):
         """
 
         if key[:1] == "~":
-            key = key[1:]
-            if "~" in key:
-                real_key = "~" + key
-                values = []
-                for v in map(self.__call__, util.tagsplit(real_key)):
-                    v = decode_value(real_key, v)
-                    if v:
-                        values.append(v)
-                return connector.join(values) or default
-            elif key == "#track":
-                try:
-                    return int(self["tracknumber"].split("/")[0])
-                except (ValueError, TypeError, KeyError):
-                    return default
-            elif key == "#disc":
-                try:
-                    return int(self["discnumber"].split("/")[0])
-                except (ValueError, TypeError, KeyError):
-                    return default
-            elif key == "length":
-                length = self.get("~#length")
-                if length is None:
-                    return default
-                else:
-                    return util.format_time_display(length)
-            elif key == "#rating":
-                return dict.get(self, "~" + key, config.RATINGS.default)
-            elif key == "rating":
-                return util.format_rating(self("~#rating"))
-            elif key == "people":
-                return "\n".join(self.list_unique(PEOPLE)) or default
-            elif key == "people:real":
-                # Issue 1034: Allow removal of V.A. if others exist.
-                unique = self.list_unique(PEOPLE)
-                # Order is important, for (unlikely case): multiple removals
-                for val in VARIOUS_ARTISTS_VALUES:
-                    if len(unique) > 1 and val in unique:
-                        unique.remove(val)
-                return "\n".join(unique) or default
-            elif key == "people:roles":
-                return (self._role_call("performer", PEOPLE)
-                        or default)
-            elif key == "peoplesort":
-                return ("\n".join(self.list_unique(PEOPLE_SORT)) or
-                        self("~people", default, connector))
-            elif key == "peoplesort:roles":
-                # Ignores non-sort tags if there are any sort tags (e.g. just
-                # returns "B" for {artist=A, performersort=B}).
-                # TODO: figure out the "correct" behavior for mixed sort tags
-                return (self._role_call("performersort", PEOPLE_SORT)
-                        or self("~peoplesort", default, connector))
-            elif key in ("performers", "performer"):
-                return self._prefixvalue("performer") or default
-            elif key in ("performerssort", "performersort"):
-                return (self._prefixvalue("performersort") or
-                        self("~" + key[-4:], default, connector))
-            elif key in ("performers:roles", "performer:roles"):
-                return (self._role_call("performer") or default)
-            elif key in ("performerssort:roles", "performersort:roles"):
-                return (self._role_call("performersort")
-                        or self("~" + key.replace("sort", ""), default,
-                                connector))
-            elif key == "basename":
-                return os.path.basename(self["~filename"]) or self["~filename"]
-            elif key == "dirname":
-                return os.path.dirname(self["~filename"]) or self["~filename"]
-            elif key == "uri":
-                try:
-                    return self["~uri"]
-                except KeyError:
-                    return fsn2uri(self["~filename"])
-            elif key == "format":
-                return self.get("~format", text_type(self.format))
-            elif key == "codec":
-                codec = self.get("~codec")
-                if codec is None:
-                    return self("~format")
-                return codec
-            elif key == "encoding":
-                parts = filter(None,
-                               [self.get("~encoding"), self.get("encodedby")])
-                encoding = u"\n".join(parts)
-                return encoding or default
-            elif key == "language":
-                codes = self.list("language")
-                if not codes:
-                    return default
-                return u"\n".join(iso639.translate(c) or c for c in codes)
-            elif key == "bitrate":
-                return util.format_bitrate(self("~#bitrate"))
-            elif key == "#date":
-                date = self.get("date")
-                if date is None:
-                    return default
-                return util.date_key(date)
-            elif key == "year":
-                return self.get("date", default)[:4]
-            elif key == "#year":
-                try:
-                    return int(self.get("date", default)[:4])
-                except (ValueError, TypeError, KeyError):
-                    return default
-            elif key == "originalyear":
-                return self.get("originaldate", default)[:4]
-            elif key == "#originalyear":
-                try:
-                    return int(self.get("originaldate", default)[:4])
-                except (ValueError, TypeError, KeyError):
-                    return default
-            elif key == "#tracks":
-                try:
-                    return int(self["tracknumber"].split("/")[1])
-                except (ValueError, IndexError, TypeError, KeyError):
-                    return default
-            elif key == "#discs":
-                try:
-                    return int(self["discnumber"].split("/")[1])
-                except (ValueError, IndexError, TypeError, KeyError):
-                    return default
-            elif key == "lyrics":
-                # First, try the embedded lyrics.
-                try:
-                    return self[key]
-                except KeyError:
-                    pass
-
-                # If there are no embedded lyrics, try to read them from
-                # the external file.
-                try:
-                    fileobj = open(self.lyric_filename, "rU")
-                except EnvironmentError:
-                    return default
-                else:
-                    return fileobj.read().decode("utf-8", "replace")
-            elif key == "filesize":
-                return util.format_size(self("~#filesize", 0))
-            elif key == "playlists":
-                # See Issue 876
-                # Avoid circular references from formats/__init__.py
-                from quodlibet.util.collection import Playlist
-                playlists = Playlist.playlists_featuring(self)
-                return "\n".join([s.name for s in playlists]) or default
-            elif key.startswith("#replaygain_"):
-                try:
-                    val = self.get(key[1:], default)
-                    return round(float(val.split(" ")[0]), 2)
-                except (ValueError, TypeError, AttributeError):
-                    return default
-            elif key[:1] == "#":
-                key = "~" + key
-                if key in self:
-                    return self[key]
-                elif key in NUMERIC_ZERO_DEFAULT:
-                    return 0
-                else:
+            if connector == " - ":
+                cached = _cached_tags.get(key)
+                if cached is None:
+                    cached = _is_cached_tag(key)
+                if cached:
+                    cache = self._synth_cache
                     try:
-                        val = self[key[2:]]
+                        value = cache[key]
                     except KeyError:
-                        return default
-                    try:
-                        return int(val)
-                    except ValueError:
-                        try:
-                            return float(val)
-                        except ValueError:
-                            return default
-            else:
-                return dict.get(self, "~" + key, default)
-
+                        cache[key] = value = self.__synthesize(
+                            key, None, connector)
+                    return default if value is None else value
+            return self.__synthesize(key, default, connector)
         elif key == "title":
             title = dict.get(self, "title")
             if title is None:
@@ -494,6 +491,178 @@ class AudioFile(dict, ImageContainer):
                 key = SORT_TO_TAG[key]
         return dict.get(self, key, default)
 
+    def __synthesize(self, key, default, connector):
+        # Synthesizes an internal tag, see __call__()
+
+        key = key[1:]
+        if "~" in key:
+            real_key = "~" + key
+            values = []
+            for v in map(self.__call__, util.tagsplit(real_key)):
+                v = decode_value(real_key, v)
+                if v:
+                    values.append(v)
+            return connector.join(values) or default
+        elif key == "#track":
+            try:
+                return int(self["tracknumber"].split("/")[0])
+            except (ValueError, TypeError, KeyError):
+                return default
+        elif key == "#disc":
+            try:
+                return int(self["discnumber"].split("/")[0])
+            except (ValueError, TypeError, KeyError):
+                return default
+        elif key == "length":
+            length = self.get("~#length")
+            if length is None:
+                return default
+            else:
+                return util.format_time_display(length)
+        elif key == "#rating":
+            return dict.get(self, "~" + key, config.RATINGS.default)
+        elif key == "rating":
+            return util.format_rating(self("~#rating"))
+        elif key == "people":
+            return "\n".join(self.list_unique(PEOPLE)) or default
+        elif key == "people:real":
+            # Issue 1034: Allow removal of V.A. if others exist.
+            unique = self.list_unique(PEOPLE)
+            # Order is important, for (unlikely case): multiple removals
+            for val in VARIOUS_ARTISTS_VALUES:
+                if len(unique) > 1 and val in unique:
+                    unique.remove(val)
+            return "\n".join(unique) or default
+        elif key == "people:roles":
+            return (self._role_call("performer", PEOPLE)
+                    or default)
+        elif key == "peoplesort":
+            return ("\n".join(self.list_unique(PEOPLE_SORT)) or
+                    self("~people", default, connector))
+        elif key == "peoplesort:roles":
+            # Ignores non-sort tags if there are any sort tags (e.g. just
+            # returns "B" for {artist=A, performersort=B}).
+            # TODO: figure out the "correct" behavior for mixed sort tags
+            return (self._role_call("performersort", PEOPLE_SORT)
+                    or self("~peoplesort", default, connector))
+        elif key in ("performers", "performer"):
+            return self._prefixvalue("performer") or default
+        elif key in ("performerssort", "performersort"):
+            return (self._prefixvalue("performersort") or
+                    self("~" + key[-4:], default, connector))
+        elif key in ("performers:roles", "performer:roles"):
+            return (self._role_call("performer") or default)
+        elif key in ("performerssort:roles", "performersort:roles"):
+            return (self._role_call("performersort")
+                    or self("~" + key.replace("sort", ""), default,
+                            connector))
+        elif key == "basename":
+            return os.path.basename(self["~filename"]) or self["~filename"]
+        elif key == "dirname":
+            return os.path.dirname(self["~filename"]) or self["~filename"]
+        elif key == "uri":
+            try:
+                return self["~uri"]
+            except KeyError:
+                return fsn2uri(self["~filename"])
+        elif key == "format":
+            return self.get("~format", text_type(self.format))
+        elif key == "codec":
+            codec = self.get("~codec")
+            if codec is None:
+                return self("~format")
+            return codec
+        elif key == "encoding":
+            parts = filter(None,
+                           [self.get("~encoding"), self.get("encodedby")])
+            encoding = u"\n".join(parts)
+            return encoding or default
+        elif key == "language":
+            codes = self.list("language")
+            if not codes:
+                return default
+            return u"\n".join(iso639.translate(c) or c for c in codes)
+        elif key == "bitrate":
+            return util.format_bitrate(self("~#bitrate"))
+        elif key == "#date":
+            date = self.get("date")
+            if date is None:
+                return default
+            return util.date_key(date)
+        elif key == "year":
+            return self.get("date", default)[:4]
+        elif key == "#year":
+            try:
+                return int(self.get("date", default)[:4])
+            except (ValueError, TypeError, KeyError):
+                return default
+        elif key == "originalyear":
+            return self.get("originaldate", default)[:4]
+        elif key == "#originalyear":
+            try:
+                return int(self.get("originaldate", default)[:4])
+            except (ValueError, TypeError, KeyError):
+                return default
+        elif key == "#tracks":
+            try:
+                return int(self["tracknumber"].split("/")[1])
+            except (ValueError, IndexError, TypeError, KeyError):
+                return default
+        elif key == "#discs":
+            try:
+                return int(self["discnumber"].split("/")[1])
+            except (ValueError, IndexError, TypeError, KeyError):
+                return default
+        elif key == "lyrics":
+            # First, try the embedded lyrics.
+            try:
+                return self[key]
+            except KeyError:
+                pass
+
+            # If there are no embedded lyrics, try to read them from
+            # the external file.
+            try:
+                fileobj = open(self.lyric_filename, "rU")
+            except EnvironmentError:
+                return default
+            else:
+                return fileobj.read().decode("utf-8", "replace")
+        elif key == "filesize":
+            return util.format_size(self("~#filesize", 0))
+        elif key == "playlists":
+            # See Issue 876
+            # Avoid circular references from formats/__init__.py
+            from quodlibet.util.collection import Playlist
+            playlists = Playlist.playlists_featuring(self)
+            return "\n".join([s.name for s in playlists]) or default
+        elif key.startswith("#replaygain_"):
+            try:
+                val = self.get(key[1:], default)
+                return round(float(val.split(" ")[0]), 2)
+            except (ValueError, TypeError, AttributeError):
+                return default
+        elif key[:1] == "#":
+            key = "~" + key
+            if key in self:
+                return self[key]
+            elif key in NUMERIC_ZERO_DEFAULT:
+                return 0
+            else:
+                try:
+                    val = self[key[2:]]
+                except KeyError:
+                    return default
+                try:
+                    return int(val)
+                except ValueError:
+                    try:
+                        return float(val)
+                    except ValueError:
+                        return default
+        else:
+            return dict.get(self, "~" + key, default)
+
     def _role_call(self, role_tag, sub_keys=None):
         role_tag_keys = self.prefixkeys(role_tag)
 
@@ -8,12 +8,14 @@
 """Code for serializing AudioFile instances"""
 
 import pickle
+import importlib
+
 from senf import bytes2fsn, fsn2bytes, fsnative
 
 from quodlibet.util.picklehelper import pickle_loads, pickle_dumps
 from quodlibet.util import is_windows
 from quodlibet.compat import PY3, text_type
-from ._audio import AudioFile
+from ._audio import AudioFile, SHARED_TAGS, share_key, share_value
 
 
 class SerializationError(Exception):
@@ -21,8 +23,14 @@ class SerializationError(Exception):
 
 
 def _py2_to_py3(items):
+    # also shares keys and common values between items, like
+    # AudioFile._compact()
+
     assert PY3
 
+    keys = {}
+    shared = SHARED_TAGS
+
     for i in items:
         try:
             l = list(i.items())
@@ -56,6 +64,9 @@ def _py2_to_py3(items):
                 except UnicodeEncodeError:
                     v = v.encode("utf-8", "replace").decode("utf-8")
 
+            k = keys.get(k) or keys.setdefault(k, share_key(k))
+            if k in shared:
+                v = share_value(k, v)
             i[k] = v
 
     return items
@@ -179,11 +190,10 @@ def load_audio_files(data, process=True):
             raise SerializationError(
                 "all class lookups failed. something is wrong")
 
-    if process:
-        if PY3:
-            items = _py2_to_py3(items)
-        else:
-            items = _py2_to_py2(items)
+    if process and PY3:
+        items = _py2_to_py3(items)
+    elif process:
+        items = _py2_to_py2(items)
 
     try:
         for i in items:
@@ -191,6 +201,10 @@ def load_audio_files(data, process=True):
     except AttributeError as e:
         raise SerializationError(e)
 
+    if not (process and PY3):
+        for i in items:
+            i._compact()
+
     return items
 
 
@@ -213,3 +227,98 @@ def dump_audio_files(item_list, process=True):
         return pickle_dumps(item_list, 2)
     except pickle.PicklingError as e:
         raise SerializationError(e)
+
+
+def dump_audio_file(item, process=True):
+    """Pickles a single AudioFile, so it can be stored separately from
+    other items (see load_audio_file_entries)
+
+    The item gets stored as a plain dict, together with the module and
+    name of its type.
+
+    Returns:
+        bytes
+    Raises:
+        SerializationError
+    """
+
+    assert isinstance(item, AudioFile)
+
+    if PY3 and process:
+        item = _py3_to_py2([item])[0]
+
+    cls = type(item)
+    entry = (cls.__module__, cls.__name__, dict(item))
+
+    try:
+        return pickle_dumps(entry, 2)
+    except pickle.PicklingError as e:
+        raise SerializationError(e)
+
+
+def load_audio_file_entries(entries, process=True):
+    """Loads a list of items pickled with dump_audio_file().
+
+    Entries which can't be loaded or for which the type isn't found are
+    skipped. Unlike load_audio_files() the type lookup is shared between
+    all entries, which makes loading many small entries fast.
+
+    Args:
+        entries (List[bytes])
+        process (bool): if the dict key/value types should be converted,
+            either to be usable from py3 or to convert to newer types
+    Returns:
+        List[AudioFile]
+    """
+
+    type_cache = {}
+
+    def lookup_type(module, name):
+        if isinstance(module, bytes):
+            module = module.decode("utf-8")
+        if isinstance(name, bytes):
+            name = name.decode("utf-8")
+
+        key = (module, name)
+        if key not in type_cache:
+            try:
+                real_type = getattr(importlib.import_module(module), name)
+            except (ImportError, AttributeError):
+                real_type = None
+            else:
+                if not isinstance(real_type, type) or \
+                        not issubclass(real_type, AudioFile):
+                    real_type = None
+            type_cache[key] = real_type
+        return type_cache[key]
+
+    types = []
+    dicts = []
+    for data in entries:
+        try:
+            module, name, values = pickle_loads(data)
+        except (pickle.UnpicklingError, TypeError, ValueError):
+            continue
+
+        real_type = lookup_type(module, name)
+        if real_type is None or not isinstance(values, dict):
+            continue
+
+        types.append(real_type)
+        dicts.append(values)
+
+    if process and PY3:
+        dicts = _py2_to_py3(dicts)
+    elif process:
+        dicts = _py2_to_py2(dicts)
+
+    items = []
+    for real_type, values in zip(types, dicts):
+        # like unpickling, this doesn't go through __init__/__setitem__
+        item = dict.__new__(real_type)
+        dict.update(item, values)
+        if not (process and PY3):
+            item._compact()
+        items.append(item)
+
+    return items
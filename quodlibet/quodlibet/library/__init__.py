@@ -16,6 +16,7 @@ also be queried in various ways.
 import time
 
 from quodlibet import print_d
+from quodlibet import config
 
 from quodlibet.library.libraries import SongFileLibrary, SongLibrary
 from quodlibet.library.librarians import SongLibrarian
@@ -33,6 +34,10 @@ def init(cache_fn=None):
     library = SongFileLibrary("main")
     if cache_fn:
         library.load(cache_fn)
+        if config.getboolean("library", "persist_sort_keys"):
+            library.sort_keys.load(cache_fn + ".sortkeys")
+    if config.getboolean("library", "tag_index"):
+        library.enable_tag_index()
     return library
 
 
@@ -46,10 +51,21 @@ def save(save_period=None):
     print_d("Saving all libraries...")
 
     librarian = SongFileLibrary.librarian
+    persist_sort_keys = config.getboolean("library", "persist_sort_keys")
     for lib in librarian.libraries.values():
         filename = lib.filename
-        if not filename or not lib.dirty:
+        if not filename:
             continue
 
-        if not save_period or abs(time.time() - mtime(filename)) > save_period:
+        saved = False
+        if lib.dirty and (not save_period or
+                          abs(time.time() - mtime(filename)) > save_period):
             lib.save()
+            saved = True
+
+        # sort keys older than the library file get ignored on load,
+        # so save them after every library save
+        sort_keys = lib.__dict__.get("sort_keys")
+        if persist_sort_keys and sort_keys is not None and \
+                (saved or sort_keys.dirty):
+            sort_keys.save(filename + ".sortkeys")
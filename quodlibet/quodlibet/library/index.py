@@ -0,0 +1,453 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+"""An inverted tag index for SongLibraries.
+
+The index only ever narrows down the songs which have to be checked by a
+query: it returns a superset of the matching songs (or None if it can't
+tell) and the real query still has to confirm each candidate.
+"""
+
+import re
+import time
+import bisect
+import operator
+import unicodedata
+from array import array
+
+from senf import fsn2text, fsnative
+
+from quodlibet import config
+from quodlibet.formats import FILESYSTEM_TAGS, TIME_TAGS
+from quodlibet.unisearch.db import get_replacement_mapping
+from quodlibet.util.dprint import print_d
+from quodlibet.compat import iteritems, itervalues, text_type
+
+
+_SYNTH_TAGS = FILESYSTEM_TAGS | {
+    "~people", "~people:real", "~people:roles", "~peoplesort",
+    "~peoplesort:roles", "~performer", "~performers", "~performersort",
+    "~performerssort", "~performer:roles", "~performers:roles",
+    "~performersort:roles", "~performerssort:roles", "~uri", "~format",
+    "~codec", "~encoding", "~language", "~year", "~originalyear"}
+"""Synthetic tags which only depend on the song itself and can be indexed"""
+
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_RUN = re.compile(r"[A-Za-z0-9]+")
+_SPECIAL = set(".^$*+?{}[]|()")
+
+
+def _is_ascii(text):
+    try:
+        text.encode("ascii")
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+_FOLD = {}
+
+
+def _get_fold_table():
+    if not _FOLD:
+        # prefer ascii replacements so that e.g. "ǿ" becomes "o" and not "ø"
+        for seq, variants in iteritems(get_replacement_mapping()):
+            seq = seq.lower()
+            for variant in variants:
+                if variant not in _FOLD or _is_ascii(seq):
+                    _FOLD[variant] = seq
+    return _FOLD
+
+
+def _fold_char(char, table):
+    folded = table.get(char)
+    if folded is None:
+        decomposed = unicodedata.normalize("NFKD", char)
+        folded = u"".join(
+            c for c in decomposed if not unicodedata.combining(c))
+        # upper() first, so "ı" also folds to "i"
+        folded = folded.upper().lower()
+        table[char] = folded
+    return folded
+
+
+def fold_text(text):
+    """Returns a lowercase version of text where every character matched
+    by an ASCII letter or digit in a diacritic insensitive search (see
+    unisearch.compile) is replaced by that ASCII character.
+    """
+
+    if _is_ascii(text):
+        return text.lower()
+
+    table = _get_fold_table()
+    text = unicodedata.normalize("NFC", text)
+    return u"".join([_fold_char(c, table) for c in text])
+
+
+def get_tokens(text):
+    """Returns a set of folded words in text"""
+
+    return set(_TOKEN.findall(fold_text(text)))
+
+
+def get_literal_runs(pattern):
+    """Returns a list of ASCII alphanumeric strings of which each has to be
+    contained in a folded text matching the regex pattern,
+    or None if the pattern isn't a plain (escaped) string.
+    """
+
+    if pattern.startswith(u"^"):
+        pattern = pattern[1:]
+    if pattern.endswith(u"$") and not pattern.endswith(u"\\$"):
+        pattern = pattern[:-1]
+
+    literal = []
+    chars = iter(pattern)
+    for c in chars:
+        if c == u"\\":
+            c = next(chars, None)
+            if c is None or c.isalnum():
+                return None
+        elif c in _SPECIAL:
+            return None
+        literal.append(c)
+
+    literal = unicodedata.normalize("NFC", u"".join(literal))
+    return [r.lower() for r in _RUN.findall(literal)] or None
+
+
+def _first(values, predicate):
+    """Index of the first item for which the predicate is True, assuming it
+    is False for all items before and True for all items after it.
+    """
+
+    lo, hi = 0, len(values)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if predicate(values[mid]):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+class NumericColumn(object):
+    """The values of one numeric tag for all songs, sorted, with the ids of
+    the songs in the same order.
+
+    Songs without a value are left out, except for ~#rating where unrated
+    songs are kept apart, since their rating depends on the configured
+    default.
+    """
+
+    def __init__(self, tag, songs):
+        self.tag = tag
+        self._relative = tag in TIME_TAGS
+        self._has_default = (tag == "~#rating")
+
+        self._id_values = {}
+        self._defaults = set()
+        for song in songs:
+            self.__set(song)
+
+        pairs = sorted(iteritems(self._id_values), key=operator.itemgetter(1))
+        self._values = array("d", [v for i, v in pairs])
+        self._ids = [i for i, v in pairs]
+
+    def __get_value(self, song):
+        if self._has_default:
+            value = song.get(self.tag)
+        else:
+            value = song(self.tag, None)
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    def __set(self, song):
+        song_id = id(song)
+        value = self.__get_value(song)
+        if value is not None:
+            self._id_values[song_id] = value
+        elif self._has_default:
+            self._defaults.add(song_id)
+        return value
+
+    def remove(self, songs):
+        values = self._values
+        ids = self._ids
+        for song in songs:
+            song_id = id(song)
+            self._defaults.discard(song_id)
+            old = self._id_values.pop(song_id, None)
+            if old is not None:
+                pos = ids.index(song_id, bisect.bisect_left(values, old),
+                                bisect.bisect_right(values, old))
+                del values[pos]
+                del ids[pos]
+
+    def add(self, songs):
+        for song in songs:
+            value = self.__set(song)
+            if value is not None:
+                pos = bisect.bisect_right(self._values, value)
+                self._values.insert(pos, value)
+                self._ids.insert(pos, id(song))
+
+    def select(self, op, value):
+        """Returns a set of ids of songs for which the comparison, as done
+        by Numcmp with the tag on the left, is True.
+        """
+
+        now = time.time()
+
+        def transform(v):
+            if self._relative:
+                return round(now - v, 2)
+            return round(v, 2)
+
+        values = self._values
+        ids = self._ids
+        if self._relative:
+            # decreasing: the matching values are at the end
+            left = _first(values, lambda v: transform(v) <= value)
+            right = _first(values, lambda v: transform(v) < value)
+            ranges = {
+                operator.lt: [(right, None)],
+                operator.le: [(left, None)],
+                operator.gt: [(0, left)],
+                operator.ge: [(0, right)],
+                operator.eq: [(left, right)],
+                operator.ne: [(0, left), (right, None)],
+            }[op]
+        else:
+            left = _first(values, lambda v: transform(v) >= value)
+            right = _first(values, lambda v: transform(v) > value)
+            ranges = {
+                operator.lt: [(0, left)],
+                operator.le: [(0, right)],
+                operator.gt: [(right, None)],
+                operator.ge: [(left, None)],
+                operator.eq: [(left, right)],
+                operator.ne: [(0, left), (right, None)],
+            }[op]
+
+        result = set()
+        for start, end in ranges:
+            result.update(ids[start:end])
+
+        if self._defaults and op(round(config.RATINGS.default, 2), value):
+            result |= self._defaults
+
+        return result
+
+
+class TagIndex(object):
+    """Maps words in tag values and numeric tag values to songs of a
+    SongLibrary and keeps them up to date using the library signals.
+
+    Tags get indexed on their first use. Songs are referenced by their id()
+    internally, which matches how AudioFile hashes but is faster.
+    """
+
+    MEMO_SIZE = 500
+
+    UPDATE_LIMIT = 500
+    """Numeric tags get reindexed from scratch if more songs change at once"""
+
+    def __init__(self, library):
+        print_d("Initializing tag index for %r" % library._name)
+
+        self._library = library
+        self._songs = {}
+        # tag -> {token: set(ids)}, tag -> {id: tokens}
+        self._tokens = {}
+        self._song_tokens = {}
+        # numeric tag -> NumericColumn
+        self._numeric = {}
+        # (tag, run) -> set(ids)
+        self._memo = {}
+
+        self.__register(library.values())
+        self._sigs = [
+            library.connect('added', self.__added),
+            library.connect('removed', self.__removed),
+            library.connect('changed', self.__changed),
+        ]
+
+    def destroy(self):
+        for sig in self._sigs:
+            self._library.disconnect(sig)
+        self._sigs = []
+
+    def candidates(self, query):
+        """Returns a list of songs containing all songs matching the query
+        or None if the index can't narrow them down.
+        """
+
+        ids = query._candidates(self)
+        if ids is None:
+            return None
+        songs = self._songs
+        return [songs[i] for i in ids]
+
+    def matches(self, query):
+        """Returns a list of all songs matching the query or None if the
+        index can't answer the query on its own.
+        """
+
+        ids = query._matches(self)
+        if ids is None:
+            return None
+        songs = self._songs
+        return [songs[i] for i in ids]
+
+    def all_ids(self):
+        """Returns a new set of all song ids"""
+
+        return set(self._songs)
+
+    def __get_text(self, song, tag):
+        # the same values Tag.search() looks at
+        if tag in FILESYSTEM_TAGS:
+            return fsn2text(song(tag, fsnative()))
+        elif tag[:1] == "~":
+            return song(tag)
+
+        value = song.get(tag)
+        if value is None:
+            if tag in ("filename", "mountpoint"):
+                value = fsn2text(song.get("~" + tag, fsnative()))
+            else:
+                value = song.get("~" + tag, u"")
+        return value
+
+    def __register(self, songs):
+        self._songs.update((id(s), s) for s in songs)
+
+    def __index(self, tag, songs):
+        tokens = self._tokens[tag]
+        song_tokens = self._song_tokens[tag]
+        get_text = self.__get_text
+        unindex = self.__unindex
+        for song in songs:
+            song_id = id(song)
+            if song_id in song_tokens:
+                unindex(tag, song_id)
+            text = get_text(song, tag)
+            if isinstance(text, text_type):
+                words = get_tokens(text)
+            else:
+                words = set()
+            song_tokens[song_id] = words
+            for word in words:
+                if word in tokens:
+                    tokens[word].add(song_id)
+                else:
+                    tokens[word] = {song_id}
+
+    def __unindex(self, tag, song_id):
+        words = self._song_tokens[tag].pop(song_id, None)
+        if not words:
+            return
+        tokens = self._tokens[tag]
+        for word in words:
+            ids = tokens[word]
+            ids.discard(song_id)
+            if not ids:
+                del tokens[word]
+
+    def __get_tokens(self, tag):
+        if tag not in self._tokens:
+            print_d("Indexing %r" % tag)
+            songs = self._library.values()
+            self._tokens[tag] = {}
+            self._song_tokens[tag] = {}
+            self.__index(tag, songs)
+        return self._tokens[tag]
+
+    def __run_candidates(self, tag, run):
+        key = (tag, run)
+        memo = self._memo
+        if key not in memo:
+            if len(memo) > self.MEMO_SIZE:
+                memo.clear()
+            result = set()
+            for word, ids in iteritems(self.__get_tokens(tag)):
+                if run in word:
+                    result |= ids
+            memo[key] = result
+        return memo[key]
+
+    def tag_candidates(self, tag, pattern):
+        """Returns a superset of the song ids for which the regex pattern
+        matches the value of tag, or None.
+        """
+
+        if tag[:1] == "~" and tag not in _SYNTH_TAGS:
+            return None
+
+        runs = get_literal_runs(pattern)
+        if runs is None:
+            return None
+
+        found = sorted(
+            (self.__run_candidates(tag, run) for run in runs), key=len)
+        return found[0].intersection(*found[1:])
+
+    def __get_numeric(self, tag):
+        if tag not in self._numeric:
+            print_d("Indexing %r" % tag)
+            self._numeric[tag] = NumericColumn(tag, self._library.values())
+        return self._numeric[tag]
+
+    def __update_numeric(self, songs, removed=False):
+        if len(songs) > self.UPDATE_LIMIT:
+            self._numeric.clear()
+            return
+
+        for column in itervalues(self._numeric):
+            column.remove(songs)
+            if not removed:
+                column.add(songs)
+
+    def numeric_matches(self, tag, op, value):
+        """Returns a set of song ids for which `op(song(tag), value)` is
+        True for the numeric tag, like Numcmp does it, or None.
+
+        `op` is one of the functions in Numcmp.operators.
+        """
+
+        if "~" in tag[2:]:
+            return None
+
+        return self.__get_numeric(tag).select(op, value)
+
+    def __added(self, library, songs):
+        self.__register(songs)
+        self._memo.clear()
+        self.__update_numeric(songs)
+        for tag in self._tokens:
+            self.__index(tag, songs)
+
+    def __removed(self, library, songs):
+        self._memo.clear()
+        self.__update_numeric(songs, removed=True)
+        for tag in self._tokens:
+            for song in songs:
+                self.__unindex(tag, id(song))
+        for song in songs:
+            self._songs.pop(id(song), None)
+
+    def __changed(self, library, songs):
+        songs = [s for s in songs if id(s) in self._songs]
+        self._memo.clear()
+        self.__update_numeric(songs)
+        for tag in self._tokens:
+            self.__index(tag, songs)
@@ -13,6 +13,7 @@ These classes are the most basic library classes. As such they are the
 least useful but most content-agnostic.
 """
 
+import io
 import os
 import shutil
 import time
@@ -24,17 +25,23 @@ from quodlibet import _
 from quodlibet.formats import MusicFile, AudioFileError, load_audio_files, \
     dump_audio_files, SerializationError
 from quodlibet.query import Query
+from quodlibet.library.store import SongStore, StoreError, is_store
+from quodlibet.library.index import TagIndex
+from quodlibet.library.querycache import QueryCache
+from quodlibet.library.sortkeys import SortKeyCache
 from quodlibet.qltk.notif import Task
 from quodlibet.util.atomic import atomic_save
+from quodlibet.util.picklehelper import pickle_load, pickle_dump, PickleError
 from quodlibet.util.collection import Album
 from quodlibet.util.collections import DictMixin
+from quodlibet.util.thread import map_threaded
 from quodlibet import util
 from quodlibet import formats
 from quodlibet.util.dprint import print_d, print_w
 from quodlibet.util.path import unexpand, mkdir, normalize_path, ishidden, \
-    ismount
+    ismount, mtime
 from quodlibet.compat import iteritems, iterkeys, itervalues, listkeys, \
-    listvalues, listfilter
+    listvalues
 
 
 class Library(GObject.GObject, DictMixin):
@@ -66,6 +73,8 @@ class Library(GObject.GObject, DictMixin):
     def __init__(self, name=None):
         super(Library, self).__init__()
         self._contents = {}
+        # items added or changed since the last save
+        self._unsaved = set()
         self._name = name
         if self.librarian is not None and name is not None:
             self.librarian.register(self, name)
@@ -100,6 +109,36 @@ class Library(GObject.GObject, DictMixin):
             print_d("Changing %d items directly." % len(items), self)
             self._changed(items)
 
+    def do_added(self, items):
+        self._unsaved.update(items)
+        self.dirty = True
+
+    def do_changed(self, items):
+        self._unsaved.update(items)
+        self.dirty = True
+
+    def do_removed(self, items):
+        self._unsaved.difference_update(items)
+        self.dirty = True
+
+    def _get_unsaved(self, saved_keys):
+        """Returns what changed since the last save.
+
+        Since keys of items can change without them getting removed,
+        removed keys are the saved keys which are no longer part of the
+        library content.
+
+        Args:
+            saved_keys (set): keys of all items in the last save
+        Returns:
+            Tuple[list, set, set]: items added or changed, keys removed
+                and the keys of all items
+        """
+
+        keys = {item.key for item in self.get_content()}
+        unsaved = [item for item in self._unsaved if item.key in keys]
+        return unsaved, saved_keys - keys, keys
+
     def _changed(self, items):
         assert isinstance(items, set)
 
@@ -235,13 +274,68 @@ def _load_items(filename):
     return items
 
 
+def _stat_id(filename):
+    """Something identifying the current version of a file, or None"""
+
+    try:
+        stat = os.stat(filename)
+    except EnvironmentError:
+        return None
+    return (stat.st_size, stat.st_mtime)
+
+
+def _load_journal(filename, base_id):
+    """Load the journal records written on top of the base file with the
+    given id.
+
+    Returns:
+        Tuple[list, bool]: a list of (removed keys, items) records and if
+            the journal was readable to its end
+    """
+
+    records = []
+    try:
+        with io.open(filename, "rb") as fp:
+            try:
+                if pickle_load(fp) != base_id:
+                    print_w("Journal %r doesn't match, ignoring" % filename)
+                    return [], False
+                while fp.peek(1):
+                    removed, data = pickle_load(fp)
+                    records.append((removed, load_audio_files(data)))
+            except (PickleError, SerializationError, ValueError, TypeError):
+                util.print_exc()
+                return records, False
+    except EnvironmentError:
+        return [], True
+
+    return records, True
+
+
 class PicklingMixin(object):
-    """A mixin to provide persistence of a library by pickling to disk"""
+    """A mixin to provide persistence of a library by pickling to disk.
+
+    Saving appends the items which were added or changed and the keys of
+    removed items to a journal file next to the library file. Once the
+    journal gets too large compared to the library file both get merged
+    into a new library file.
+    """
 
     filename = None
 
+    JOURNAL_RATIO = 0.5
+    """Journal size relative to the library file size at which the journal
+    gets compacted into the library file on save
+    """
+
+    _saved_keys = None
+
+    def _journal_filename(self, filename):
+        return filename + ".journal"
+
     def load(self, filename):
-        """Load a library from a file, containing a picked list.
+        """Load a library from a file, containing a picked list,
+        applying the saved journal.
 
         Loading does not cause added, changed, or removed signals.
         """
@@ -251,30 +345,103 @@ class PicklingMixin(object):
 
         items = _load_items(filename)
 
+        journal = self._journal_filename(filename)
+        records, ok = _load_journal(journal, _stat_id(filename))
+        if records:
+            print_d("Applying %d journal records" % len(records), self)
+            contents = {item.key: item for item in items}
+            for removed, changed in records:
+                for key in removed:
+                    contents.pop(key, None)
+                for item in changed:
+                    contents[item.key] = item
+            items = listvalues(contents)
+
         # this loads all items without checking their validity, but makes
         # sure that non-mounted items are masked
         self._load_init(items)
 
+        # without a usable journal the next save has to write everything
+        self._saved_keys = {item.key for item in items} if ok else None
+
         print_d("Done loading contents of %r." % filename, self)
 
+    def _needs_compaction(self, filename):
+        try:
+            size = os.path.getsize(filename)
+        except EnvironmentError:
+            return True
+
+        try:
+            journal_size = os.path.getsize(self._journal_filename(filename))
+        except EnvironmentError:
+            return False
+
+        return journal_size > size * self.JOURNAL_RATIO
+
     def save(self, filename=None):
-        """Save the library to the given filename, or the default if `None`"""
+        """Save the library to the given filename, or the default if `None`.
+
+        Saving to the default file only appends the changes since the
+        last save to the journal.
+        """
 
         if filename is None:
             filename = self.filename
 
+        if filename == self.filename and self._saved_keys is not None and \
+                not self._needs_compaction(filename):
+            self._save_journal(filename)
+        else:
+            self._save_full(filename)
+
+    def _save_full(self, filename):
         print_d("Saving contents to %r." % filename, self)
 
+        content = self.get_content()
+        journal = self._journal_filename(filename)
         try:
             dirname = os.path.dirname(filename)
             mkdir(dirname)
             with atomic_save(filename, "wb") as fileobj:
-                fileobj.write(dump_audio_files(self.get_content()))
+                fileobj.write(dump_audio_files(content))
                 # unhandled SerializationError, shouldn't happen -> better
                 # not replace the library file with nothing
+            if os.path.exists(journal):
+                os.remove(journal)
         except EnvironmentError:
             print_w("Couldn't save library to path: %r" % filename)
         else:
+            if filename == self.filename:
+                self._saved_keys = {item.key for item in content}
+                self._unsaved.clear()
+            self.dirty = False
+
+    def _save_journal(self, filename):
+        unsaved, removed, keys = self._get_unsaved(self._saved_keys)
+        if not unsaved and not removed:
+            self.dirty = False
+            return
+
+        journal = self._journal_filename(filename)
+        print_d("Appending %d changed, %d removed items to %r." % (
+            len(unsaved), len(removed), journal), self)
+
+        try:
+            with io.open(journal, "ab") as fileobj:
+                if not fileobj.tell():
+                    pickle_dump(_stat_id(filename), fileobj, 2)
+                pickle_dump(
+                    (list(removed), dump_audio_files(unsaved)), fileobj, 2)
+                fileobj.flush()
+                os.fsync(fileobj.fileno())
+        except EnvironmentError:
+            print_w("Couldn't save library journal to path: %r" % journal)
+            # we don't know what got written, start from scratch next time
+            self._saved_keys = None
+        else:
+            self._saved_keys = keys
+            self._unsaved.clear()
             self.dirty = False
 
 
@@ -286,6 +453,118 @@ class PicklingLibrary(Library, PicklingMixin):
         Library.__init__(self, name)
 
 
+class StoreMixin(object):
+    """A mixin to provide persistence of a FileLibrary through a SongStore.
+
+    Only items which were added or changed since the last save get
+    written, removed items get deleted from the store. The directory
+    mtimes used by `FileLibrary.rebuild` get saved as well.
+    An existing pickled library file gets migrated on load, a copy of it
+    is kept with a ".pickle" suffix.
+    """
+
+    filename = None
+    _store = None
+
+    def __init__(self, *args, **kwargs):
+        super(StoreMixin, self).__init__(*args, **kwargs)
+        self._stored_keys = set()
+        self._stored_dir_mtimes = None
+
+    def destroy(self):
+        super(StoreMixin, self).destroy()
+        self.__close_store()
+
+    def __close_store(self):
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    def __migrate(self, filename):
+        print_d("Migrating pickled library %r" % filename, self)
+        items = _load_items(filename)
+        try:
+            shutil.copy(filename, filename + ".pickle")
+        except EnvironmentError:
+            util.print_exc()
+        return SongStore.create(filename, items)
+
+    def load(self, filename):
+        """Load a library from a store, migrating a pickled library file
+        if needed. Items get loaded in chunks.
+
+        Loading does not cause added, changed, or removed signals.
+        """
+
+        self.__close_store()
+        self.filename = filename
+        print_d("Loading contents of %r." % filename, self)
+
+        try:
+            if os.path.exists(filename) and not is_store(filename):
+                store = self.__migrate(filename)
+            else:
+                mkdir(os.path.dirname(filename))
+                store = SongStore(filename)
+            for items in store.iter_chunks():
+                # this loads all items without checking their validity,
+                # but makes sure that non-mounted items are masked
+                self._load_init(items)
+                self._stored_keys.update(item.key for item in items)
+            self._dir_mtimes = self._stored_dir_mtimes = \
+                store.get_dir_mtimes()
+        except (StoreError, EnvironmentError):
+            util.print_exc()
+            print_w("Couldn't load library store from: %r" % filename)
+            # move the broken file out of the way
+            try:
+                shutil.move(filename, filename + ".not-valid")
+            except EnvironmentError:
+                util.print_exc()
+            return
+
+        self._store = store
+        print_d("Done loading contents of %r." % filename, self)
+
+    def save(self, filename=None):
+        """Save the library to the given filename, or the default if `None`.
+
+        Saving to the default file only writes what changed.
+        """
+
+        if filename is None:
+            filename = self.filename
+
+        print_d("Saving contents to %r." % filename, self)
+
+        try:
+            if self._store is None or filename != self.filename:
+                content = self.get_content()
+                mkdir(os.path.dirname(filename))
+                store = SongStore.create(filename, content)
+                store.set_dir_mtimes(self._dir_mtimes)
+                if filename != self.filename:
+                    store.close()
+                    return
+                self._store = store
+                self._stored_keys = {i.key for i in content}
+            else:
+                unsaved, removed, keys = self._get_unsaved(self._stored_keys)
+                print_d("Writing %d, removing %d items." % (
+                    len(unsaved), len(removed)), self)
+                self._store.update(unsaved, removed)
+                self._stored_keys = keys
+                if self._dir_mtimes is not self._stored_dir_mtimes:
+                    self._store.set_dir_mtimes(self._dir_mtimes)
+            self._stored_dir_mtimes = self._dir_mtimes
+        except (StoreError, EnvironmentError):
+            util.print_exc()
+            print_w("Couldn't save library to path: %r" % filename)
+        else:
+            self._unsaved.clear()
+            self.dirty = False
+
+
 class AlbumLibrary(Library):
     """An AlbumLibrary listens to a SongLibrary and sorts its songs into
     albums.
@@ -302,6 +581,9 @@ class AlbumLibrary(Library):
             "AlbumLibrary for %s" % library._name)
 
         self._library = library
+        # id(song) -> the Album it is in, so we don't have to search for
+        # songs whose album_key changed
+        self._song_albums = {}
         self._asig = library.connect('added', self.__added)
         self._rsig = library.connect('removed', self.__removed)
         self._csig = library.connect('changed', self.__changed)
@@ -318,27 +600,38 @@ class AlbumLibrary(Library):
     def _get(self, item):
         return self._contents.get(item)
 
-    def __add(self, items):
-        changed = set()
+    def __add(self, items, updates):
+        """Adds the songs to their albums and returns the new albums.
+
+        Songs added to existing albums get recorded in updates.
+        """
+
         new = set()
+        contents = self._contents
+        song_albums = self._song_albums
         for song in items:
             key = song.album_key
-            if key in self._contents:
-                changed.add(self._contents[key])
-            else:
+            album = contents.get(key)
+            if album is None:
                 album = Album(song)
-                self._contents[key] = album
+                contents[key] = album
                 new.add(album)
-            self._contents[key].songs.add(song)
-
-        changed -= new
-        return changed, new
+            elif album not in new:
+                _get_update(updates, album)[0].append(song)
+            album.songs.add(song)
+            song_albums[id(song)] = album
+        return new
+
+    def __finalize(self, updates):
+        # every album only gets updated once per signal
+        for album, (added, removed, changed) in iteritems(updates):
+            album.finalize(added, removed, changed)
+        return set(updates)
 
     def __added(self, library, items, signal=True):
-        changed, new = self.__add(items)
-
-        for album in changed:
-            album.finalize()
+        updates = {}
+        new = self.__add(items, updates)
+        changed = self.__finalize(updates)
 
         if signal:
             if new:
@@ -347,21 +640,21 @@ class AlbumLibrary(Library):
                 self.emit('changed', changed)
 
     def __removed(self, library, items):
-        changed = set()
+        updates = {}
         removed = set()
         for song in items:
-            key = song.album_key
-            album = self._contents[key]
+            album = self._song_albums.pop(id(song), None)
+            if album is None:
+                continue
             album.songs.remove(song)
-            changed.add(album)
+            _get_update(updates, album)[1].append(song)
             if not album.songs:
                 removed.add(album)
-                del self._contents[key]
-
-        changed -= removed
+                del self._contents[album.key]
 
-        for album in changed:
-            album.finalize()
+        for album in removed:
+            del updates[album]
+        changed = self.__finalize(updates)
 
         if removed:
             self.emit('removed', removed)
@@ -369,40 +662,38 @@ class AlbumLibrary(Library):
             self.emit('changed', changed)
 
     def __changed(self, library, items):
-        """Album keys could change between already existing ones.. so we
-        have to do it the hard way and search by id."""
+        """Album keys could change between already existing ones, so songs
+        get moved from the album they were in to their new one."""
         print_d("Updating affected albums for %d items" % len(items))
-        changed = set()
+        updates = {}
         removed = set()
         to_add = []
+        song_albums = self._song_albums
         for song in items:
-            # in case the key hasn't changed
-            key = song.album_key
-            if key in self._contents and song in self._contents[key].songs:
-                changed.add(self._contents[key])
-            else:  # key changed.. look for it in each album
-                to_add.append(song)
-                for key, album in iteritems(self._contents):
-                    if song in album.songs:
-                        album.songs.remove(song)
-                        if not album.songs:
-                            removed.add(album)
-                        else:
-                            changed.add(album)
-                        break
+            album = song_albums.get(id(song))
+            if album is not None and album.key == song.album_key:
+                # the key hasn't changed
+                _get_update(updates, album)[2].append(song)
+                continue
+
+            to_add.append(song)
+            if album is not None:
+                del song_albums[id(song)]
+                album.songs.remove(song)
+                _get_update(updates, album)[1].append(song)
+                if not album.songs:
+                    removed.add(album)
 
         # get new albums and changed ones because keys could have changed
-        add_changed, new = self.__add(to_add)
-        changed |= add_changed
+        new = self.__add(to_add, updates)
 
         # check if albums that were empty at some point are still empty
+        removed = {album for album in removed if not album.songs}
         for album in removed:
-            if not album.songs:
-                del self._contents[album.key]
-                changed.discard(album)
+            del self._contents[album.key]
+            del updates[album]
 
-        for album in changed:
-            album.finalize()
+        changed = self.__finalize(updates)
 
         if removed:
             self.emit("removed", removed)
@@ -412,6 +703,14 @@ class AlbumLibrary(Library):
             self.emit("added", new)
 
 
+def _get_update(updates, album):
+    """Returns the lists of added, removed and changed songs for album"""
+
+    if album not in updates:
+        updates[album] = ([], [], [])
+    return updates[album]
+
+
 class SongLibrary(PicklingLibrary):
     """A library for songs.
 
@@ -419,6 +718,9 @@ class SongLibrary(PicklingLibrary):
     interface.
     """
 
+    tag_index = None
+    """A TagIndex used for queries, see enable_tag_index()"""
+
     def __init__(self, *args, **kwargs):
         super(SongLibrary, self).__init__(*args, **kwargs)
 
@@ -426,10 +728,39 @@ class SongLibrary(PicklingLibrary):
     def albums(self):
         return AlbumLibrary(self)
 
+    @util.cached_property
+    def query_cache(self):
+        """A QueryCache shared by everything querying this library"""
+
+        return QueryCache(self)
+
+    @util.cached_property
+    def sort_keys(self):
+        """A SortKeyCache shared by everything sorting songs of this
+        library"""
+
+        return SortKeyCache(self)
+
+    def enable_tag_index(self):
+        """Keep an inverted tag index to speed up queries.
+
+        Should be called after the library is loaded.
+        """
+
+        if self.tag_index is None:
+            self.tag_index = TagIndex(self)
+
     def destroy(self):
         super(SongLibrary, self).destroy()
         if "albums" in self.__dict__:
             self.albums.destroy()
+        if "query_cache" in self.__dict__:
+            self.query_cache.destroy()
+        if "sort_keys" in self.__dict__:
+            self.sort_keys.destroy()
+        if self.tag_index is not None:
+            self.tag_index.destroy()
+            self.tag_index = None
 
     def tag_values(self, tag):
         """Return a set of all values for the given tag."""
@@ -465,7 +796,7 @@ class SongLibrary(PicklingLibrary):
 
         songs = self.values()
         if text != "":
-            songs = listfilter(Query(text, star).search, songs)
+            songs = self.query_cache.filter(text, star)
         return songs
 
 
@@ -513,6 +844,32 @@ def iter_paths(root, exclude=[], skip_hidden=True):
             yield fullfilename
 
 
+def _get_file_mtimes(dirname):
+    """Returns a dict mapping the names of all entries of a directory to
+    their mtimes, or None if the directory can't be listed.
+    """
+
+    mtimes = {}
+    scandir = getattr(os, "scandir", None)
+    try:
+        if scandir is not None:
+            for entry in scandir(dirname):
+                try:
+                    mtimes[entry.name] = entry.stat().st_mtime
+                except OSError:
+                    pass
+        else:
+            for name in os.listdir(dirname):
+                try:
+                    mtimes[name] = os.path.getmtime(
+                        os.path.join(dirname, name))
+                except OSError:
+                    pass
+    except OSError:
+        return None
+    return mtimes
+
+
 class FileLibrary(PicklingLibrary):
     """A library containing items on a local(-ish) filesystem.
 
@@ -523,6 +880,9 @@ class FileLibrary(PicklingLibrary):
     def __init__(self, name=None):
         super(FileLibrary, self).__init__(name)
         self._masked = {}
+        # directory -> mtime of the directory when all its files were
+        # last found valid, see rebuild(fast=True)
+        self._dir_mtimes = {}
 
     def _load_init(self, items):
         """Add many items to the library, check if the
@@ -630,13 +990,74 @@ class FileLibrary(PicklingLibrary):
             else:
                 removed.add(item)
 
-    def rebuild(self, paths, force=False, exclude=[], cofuncid=None):
+    def _find_outdated(self, outdated, dir_mtimes, cofuncid=None):
+        """Adds (key, item) pairs which might need to be reloaded to
+        `outdated` and the new directory mtimes to `dir_mtimes`.
+
+        Files are grouped by directory and directories with an mtime
+        matching the last rebuild are skipped. For the rest the mtimes of
+        all contained files are collected in one go. Since in-place writes
+        don't change the directory mtime, changes to files which aren't
+        saved through a rename will be missed.
+
+        This is a generator and can be copooled.
+        """
+
+        task = Task(_("Library"), _("Checking folders"))
+        if cofuncid:
+            task.copool(cofuncid)
+
+        by_dir = {}
+        for key, item in iteritems(self._contents):
+            if getattr(item, "is_file", False):
+                dirname = os.path.dirname(item["~filename"])
+                by_dir.setdefault(dirname, []).append((key, item))
+            else:
+                outdated.append((key, item))
+
+        old_dir_mtimes = self._dir_mtimes
+        skipped = 0
+        for i, dirname in task.list(enumerate(sorted(by_dir))):
+            if i % 100 == 0:
+                yield True
+
+            dir_mtime = mtime(dirname)
+            if not dir_mtime:
+                outdated.extend(by_dir[dirname])
+                continue
+
+            if old_dir_mtimes.get(dirname) == dir_mtime:
+                dir_mtimes[dirname] = dir_mtime
+                skipped += 1
+                continue
+
+            file_mtimes = _get_file_mtimes(dirname)
+            if file_mtimes is None:
+                outdated.extend(by_dir[dirname])
+                continue
+
+            for key, item in by_dir[dirname]:
+                name = os.path.basename(item["~filename"])
+                file_mtime = file_mtimes.get(name, 0)
+                if not file_mtime or item.get("~#mtime", 0) != file_mtime:
+                    outdated.append((key, item))
+            dir_mtimes[dirname] = dir_mtime
+
+        print_d("Skipped %d of %d folders." % (skipped, len(by_dir)), self)
+        outdated.sort()
+
+    def rebuild(self, paths, force=False, exclude=[], cofuncid=None,
+                workers=1, fast=False):
         """Reload or remove songs if they have changed or been deleted.
 
         This generator rebuilds the library over the course of iteration.
 
         Any paths given will be scanned for new files, using the 'scan'
-        method.
+        method, see there for the meaning of `workers`.
+
+        If `fast` is True (and `force` isn't), only songs in directories
+        which changed since the last rebuild get checked, see
+        `_find_outdated`.
 
         Only items present in the library when the rebuild is started
         will be checked.
@@ -657,11 +1078,20 @@ class FileLibrary(PicklingLibrary):
                 self.emit('added', items.values())
                 yield True
 
+        dir_mtimes = None
+        if fast and not force:
+            items = []
+            dir_mtimes = {}
+            for value in self._find_outdated(items, dir_mtimes, cofuncid):
+                yield value
+        else:
+            items = sorted(self.items())
+
         task = Task(_("Library"), _("Scanning library"))
         if cofuncid:
             task.copool(cofuncid)
         changed, removed = set(), set()
-        for i, (key, item) in task.list(enumerate(sorted(self.items()))):
+        for i, (key, item) in task.list(enumerate(items)):
             if key in self._contents and force or not item.valid():
                 self.reload(item, changed, removed)
                 # These numbers are pretty empirical. We should yield more
@@ -682,7 +1112,13 @@ class FileLibrary(PicklingLibrary):
         if changed:
             self.emit('changed', changed)
 
-        for value in self.scan(paths, exclude, cofuncid):
+        # only remember the checked directories once everything in them
+        # got reloaded
+        if dir_mtimes is not None and dir_mtimes != self._dir_mtimes:
+            self._dir_mtimes = dir_mtimes
+            self.dirty = True
+
+        for value in self.scan(paths, exclude, cofuncid, workers):
             yield value
 
     def add_filename(self, filename, add=True):
@@ -702,7 +1138,26 @@ class FileLibrary(PicklingLibrary):
 
         raise NotImplementedError
 
-    def scan(self, paths, exclude=[], cofuncid=None):
+    def load_filename(self, filename):
+        """Load an item from a file without adding it to the library.
+
+        This gets called from worker threads by `scan`, so it must not
+        touch the library. Returns None if the file can't be loaded.
+
+        Subclasses must override this to open the file correctly.
+        """
+
+        raise NotImplementedError
+
+    def scan(self, paths, exclude=[], cofuncid=None, workers=1):
+        """Scan paths for new files and add them to the library.
+
+        If `workers` is larger than 1 files get loaded in that many
+        threads, otherwise one after another in the main loop.
+
+        If this function is copooled, set "cofuncid" to enable pause/stop
+        buttons in the UI.
+        """
 
         def need_yield(last_yield=[0]):
             current = time.time()
@@ -746,16 +1201,29 @@ class FileLibrary(PicklingLibrary):
             if cofuncid:
                 task.copool(cofuncid)
 
+            if workers > 1:
+                print_d("Loading %d files using %d threads" % (
+                    len(paths_to_load), workers), self)
+                results = map_threaded(
+                    self.load_filename, paths_to_load, workers)
+            else:
+                results = ([self.add_filename(p, False)]
+                           for p in paths_to_load)
+
             added = []
-            for real_path in task.gen(paths_to_load):
-                item = self.add_filename(real_path, False)
-                if item is not None:
-                    added.append(item)
-                    if len(added) > 100 or need_added():
-                        self.add(added)
-                        added = []
-                        yield
-                if added and need_yield():
+            done = 0
+            for items in results:
+                done += len(items)
+                if paths_to_load:
+                    task.update(float(done) / len(paths_to_load))
+                for item in items:
+                    if item is not None:
+                        added.append(item)
+                if len(added) > 100 or (added and need_added()):
+                    self.add(added)
+                    added = []
+                    yield
+                elif not items or need_yield():
                     yield
             if added:
                 self.add(added)
@@ -802,7 +1270,10 @@ class FileLibrary(PicklingLibrary):
             if item.mountpoint == point:
                 removed[item.key] = item
         if removed:
+            # masked items are still part of the content and get saved
+            unsaved = self._unsaved.intersection(itervalues(removed))
             self.remove(removed.values())
+            self._unsaved.update(unsaved)
             self._masked.setdefault(point, {}).update(removed)
 
     @property
@@ -822,9 +1293,9 @@ class FileLibrary(PicklingLibrary):
         self._masked.pop(mount_point, {})
 
 
-class SongFileLibrary(SongLibrary, FileLibrary):
+class SongFileLibrary(StoreMixin, SongLibrary, FileLibrary):
     """A library containing song files.
-    Pickles contents to disk as `FileLibrary`"""
+    Stores its contents in a `SongStore`, see `StoreMixin`"""
 
     def __init__(self, name=None):
         print_d("Initializing SongFileLibrary \"%s\"." % name)
@@ -834,6 +1305,9 @@ class SongFileLibrary(SongLibrary, FileLibrary):
         key = normalize_path(filename, True)
         return key in self._contents
 
+    def load_filename(self, filename):
+        return MusicFile(filename)
+
     def add_filename(self, filename, add=True):
         """Add a song to the library based on filename.
 
@@ -850,7 +1324,7 @@ class SongFileLibrary(SongLibrary, FileLibrary):
         key = normalize_path(filename, True)
         song = None
         if key not in self._contents:
-            song = MusicFile(filename)
+            song = self.load_filename(filename)
             if song and add:
                 self.add([song])
         else:
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+"""A cache of parsed queries and their results for a SongLibrary.
+
+The results are kept up to date using the library signals: only the
+added, removed and changed songs get tested again.
+"""
+
+import collections
+
+from quodlibet.query import Query
+from quodlibet.util.dprint import print_d
+from quodlibet.compat import itervalues
+
+
+class _Entry(object):
+
+    __slots__ = ("query", "results")
+
+    def __init__(self, query):
+        self.query = query
+        # id(song) -> song, or None if not known
+        self.results = None
+
+
+class QueryCache(object):
+    """Maps (query string, star tags) to the parsed Query and the songs of
+    the library matching it.
+
+    Results of queries depending on things other than the song itself,
+    like the current time or query plugins, don't get cached. Queries
+    possibly using query plugins don't get cached at all.
+    """
+
+    SIZE = 50
+    """Number of queries to keep"""
+
+    RESULT_LIMIT = 500000
+    """Maximum number of songs referenced by all cached results together,
+    results of the least recently used queries get dropped first"""
+
+    UPDATE_LIMIT = 500
+    """All results get dropped if more songs change at once"""
+
+    def __init__(self, library):
+        self._library = library
+        self._entries = collections.OrderedDict()
+        self._result_count = 0
+        self._sigs = [
+            library.connect('added', self.__added),
+            library.connect('removed', self.__removed),
+            library.connect('changed', self.__changed),
+        ]
+
+    def destroy(self):
+        for sig in self._sigs:
+            self._library.disconnect(sig)
+        self._sigs = []
+        self.clear()
+
+    def clear(self):
+        """Forget all queries and results"""
+
+        self._entries.clear()
+        self._result_count = 0
+
+    def __get_entry(self, text, star):
+        if star is None:
+            star = Query.STAR
+        key = (text, tuple(star))
+
+        entries = self._entries
+        entry = entries.pop(key, None)
+        if entry is None:
+            entry = _Entry(Query(text, star))
+            if "@" in text:
+                # might use a query plugin, which can get enabled or
+                # disabled at any time, so parse it again next time
+                return entry
+            while len(entries) >= self.SIZE:
+                self.__drop_results(entries.popitem(last=False)[1])
+        entries[key] = entry
+        return entry
+
+    def __drop_results(self, entry):
+        if entry.results is not None:
+            self._result_count -= len(entry.results)
+            entry.results = None
+
+    def get(self, text, star=None):
+        """Returns a Query for the text, like Query(text, star) does.
+
+        The returned query is shared and shouldn't be modified.
+        Raises Query.error like Query() does.
+        """
+
+        return self.__get_entry(text, star).query
+
+    def filter(self, text, star=None):
+        """Returns a list of all songs in the library matching the query,
+        in no particular order.
+
+        Raises Query.error like Query() does.
+        """
+
+        entry = self.__get_entry(text, star)
+        if entry.results is None:
+            query = entry.query
+            songs = query.filter(self._library)
+            if query._volatile():
+                return songs
+
+            entry.results = dict((id(s), s) for s in songs)
+            self._result_count += len(songs)
+            self.__enforce_limit(entry)
+
+        return list(itervalues(entry.results))
+
+    def __enforce_limit(self, keep):
+        for entry in itervalues(self._entries):
+            if self._result_count <= self.RESULT_LIMIT:
+                break
+            if entry is not keep:
+                self.__drop_results(entry)
+
+    def __cached(self):
+        return [e for e in itervalues(self._entries) if e.results is not None]
+
+    def __update(self, songs):
+        entries = self.__cached()
+        if not entries:
+            return
+
+        if len(songs) > self.UPDATE_LIMIT:
+            print_d("Dropping %d cached query results" % len(entries))
+            for entry in entries:
+                self.__drop_results(entry)
+            return
+
+        for entry in entries:
+            search = entry.query.search
+            results = entry.results
+            before = len(results)
+            for song in songs:
+                if search(song):
+                    results[id(song)] = song
+                else:
+                    results.pop(id(song), None)
+            self._result_count += len(results) - before
+        self.__enforce_limit(None)
+
+    def __added(self, library, songs):
+        self.__update(songs)
+
+    def __changed(self, library, songs):
+        self.__update([s for s in songs if s in library])
+
+    def __removed(self, library, songs):
+        for entry in self.__cached():
+            results = entry.results
+            before = len(results)
+            for song in songs:
+                results.pop(id(song), None)
+            self._result_count += len(results) - before
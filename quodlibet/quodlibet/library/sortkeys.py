@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+"""A cache of sort keys for the songs of a SongLibrary.
+
+Keys get computed when first needed and dropped using the library
+signals once a song changes or gets removed. They can be saved next to
+the library, so sorting is fast right after starting as well.
+"""
+
+import collections
+
+from quodlibet import util
+from quodlibet.formats._audio import EXTERNAL_TAGS
+from quodlibet.pattern import Pattern
+from quodlibet.util.atomic import atomic_save
+from quodlibet.util.picklehelper import pickle_loads, pickle_dumps, \
+    no_globals, PicklingError, UnpicklingError
+from quodlibet.util.path import mtime
+from quodlibet.util.dprint import print_d
+from quodlibet.compat import iteritems, itervalues
+
+
+class SortKeyCache(object):
+    """Maps a name and song to the sort key for that song.
+
+    Names are usually the tag or pattern of a song list column, each
+    name has to always stand for the same sort function.
+    Sort keys depending on things other than the song itself, like the
+    default rating or the current time, don't get cached.
+    """
+
+    SIZE = 8
+    """Number of names to keep the keys for"""
+
+    dirty = False
+    """If keys were added since the last save() or load()"""
+
+    def __init__(self, library):
+        self._library = library
+        # name -> {id(song): sort key}
+        self._entries = collections.OrderedDict()
+        self._sigs = [
+            library.connect('changed', self.__forget),
+            library.connect('removed', self.__forget),
+        ]
+
+    def destroy(self):
+        for sig in self._sigs:
+            self._library.disconnect(sig)
+        self._sigs = []
+        self.clear()
+
+    def clear(self):
+        """Forget all sort keys"""
+
+        self._entries.clear()
+
+    def __get_entry(self, name):
+        entries = self._entries
+        keys = entries.pop(name, None)
+        if keys is None:
+            keys = {}
+            while len(entries) >= self.SIZE:
+                entries.popitem(last=False)
+        entries[name] = keys
+        return keys
+
+    def get_func(self, name, func):
+        """Returns a function returning the same as func(song), but which
+        uses and fills the cache for songs of the library.
+        """
+
+        if "<" in name:
+            # conditions can depend on the time or the default rating
+            if Pattern(name).volatile:
+                return func
+        elif not EXTERNAL_TAGS.isdisjoint(util.tagsplit(name)):
+            return func
+
+        keys = self.__get_entry(name)
+        contents = self._library._contents
+
+        def cached_func(song):
+            try:
+                return keys[id(song)]
+            except KeyError:
+                value = func(song)
+                # songs not in the library never get forgotten
+                if contents.get(song.key) is song:
+                    keys[id(song)] = value
+                    self.dirty = True
+                return value
+
+        return cached_func
+
+    def __forget(self, library, songs):
+        for keys in itervalues(self._entries):
+            if keys:
+                for song in songs:
+                    keys.pop(id(song), None)
+
+    def save(self, filename):
+        """Saves all cached sort keys to filename"""
+
+        print_d("Saving sort keys to %r" % filename, self)
+
+        songs = dict((id(s), s) for s in itervalues(self._library))
+        data = {}
+        for name, keys in iteritems(self._entries):
+            data[name] = [(songs[i].key, value)
+                          for i, value in iteritems(keys) if i in songs]
+
+        try:
+            with atomic_save(filename, "wb") as fileobj:
+                fileobj.write(pickle_dumps(data, 2))
+        except (EnvironmentError, PicklingError):
+            util.print_exc()
+        else:
+            self.dirty = False
+
+    def load(self, filename):
+        """Loads sort keys saved with save(). Nothing gets loaded if the
+        library file was written after them.
+        """
+
+        library_filename = getattr(self._library, "filename", None)
+        if library_filename and mtime(library_filename) > mtime(filename):
+            print_d("Sort keys in %r are outdated" % filename, self)
+            return
+
+        try:
+            with open(filename, "rb") as fileobj:
+                data = pickle_loads(fileobj.read(), no_globals)
+        except EnvironmentError:
+            return
+        except UnpicklingError:
+            util.print_exc()
+            return
+
+        contents = self._library._contents
+        self.clear()
+        try:
+            for name, items in iteritems(data):
+                keys = self.__get_entry(name)
+                for key, value in items:
+                    song = contents.get(key)
+                    if song is not None:
+                        keys[id(song)] = value
+        except (TypeError, ValueError, AttributeError):
+            util.print_exc()
+            self.clear()
+        self.dirty = False
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+"""An indexed SQLite store for AudioFiles.
+
+Every item is serialized on its own and keyed by its library key, so
+saving a library only has to touch the items that changed since the last
+save and loading can happen in chunks.
+"""
+
+import os
+import sqlite3
+
+from senf import fsn2bytes, bytes2fsn
+
+from quodlibet.formats import dump_audio_file, load_audio_file_entries, \
+    SerializationError
+from quodlibet.util.dprint import print_d
+from quodlibet.compat import iteritems
+
+
+class StoreError(Exception):
+    pass
+
+
+_SQLITE_MAGIC = b"SQLite format 3\x00"
+
+
+def is_store(filename):
+    """If the file at filename is a (possibly empty) SongStore database.
+
+    Returns False if it doesn't exist.
+    """
+
+    try:
+        with open(filename, "rb") as h:
+            header = h.read(len(_SQLITE_MAGIC))
+    except EnvironmentError:
+        return False
+    return header == _SQLITE_MAGIC
+
+
+def _encode_key(key):
+    return sqlite3.Binary(fsn2bytes(key, "utf-8"))
+
+
+class SongStore(object):
+    """A SQLite database of serialized AudioFiles, keyed by item.key
+
+    Raises StoreError in case the database can't be opened or has an
+    incompatible version.
+    """
+
+    VERSION = 1
+    """Bump when the schema or the entry format changes"""
+
+    def __init__(self, filename):
+        self.filename = filename
+
+        try:
+            self._db = sqlite3.connect(filename)
+            self._setup()
+        except sqlite3.Error as e:
+            raise StoreError(e)
+
+    def _setup(self):
+        db = self._db
+        with db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS meta "
+                "(name TEXT PRIMARY KEY, value INTEGER)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS songs "
+                "(key BLOB PRIMARY KEY, data BLOB NOT NULL)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS dirs "
+                "(path BLOB PRIMARY KEY, mtime REAL NOT NULL)")
+            row = db.execute(
+                "SELECT value FROM meta WHERE name = 'version'").fetchone()
+            if row is None:
+                db.execute(
+                    "INSERT INTO meta (name, value) VALUES ('version', ?)",
+                    (self.VERSION,))
+            elif row[0] != self.VERSION:
+                raise StoreError("unsupported store version %r" % row[0])
+
+    def close(self):
+        self._db.close()
+
+    def __len__(self):
+        try:
+            return self._db.execute("SELECT COUNT(*) FROM songs").fetchone()[0]
+        except sqlite3.Error as e:
+            raise StoreError(e)
+
+    def iter_chunks(self, chunk_size=2000):
+        """Yields lists of loaded AudioFiles, at most chunk_size each.
+
+        Entries which fail to load are skipped.
+        """
+
+        try:
+            cursor = self._db.execute("SELECT data FROM songs")
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield load_audio_file_entries([bytes(r[0]) for r in rows])
+        except sqlite3.Error as e:
+            raise StoreError(e)
+
+    def update(self, items, removed_keys):
+        """Writes all passed items and removes the entries for all
+        removed keys in one transaction.
+        """
+
+        rows = []
+        for item in items:
+            try:
+                data = dump_audio_file(item)
+            except SerializationError:
+                print_d("Can't serialize %r, skipping" % item.key)
+                continue
+            rows.append((_encode_key(item.key), sqlite3.Binary(data)))
+
+        try:
+            with self._db as db:
+                db.executemany(
+                    "DELETE FROM songs WHERE key = ?",
+                    [(_encode_key(k),) for k in removed_keys])
+                db.executemany(
+                    "INSERT OR REPLACE INTO songs (key, data) VALUES (?, ?)",
+                    rows)
+        except sqlite3.Error as e:
+            raise StoreError(e)
+
+    def get_dir_mtimes(self):
+        """Returns the saved dict of directory paths to mtimes"""
+
+        try:
+            rows = self._db.execute("SELECT path, mtime FROM dirs")
+            return {bytes2fsn(bytes(path), "utf-8"): mtime
+                    for path, mtime in rows}
+        except sqlite3.Error as e:
+            raise StoreError(e)
+
+    def set_dir_mtimes(self, dir_mtimes):
+        """Replaces the saved directory mtimes with the passed dict"""
+
+        try:
+            with self._db as db:
+                db.execute("DELETE FROM dirs")
+                db.executemany(
+                    "INSERT INTO dirs (path, mtime) VALUES (?, ?)",
+                    [(_encode_key(p), m) for p, m in iteritems(dir_mtimes)])
+        except sqlite3.Error as e:
+            raise StoreError(e)
+
+    @classmethod
+    def create(cls, filename, items):
+        """Creates a new store at filename containing items, replacing any
+        existing file only once everything is written.
+        """
+
+        temp = filename + ".tmp"
+        if os.path.exists(temp):
+            os.remove(temp)
+
+        store = cls(temp)
+        try:
+            store.update(items, [])
+        finally:
+            store.close()
+
+        if os.name == "nt" and os.path.exists(filename):
+            os.remove(filename)
+        os.rename(temp, filename)
+
+        return cls(filename)
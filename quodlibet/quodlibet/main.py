@@ -45,11 +45,23 @@ def main(argv=None):
     from quodlibet import config
     from quodlibet import browsers
     from quodlibet import util
+    from quodlibet.pattern import pattern_cache
+    from quodlibet.util.cover.index import cover_index
 
     app.name = "Quod Libet"
     app.id = "quodlibet"
     quodlibet.set_application_info(Icons.QUODLIBET, app.id, app.name)
 
+    patterns_path = os.path.join(quodlibet.get_user_dir(), "patterns")
+    persist_patterns = config.getboolean("settings", "persist_patterns")
+    if persist_patterns:
+        pattern_cache.load(patterns_path)
+
+    cover_index_path = os.path.join(quodlibet.get_user_dir(), "covers.index")
+    persist_cover_index = config.getboolean("albumart", "persist_index")
+    if persist_cover_index:
+        cover_index.load(cover_index_path)
+
     library_path = os.path.join(quodlibet.get_user_dir(), "songs")
 
     print_d("Initializing main library (%s)" % (
@@ -215,6 +227,10 @@ def main(argv=None):
 
     tracker.destroy()
     quodlibet.library.save()
+    if persist_patterns:
+        pattern_cache.save(patterns_path)
+    if persist_cover_index and cover_index.dirty:
+        cover_index.save(cover_index_path)
 
     config.save()
 
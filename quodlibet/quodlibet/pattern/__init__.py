@@ -6,9 +6,11 @@
 from ._pattern import (Pattern, FileFromPattern, XMLFromPattern,
     XMLFromMarkupPattern, error,
     ArbitraryExtensionFileFromPattern, URLFromPattern)
+from ._pattern import pattern_cache
 
 
 URLFromPattern
+pattern_cache
 ArbitraryExtensionFileFromPattern
 FileFromPattern
 Pattern
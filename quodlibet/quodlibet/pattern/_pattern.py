@@ -13,15 +13,23 @@
 
 import os
 import re
+import types
+import marshal
+import itertools
+import collections
 from re import Scanner
 
 from senf import sep, fsnative, expanduser
 
 from quodlibet import util
+from quodlibet import const
 from quodlibet.query import Query
-from quodlibet.compat import exec_, itervalues
+from quodlibet.util.atomic import atomic_save
+from quodlibet.util.dprint import print_d
+from quodlibet.compat import exec_, itervalues, izip, builtins
 from quodlibet.util.path import strip_win32_incompat_from_path, limit_path
-from quodlibet.formats._audio import decode_value, FILESYSTEM_TAGS
+from quodlibet.formats._audio import decode_value, FILESYSTEM_TAGS, \
+    EXTERNAL_TAGS
 from quodlibet.compat import quote_plus, text_type, number_types
 
 # Token types.
@@ -182,15 +190,66 @@ class PatternParser(object):
             self.lookahead = PatternLexeme(EOF, "")
 
 
+class ResultCache(object):
+    """A LRU cache for the results of all formatters, keyed by formatter
+    and song revision.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._entries = collections.OrderedDict()
+        self._ids = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def new_id(self):
+        """Returns a new ID for keys of a formatter"""
+
+        return next(self._ids)
+
+    def clear(self):
+        self._entries.clear()
+
+    def get(self, key):
+        """Returns the value for key, raises KeyError"""
+
+        entries = self._entries
+        value = entries.pop(key)
+        entries[key] = value
+        return value
+
+    def set(self, key, value):
+        entries = self._entries
+        entries[key] = value
+        while len(entries) > self.size:
+            try:
+                entries.popitem(last=False)
+            except KeyError:
+                # emptied by another thread
+                break
+
+
+result_cache = ResultCache(50000)
+"""Results of patterns only depending on the song itself, for songs with
+a revision"""
+
+
 class PatternFormatter(object):
     _format = None
     _post = None
+    _post_many = None
     _text = None
 
-    def __init__(self, func, list_func, tags):
+    def __init__(self, func, list_func, tags, volatile=True):
         self.__func = func
         self.__list_func = list_func
         self.tags = util.list_unique(tags)
+        self.volatile = volatile
+        if volatile:
+            self.__cache_id = None
+        else:
+            self.__cache_id = result_cache.new_id()
         self.format(self.Dummy())  # Validate string
 
     class Dummy(dict):
@@ -243,16 +302,62 @@ class PatternFormatter(object):
             return values
 
     def format(self, song):
+        if self.__cache_id is not None:
+            try:
+                key = (self.__cache_id, False, song.revision)
+            except AttributeError:
+                pass
+            else:
+                try:
+                    return result_cache.get(key)
+                except KeyError:
+                    value = self.__format(song)
+                    result_cache.set(key, value)
+                    return value
+        return self.__format(song)
+
+    def __format(self, song):
         value = u"".join(self.__func(self.SongProxy(song, self._format)))
         if self._post:
             return self._post(value, song)
         return value
 
+    def format_many(self, songs):
+        """Returns the same as [self.format(s) for s in songs], but shares
+        the work between songs where the pattern kind allows it.
+        """
+
+        if self._post_many is None:
+            format_ = self.format
+            return [format_(song) for song in songs]
+
+        func = self.__func
+        proxy = self.SongProxy
+        text_formatter = self._format
+        join = u"".join
+        values = [join(func(proxy(song, text_formatter))) for song in songs]
+        return self._post_many(values, songs)
+
     def format_list(self, song):
         """Formats the output of a list pattern, generating all the
         combinations always returns pairs of display and sort values. The
         returned set will never be empty (e.g. for an empty pattern).
         """
+        if self.__cache_id is not None:
+            try:
+                key = (self.__cache_id, True, song.revision)
+            except AttributeError:
+                pass
+            else:
+                try:
+                    return set(result_cache.get(key))
+                except KeyError:
+                    values = self.__format_list(song)
+                    result_cache.set(key, frozenset(values))
+                    return values
+        return self.__format_list(song)
+
+    def __format_list(self, song):
         vals = [(u"", u"")]
         for val in self.__list_func(self.SongProxy(song, self._format)):
             if not val:
@@ -272,9 +377,40 @@ class PatternFormatter(object):
 
 
 class PatternCompiler(object):
+
+    CODE_VERSION = 1
+    """Has to be increased whenever the generated code or the globals it
+    expects change, so code saved by PatternCache doesn't get reused"""
+
+    volatile = False
+    """If the compiled functions depend on more than the song, like
+    the current time or the default rating"""
+
+    queries = ()
+    """(name, query text) pairs of the queries used by the last compiled
+    function, see make_function()"""
+
     def __init__(self, root):
         self.__root = root.node
 
+    @staticmethod
+    def make_function(code, queries, text_formatter=None):
+        """Returns a function for the code object of a function returned
+        by compile() and the queries it used.
+
+        Returns None if a query can't be parsed.
+        """
+
+        scope = {"__builtins__": builtins}
+        for name, query in queries:
+            q = Query.StrictQueryMatcher(query)
+            if q is None:
+                return
+            scope[name] = q.search
+        if text_formatter:
+            scope["_format"] = text_formatter
+        return types.FunctionType(code, scope)
+
     def compile(self, song_func, text_formatter=None):
         tags = []
         queries = {}
@@ -292,10 +428,14 @@ class PatternCompiler(object):
         if text_formatter:
             scope["_format"] = text_formatter
         exec_(compile(code, "<string>", "exec"), scope)
+        self.queries = tuple(
+            (name, query) for query, (name, search) in queries.items())
         return scope["f"], tags
 
     def __get_value(self, text, scope, tag):
         if tag not in scope:
+            if not EXTERNAL_TAGS.isdisjoint(util.tagsplit(tag)):
+                self.volatile = True
             t_var = 'v%d' % len(scope)
             scope[tag] = t_var
             text.append('%s = x(%r)' % (t_var, tag))
@@ -313,6 +453,8 @@ class PatternCompiler(object):
             else:
                 q = Query.StrictQueryMatcher(query)
                 if q is not None:
+                    if q._volatile():
+                        self.volatile = True
                     q_var = 'q%d' % len(queries)
                     r_var = 'r%d' % len(qscope)
                     queries[query] = (q_var, q.search)
@@ -362,15 +504,154 @@ class PatternCompiler(object):
         return text
 
 
-def Pattern(string, Kind=PatternFormatter, MAX_CACHE_SIZE=100, cache={}):
-    if (Kind, string) not in cache:
-        if len(cache) > MAX_CACHE_SIZE:
-            cache.clear()
+def _cache_version():
+    try:
+        from importlib.util import MAGIC_NUMBER
+    except ImportError:
+        from imp import get_magic
+        MAGIC_NUMBER = get_magic()
+    # code objects can only be loaded by the same Python version and the
+    # generated code might change between versions
+    return (MAGIC_NUMBER, const.VERSION, PatternCompiler.CODE_VERSION)
+
+
+class PatternCache(object):
+    """A LRU cache of compiled patterns, see Pattern().
+
+    The generated code of the patterns can be saved, so they don't have
+    to be parsed and compiled again in the next session.
+    """
+
+    SIZE = 500
+    """Number of patterns to keep"""
+
+    hits = 0
+    """Number of patterns found in the cache"""
+
+    misses = 0
+    """Number of patterns which had to be compiled or loaded"""
+
+    def __init__(self):
+        # (Kind, string) -> (formatter, code), least recently used first
+        self._entries = collections.OrderedDict()
+        # (kind name, string) -> code, loaded but not used yet
+        self._loaded = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """Forget all patterns and reset the statistics"""
+
+        self._entries.clear()
+        self._loaded.clear()
+        self.hits = self.misses = 0
+
+    def get(self, string, Kind):
+        """Returns a formatter of type Kind for the pattern string.
+
+        Raises error if the pattern can't be parsed.
+        """
+
+        key = (Kind, string)
+        entries = self._entries
+        entry = entries.pop(key, None)
+        if entry is None:
+            self.misses += 1
+            entry = self.__create(string, Kind)
+            while len(entries) >= self.SIZE:
+                entries.popitem(last=False)
+        else:
+            self.hits += 1
+        entries[key] = entry
+        return entry[0]
+
+    def __create(self, string, Kind):
+        make_function = PatternCompiler.make_function
+
+        code = self._loaded.pop((_kind_name(Kind), string), None)
+        if code is not None:
+            func_code, func_queries, list_code, list_queries, tags, \
+                volatile = code
+            func = make_function(func_code, func_queries, Kind._text)
+            list_func = make_function(list_code, list_queries, Kind._text)
+            if func is not None and list_func is not None:
+                return Kind(func, list_func, tags, volatile), code
+
         comp = PatternCompiler(PatternParser(PatternLexer(string)))
         func, tags = comp.compile("comma", Kind._text)
+        func_queries = comp.queries
         list_func, tags = comp.compile("list_separate", Kind._text)
-        cache[(Kind, string)] = Kind(func, list_func, tags)
-    return cache[(Kind, string)]
+        code = (func.__code__, func_queries, list_func.__code__,
+                comp.queries, tuple(tags), comp.volatile)
+        return Kind(func, list_func, tags, comp.volatile), code
+
+    def save(self, filename):
+        """Saves the generated code of the cached patterns to filename"""
+
+        print_d("Saving %d patterns to %r" % (len(self), filename), self)
+
+        # keep loaded patterns which weren't needed this time as well,
+        # but prefer the ones used
+        items = [(name, string, code) for (name, string), code
+                 in self._loaded.items()]
+        items.extend((_kind_name(Kind), string, code)
+                     for (Kind, string), (f, code) in self._entries.items())
+        items = items[-self.SIZE:]
+
+        try:
+            data = marshal.dumps((_cache_version(), items))
+            with atomic_save(filename, "wb") as fileobj:
+                fileobj.write(data)
+        except (EnvironmentError, ValueError):
+            util.print_exc()
+
+    def load(self, filename):
+        """Loads patterns saved with save(). They only get used once
+        requested and nothing gets loaded if they were saved by a different
+        version.
+        """
+
+        try:
+            with open(filename, "rb") as fileobj:
+                data = marshal.loads(fileobj.read())
+        except EnvironmentError:
+            return
+        except (EOFError, ValueError, TypeError):
+            util.print_exc()
+            return
+
+        try:
+            version, items = data
+            if version != _cache_version():
+                print_d("Patterns in %r are outdated" % filename, self)
+                return
+            loaded = {}
+            for name, string, code in items:
+                loaded[(name, string)] = code
+        except (TypeError, ValueError):
+            util.print_exc()
+            return
+
+        self._loaded = loaded
+
+
+def _kind_name(Kind):
+    return "%s.%s" % (Kind.__module__, Kind.__name__)
+
+
+pattern_cache = PatternCache()
+"""The cache used by Pattern()"""
+
+
+def Pattern(string, Kind=PatternFormatter):
+    """Returns a formatter of type Kind for the pattern string, shared with
+    all other callers.
+
+    Raises error if the pattern can't be parsed.
+    """
+
+    return pattern_cache.get(string, Kind)
 
 
 def _number(key, value):
@@ -403,8 +684,23 @@ class _FileFromPattern(PatternFormatter):
         value = value.strip()
         return value
 
-    def _post(self, value, song, keep_extension=True):
-        if value:
+    _keep_extension = True
+
+    def _post(self, value, song):
+        return self._post_many([value], [song])[0]
+
+    def _post_many(self, values, songs):
+        keep_extension = self._keep_extension
+        is_nt = os.name == "nt"
+        # expanding "~" needs the environment, do it once per prefix
+        expanded = {}
+
+        result = []
+        for value, song in izip(values, songs):
+            if not value:
+                result.append(fsnative(value))
+                continue
+
             assert isinstance(value, text_type)
             value = fsnative(value)
 
@@ -415,26 +711,32 @@ class _FileFromPattern(PatternFormatter):
                 if not ext == val_ext:
                     value += ext.lower()
 
-            if os.name == "nt":
+            if is_nt:
                 assert isinstance(value, text_type)
                 value = strip_win32_incompat_from_path(value)
 
-            value = expanduser(value)
+            if value[:1] == "~":
+                head, has_sep, rest = value.partition(sep)
+                if not has_sep:
+                    value = expanduser(value)
+                else:
+                    if head not in expanded:
+                        expanded[head] = expanduser(head + sep)[:-len(sep)]
+                    value = expanded[head] + sep + rest
+
             value = limit_path(value)
 
             if sep in value and not os.path.isabs(value):
                 raise ValueError("Pattern is not rooted")
-            return value
-        else:
-            return fsnative(value)
+            result.append(value)
+
+        return result
 
 
 class _ArbitraryExtensionFileFromPattern(_FileFromPattern):
     """Allows filename-like output with extensions different from the song."""
 
-    def _post(self, value, song):
-        super_object = super(_ArbitraryExtensionFileFromPattern, self)
-        return super_object._post(value, song, False)
+    _keep_extension = False
 
 
 class _XMLFromPattern(PatternFormatter):
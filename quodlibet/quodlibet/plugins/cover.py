@@ -27,6 +27,10 @@ class CoverSourcePlugin(GObject.Object):
 
     Refer to default function implementation's documentation in order to
     understand their role.
+
+    The constructor, `group_by()` and `cover` may get called from worker
+    threads, for loading many covers in the background. They must not
+    touch GTK or other state that is only safe to use from the main loop.
     """
 
     __gsignals__ = {
@@ -126,6 +130,8 @@ class CoverSourcePlugin(GObject.Object):
 
         Should always return a file-like object opened as read-only if any
         and None otherwise.
+
+        Can get called from a worker thread, see the class documentation.
         """
         cp = self.cover_path
         try:
@@ -14,7 +14,6 @@ from quodlibet.util import dbusutils
 from quodlibet.query import Query
 from quodlibet.qltk.songlist import SongList
 from quodlibet.formats import decode_value
-from quodlibet.compat import itervalues
 
 
 class DBusHandler(dbus.service.Object):
@@ -112,10 +111,9 @@ class DBusHandler(dbus.service.Object):
     def Query(self, query):
         if query is not None:
             try:
-                results = Query(query, star=SongList.star).search
+                songs = self.library.query(query, star=SongList.star)
             except Query.error:
                 pass
             else:
-                return [self.__dict(s) for s in itervalues(self.library)
-                        if results(s)]
+                return [self.__dict(s) for s in songs]
         return None
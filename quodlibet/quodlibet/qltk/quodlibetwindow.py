@@ -55,7 +55,8 @@ from quodlibet.util import copool, connect_destroy, connect_after_destroy
 from quodlibet.util.library import get_scan_dirs, set_scan_dirs
 from quodlibet.util import connect_obj, print_d
 from quodlibet.util.path import glib2fsn, get_home_dir
-from quodlibet.util.library import background_filter, scan_library
+from quodlibet.util.library import background_filter, scan_library, \
+    create_thumbnails
 from quodlibet.qltk.window import PersistentWindowMixin, Window, on_first_map
 from quodlibet.qltk.songlistcolumns import SongListColumn
 
@@ -544,6 +545,7 @@ MENU = """
       <menuitem action='Plugins' always-show-image='true'/>
       <separator/>
       <menuitem action='RefreshLibrary' always-show-image='true'/>
+      <menuitem action='CreateThumbnails' always-show-image='true'/>
       <separator/>
       <menuitem action='Quit' always-show-image='true'/>
     </menu>
@@ -1101,6 +1103,11 @@ class QuodLibetWindow(Window, PersistentWindowMixin, AppWindow):
         act.connect('activate', self.__rebuild, False)
         ag.add_action(act)
 
+        act = Action(
+            name="CreateThumbnails", label=_("Create Cover _Thumbnails"))
+        act.connect('activate', self.__create_thumbnails)
+        ag.add_action(act)
+
         current = config.get("memory", "browser")
         try:
             browsers.get(current)
@@ -1156,6 +1163,9 @@ class QuodLibetWindow(Window, PersistentWindowMixin, AppWindow):
         # attach them.
         ui.get_widget("/Menu/File/RefreshLibrary").set_tooltip_text(
             _("Check for changes in your library"))
+        ui.get_widget("/Menu/File/CreateThumbnails").set_tooltip_text(
+            _("Create the missing cover thumbnails for all albums, so "
+              "browsing the covers is faster"))
 
         return ui
 
@@ -1333,6 +1343,9 @@ class QuodLibetWindow(Window, PersistentWindowMixin, AppWindow):
     def __rebuild(self, activator, force):
         scan_library(self.__library, force)
 
+    def __create_thumbnails(self, activator):
+        create_thumbnails(self.__library)
+
     # Set up the preferences window.
     def __preferences(self, activator):
         window = PreferencesWindow(self)
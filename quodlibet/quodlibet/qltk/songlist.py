@@ -749,16 +749,25 @@ class SongList(AllTreeView, SongListDnDMixin, DragScroll,
     def _sort_songs(self, songs):
         """Sort passed songs in place based on the column sort orders"""
 
+        sort_keys = getattr(app.library, "sort_keys", None)
+
+        def get_sort_func(name, func):
+            if sort_keys is None:
+                return func
+            return sort_keys.get_func(name, func)
+
+        default_func = get_sort_func("", lambda s: s.sort_key)
+
         last_tag = None
         last_order = None
         first = True
-        for tag, reverse in self.get_sort_orders():
-            tag = get_sort_tag(tag)
+        for header, reverse in self.get_sort_orders():
+            tag = get_sort_tag(header)
 
             # always sort using the default sort key first
             if first:
                 first = False
-                songs.sort(key=lambda s: s.sort_key, reverse=reverse)
+                songs.sort(key=default_func, reverse=reverse)
                 last_order = reverse
                 last_tag = ""
 
@@ -769,10 +778,13 @@ class SongList(AllTreeView, SongListDnDMixin, DragScroll,
             last_tag = tag
 
             if tag == "":
-                songs.sort(key=lambda s: s.sort_key, reverse=reverse)
+                songs.sort(key=default_func, reverse=reverse)
             else:
                 sort_func = AudioFile.sort_by_func(tag)
-                songs.sort(key=sort_func, reverse=reverse)
+                # patterns get passed as functions
+                name = tag if isinstance(tag, string_types) else header
+                songs.sort(key=get_sort_func(name, sort_func),
+                           reverse=reverse)
 
     def add_songs(self, songs):
         """Add songs to the list in the right order and position"""
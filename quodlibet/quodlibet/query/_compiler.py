@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+import time
+
+from senf import fsn2text, fsnative
+
+from quodlibet.compat import exec_
+
+
+class QueryCompiler(object):
+    """Turns a tree of query nodes into a single Python function.
+
+    The nodes generate the code for themselves using Node._compile(), which
+    gets passed the compiler and returns a Python expression. Nodes which
+    can't be expressed this way fall back to calling their search().
+    """
+
+    def __init__(self, root):
+        self.__root = root
+
+    def compile(self):
+        """Returns a function taking a song and returning if it matches"""
+
+        self.__scope = {
+            "_fsn2text": fsn2text,
+            "_fs_default": fsnative(),
+            "_time": time.time,
+        }
+        self.__bound = {}
+        self.__values = {}
+        self.__lines = []
+        self.__uses_time = False
+
+        expr = self.__root._compile(self)
+
+        content = ["def f(s):", "  g = s.get"]
+        if self.__uses_time:
+            content.append("  t = _time()")
+        content.extend("  " + line for line in self.__lines)
+        content.append("  return bool(%s)" % expr)
+        code = "\n".join(content)
+
+        exec_(compile(code, "<query>", "exec"), self.__scope)
+        return self.__scope["f"]
+
+    def bind(self, obj):
+        """Returns a variable name through which the generated code can
+        access obj.
+        """
+
+        key = id(obj)
+        if key not in self.__bound:
+            name = "c%d" % len(self.__bound)
+            self.__bound[key] = name
+            self.__scope[name] = obj
+        return self.__bound[key]
+
+    def call(self, node):
+        """Returns an expression calling node.search with the song"""
+
+        return "%s(s)" % self.bind(node.search)
+
+    def __hoist(self, key, get_lines):
+        if key not in self.__values:
+            name = "v%d" % len(self.__values)
+            self.__values[key] = name
+            self.__lines.extend(get_lines(name))
+        return self.__values[key]
+
+    def get_value(self, tag):
+        """Returns a variable containing the text Tag.search() looks at
+        for a tag name not starting with "~".
+        """
+
+        if tag in ("filename", "mountpoint"):
+            fallback = "_fsn2text(g(%r, _fs_default))" % ("~" + tag)
+        else:
+            fallback = "g(%r, u'')" % ("~" + tag)
+
+        return self.__hoist(tag, lambda v: [
+            "%s = g(%r)" % (v, tag),
+            "if %s is None: %s = %s" % (v, v, fallback)])
+
+    def get_numeric(self, tag):
+        """Returns a variable containing song(tag, None)"""
+
+        return self.__hoist(
+            ("#", tag), lambda v: ["%s = s(%r, None)" % (v, tag)])
+
+    def get_time(self):
+        """Returns a variable containing the current time"""
+
+        self.__uses_time = True
+        return "t"
@@ -27,6 +27,47 @@ class ParseError(error):
     pass
 
 
+def _union(sets):
+    """Union of all sets or None if any of them is None"""
+
+    if not sets or None in sets:
+        return None
+    return set().union(*sets)
+
+
+def _intersection(sets):
+    """Intersection of all sets which aren't None, or None"""
+
+    sets = sorted((s for s in sets if s is not None), key=len)
+    if not sets:
+        return None
+    return sets[0].intersection(*sets[1:])
+
+
+COST_NUMERIC = 1
+COST_EXACT = 2
+COST_REGEX = 4
+COST_SYNTH = 8
+COST_EXTENSION = 32
+"""Rough relative costs of matching a song, used to order nodes"""
+
+
+def _rank(node, rates, union):
+    """Sort key for the children of an Inter (union=False) or Union.
+
+    Nodes which are cheap and likely decide the result come first.
+    Without a known match rate only the cost counts.
+    """
+
+    rate = rates.get(id(node), 0.5) if rates else 0.5
+    decisive = rate if union else 1.0 - rate
+    return node._cost() / max(decisive, 0.01)
+
+
+def _match_rate(node, songs):
+    return sum(1 for song in songs if node.search(song)) / float(len(songs))
+
+
 class Node(object):
 
     def search(self, data):
@@ -35,6 +76,57 @@ class Node(object):
     def filter(self, sequence):
         return [s for s in sequence if self.search(s)]
 
+    def _candidates(self, index):
+        """Returns a set of songs of the TagIndex which contains all
+        matching ones, or None if the index can't tell.
+        """
+
+        return None
+
+    def _value_candidates(self, index, tag):
+        """Like _candidates, but for a value matched against tag"""
+
+        return None
+
+    def _matches(self, index):
+        """Returns the exact set of songs of the TagIndex matching, or None
+        if the index can't tell.
+        """
+
+        return None
+
+    def _compile(self, compiler):
+        """Returns a Python expression for the QueryCompiler which is
+        true if the song `s` matches.
+        """
+
+        return compiler.call(self)
+
+    def _cost(self):
+        """Returns an estimate of how expensive search() is"""
+
+        return COST_EXTENSION
+
+    def _reorder(self, rates=None):
+        """Reorders child nodes so cheap and decisive ones get checked
+        first. rates maps id() of nodes to the fraction of songs they
+        matched, see _learn().
+        """
+
+        pass
+
+    def _learn(self, songs, rates):
+        """Adds the match rates of all child nodes for songs to rates"""
+
+        pass
+
+    def _volatile(self):
+        """Whether the result can change without the song changing, for
+        example because it depends on the current time.
+        """
+
+        return True
+
     def _unpack(self):
         return self
 
@@ -66,6 +158,17 @@ class Regex(Node):
     def __repr__(self):
         return "<Regex pattern=%s mod=%s>" % (self.pattern, self.mod_string)
 
+    def _cost(self):
+        if self.pattern.startswith(u"^") and self.pattern.endswith(u"$"):
+            return COST_EXACT
+        return COST_REGEX
+
+    def _value_candidates(self, index, tag):
+        return index.tag_candidates(tag, self.pattern)
+
+    def _volatile(self):
+        return False
+
 
 class True_(Node):
     """Always True"""
@@ -79,6 +182,18 @@ class True_(Node):
     def __repr__(self):
         return "<True>"
 
+    def _compile(self, compiler):
+        return "True"
+
+    def _matches(self, index):
+        return index.all_ids()
+
+    def _cost(self):
+        return 0
+
+    def _volatile(self):
+        return False
+
     def __or__(self, other):
         return self
 
@@ -102,6 +217,36 @@ class Union(Node):
     def __repr__(self):
         return "<Union %r>" % self.res
 
+    def _candidates(self, index):
+        return _union([re._candidates(index) for re in self.res])
+
+    def _matches(self, index):
+        return _union([re._matches(index) for re in self.res])
+
+    def _compile(self, compiler):
+        if not self.res:
+            return "False"
+        return "(%s)" % " or ".join(re._compile(compiler) for re in self.res)
+
+    def _cost(self):
+        return sum(re._cost() for re in self.res)
+
+    def _reorder(self, rates=None):
+        for re in self.res:
+            re._reorder(rates)
+        self.res.sort(key=lambda re: _rank(re, rates, True))
+
+    def _learn(self, songs, rates):
+        for re in self.res:
+            rates[id(re)] = _match_rate(re, songs)
+            re._learn(songs, rates)
+
+    def _volatile(self):
+        return any(re._volatile() for re in self.res)
+
+    def _value_candidates(self, index, tag):
+        return _union([re._value_candidates(index, tag) for re in self.res])
+
     def __or__(self, other):
         other = other._unpack()
 
@@ -144,6 +289,40 @@ class Inter(Node):
     def __repr__(self):
         return "<Inter %r>" % self.res
 
+    def _candidates(self, index):
+        return _intersection([re._candidates(index) for re in self.res])
+
+    def _matches(self, index):
+        sets = [re._matches(index) for re in self.res]
+        if None in sets:
+            return None
+        return _intersection(sets)
+
+    def _compile(self, compiler):
+        if not self.res:
+            return "True"
+        return "(%s)" % " and ".join(re._compile(compiler) for re in self.res)
+
+    def _cost(self):
+        return sum(re._cost() for re in self.res)
+
+    def _reorder(self, rates=None):
+        for re in self.res:
+            re._reorder(rates)
+        self.res.sort(key=lambda re: _rank(re, rates, False))
+
+    def _learn(self, songs, rates):
+        for re in self.res:
+            rates[id(re)] = _match_rate(re, songs)
+            re._learn(songs, rates)
+
+    def _volatile(self):
+        return any(re._volatile() for re in self.res)
+
+    def _value_candidates(self, index, tag):
+        return _intersection(
+            [re._value_candidates(index, tag) for re in self.res])
+
     def __and__(self, other):
         other = other._unpack()
 
@@ -174,6 +353,30 @@ class Neg(Node):
     def __repr__(self):
         return "<Neg %r>" % self.res
 
+    def _compile(self, compiler):
+        return "(not %s)" % self.res._compile(compiler)
+
+    def _candidates(self, index):
+        return self._matches(index)
+
+    def _matches(self, index):
+        matches = self.res._matches(index)
+        if matches is None:
+            return None
+        return index.all_ids() - matches
+
+    def _cost(self):
+        return self.res._cost()
+
+    def _reorder(self, rates=None):
+        self.res._reorder(rates)
+
+    def _learn(self, songs, rates):
+        self.res._learn(songs, rates)
+
+    def _volatile(self):
+        return self.res._volatile()
+
     def __and__(self, other):
         other = other._unpack()
         if isinstance(other, True_):
@@ -221,6 +424,54 @@ class Numcmp(Node):
         return "<Numcmp expr=%r, op=%r, expr2=%r>" % (
             self._expr, self._op.__name__, self._expr2)
 
+    def _candidates(self, index):
+        return self._matches(index)
+
+    def _matches(self, index):
+        expr, op, expr2 = self._expr, self._op, self._expr2
+        if self._expr.use_date() or self._expr2.use_date():
+            return None
+        if isinstance(expr2, NumexprTag):
+            expr, op, expr2 = expr2, _FLIPPED[op], expr
+        value = _constant(expr2)
+        if not isinstance(expr, NumexprTag) or value is None:
+            return None
+        return index.numeric_matches(expr._ftag, op, value)
+
+    def _compile(self, compiler):
+        symbol = _SYMBOLS[self._op]
+        if self._expr.use_date() or self._expr2.use_date():
+            return compiler.call(self)
+
+        operands = []
+        values = []
+        for expr in (self._expr, self._expr2):
+            if isinstance(expr, NumexprNumber):
+                operands.append(compiler.bind(expr._value))
+            elif isinstance(expr, NumexprTag):
+                value = compiler.get_numeric(expr._ftag)
+                values.append(value)
+                if expr._ftag in TIME_TAGS:
+                    operands.append(
+                        "round(%s - %s, 2)" % (compiler.get_time(), value))
+                else:
+                    operands.append("round(%s, 2)" % value)
+            else:
+                return compiler.call(self)
+
+        checks = ["%s is not None" % v for v in values]
+        checks.append("%s %s %s" % (operands[0], symbol, operands[1]))
+        return "(%s)" % " and ".join(checks)
+
+    def _cost(self):
+        if self._expr.use_date() or self._expr2.use_date():
+            # dates get parsed for every song
+            return COST_REGEX
+        return COST_NUMERIC
+
+    def _volatile(self):
+        return self._expr._volatile() or self._expr2._volatile()
+
     def __and__(self, other):
         other = other._unpack()
         if isinstance(other, True_):
@@ -234,6 +485,27 @@ class Numcmp(Node):
         return Union([self, other])
 
 
+_FLIPPED = {
+    operator.lt: operator.gt,
+    operator.le: operator.ge,
+    operator.gt: operator.lt,
+    operator.ge: operator.le,
+    operator.eq: operator.eq,
+    operator.ne: operator.ne,
+}
+"""Operators to use when swapping the operands of a comparison"""
+
+_SYMBOLS = {
+    operator.lt: "<",
+    operator.le: "<=",
+    operator.gt: ">",
+    operator.ge: ">=",
+    operator.eq: "==",
+    operator.ne: "!=",
+}
+"""Python operators for the comparison functions"""
+
+
 class Numexpr(object):
     """Expression in numeric comparison"""
 
@@ -249,6 +521,10 @@ class Numexpr(object):
         values instead of the number values."""
         return False
 
+    def _volatile(self):
+        """Whether the value can change without the song changing"""
+        return False
+
 
 class NumexprTag(Numexpr):
     """Numeric tag"""
@@ -280,6 +556,10 @@ class NumexprTag(Numexpr):
     def use_date(self):
         return self._tag == 'date'
 
+    def _volatile(self):
+        # the default rating is configurable
+        return self._ftag in TIME_TAGS or self._ftag == "~#rating"
+
 
 class NumexprUnary(Numexpr):
     """Unary numeric operation (like -)"""
@@ -304,6 +584,9 @@ class NumexprUnary(Numexpr):
     def use_date(self):
         return self.__expr.use_date()
 
+    def _volatile(self):
+        return self.__expr._volatile()
+
 
 class NumexprBinary(Numexpr):
     """Binary numeric operation (like + or *)"""
@@ -354,6 +637,9 @@ class NumexprBinary(Numexpr):
     def use_date(self):
         return self.__expr.use_date() or self.__expr2.use_date()
 
+    def _volatile(self):
+        return self.__expr._volatile() or self.__expr2._volatile()
+
 
 class NumexprGroup(Numexpr):
     """Parenthesized group in numeric expression"""
@@ -370,6 +656,9 @@ class NumexprGroup(Numexpr):
     def use_date(self):
         return self.__expr.use_date()
 
+    def _volatile(self):
+        return self.__expr._volatile()
+
 
 class NumexprNumber(Numexpr):
     """Number in numeric expression"""
@@ -396,6 +685,9 @@ class NumexprNow(Numexpr):
     def __repr__(self):
         return "<NumexprNow offset=%r>" % (self.__offset)
 
+    def _volatile(self):
+        return True
+
 
 class NumexprNumberOrDate(Numexpr):
     """An ambiguous value like 2015-09-25 than can be interpreted as either
@@ -421,6 +713,16 @@ class NumexprNumberOrDate(Numexpr):
             (self.number, self.date))
 
 
+def _constant(expr):
+    """The value of a constant expression which isn't a date, or None"""
+
+    if isinstance(expr, NumexprNumber):
+        return expr._value
+    elif isinstance(expr, NumexprNumberOrDate):
+        return expr.number
+    return None
+
+
 def numexprUnit(value, unit):
     """Process numeric units and return NumexprNumber"""
 
@@ -525,6 +827,40 @@ class Tag(Node):
         names = self._names + self.__intern
         return ("<Tag names=%r, res=%r>" % (names, self.res))
 
+    def _candidates(self, index):
+        names = self._names + self.__intern + self.__fs
+        return _union(
+            [self.res._value_candidates(index, name) for name in names])
+
+    def _compile(self, compiler):
+        search = compiler.bind(self.res.search)
+        checks = []
+        for name in self._names:
+            checks.append("%s(%s)" % (search, compiler.get_value(name)))
+        for name in self.__intern:
+            checks.append("%s(s(%r))" % (search, name))
+        for name in self.__fs:
+            checks.append(
+                "%s(_fsn2text(s(%r, _fs_default)))" % (search, name))
+        if not checks:
+            return "False"
+        return "(%s)" % " or ".join(checks)
+
+    def _cost(self):
+        cost = self.res._cost()
+        synth = len(self.__intern) + len(self.__fs)
+        return cost * len(self._names) + (COST_SYNTH + cost) * synth
+
+    def _reorder(self, rates=None):
+        # values don't get matched against songs, so only the cost counts
+        self.res._reorder()
+
+    def _volatile(self):
+        # the default rating and playlists can change independently
+        if {"~rating", "~playlists"}.intersection(self.__intern):
+            return True
+        return self.res._volatile()
+
     def __and__(self, other):
         other = other._unpack()
         if isinstance(other, True_):
@@ -97,6 +97,7 @@ class QueryParser(object):
         s = self.Query(outer=True)
         if not self.eof():
             raise ParseError('Query ended before end of input')
+        s._reorder()
         return s
 
     def Query(self, outer=False):
@@ -7,11 +7,14 @@
 # it under the terms of the GNU General Public License version 2 as
 # published by the Free Software Foundation
 
+from itertools import islice
+
 from . import _match as match
 from ._match import error, Node
 from ._parser import QueryParser
+from ._compiler import QueryCompiler
 from quodlibet.util import re_escape, enum, cached_property
-from quodlibet.compat import PY2, text_type
+from quodlibet.compat import PY2, text_type, listfilter
 
 
 @enum
@@ -38,6 +41,12 @@ class Query(Node):
     stars = None
     """List of default tags used"""
 
+    LEARN_SAMPLE = 200
+    """Number of songs used to measure how often each part of the query
+    matches when filtering large sequences, 0 to disable"""
+
+    _learned = False
+
     def __init__(self, string, star=None):
         """Parses the query string and returns a match object.
 
@@ -102,11 +111,70 @@ class Query(Node):
 
     @cached_property
     def search(self):
-        return self._match.search
+        return self.compile()
 
-    @cached_property
-    def filter(self):
-        return self._match.filter
+    def compile(self):
+        """Returns a function equivalent to the search() of the parsed
+        query, generated as a single flat Python function.
+        """
+
+        return QueryCompiler(self._match).compile()
+
+    def filter(self, sequence):
+        """Returns a list of all items in sequence matching the query.
+
+        If sequence is a library with a tag index, the index answers
+        numeric queries on its own and narrows down the songs to check for
+        others. The result is in no particular order in that case.
+        """
+
+        index = getattr(sequence, "tag_index", None)
+        if index is not None:
+            songs = index.matches(self)
+            if songs is not None:
+                return songs
+            songs = index.candidates(self)
+            if songs is not None:
+                sequence = songs
+
+        if not self._learned and self.LEARN_SAMPLE:
+            try:
+                size = len(sequence)
+            except TypeError:
+                size = 0
+            if size >= 10 * self.LEARN_SAMPLE:
+                self.learn(islice(sequence, self.LEARN_SAMPLE))
+
+        return listfilter(self.search, sequence)
+
+    def learn(self, songs):
+        """Reorders the parts of the query based on how often they match
+        the passed songs, so the ones deciding the result early get
+        checked first. Doesn't change the result.
+        """
+
+        songs = list(songs)
+        self._learned = True
+        if not songs:
+            return
+
+        rates = {}
+        self._match._learn(songs, rates)
+        self._match._reorder(rates)
+        # compile again with the new order
+        self.__dict__.pop("search", None)
+
+    def _candidates(self, index):
+        return self._match._candidates(index)
+
+    def _matches(self, index):
+        return self._match._matches(index)
+
+    def _compile(self, compiler):
+        return self._match._compile(compiler)
+
+    def _volatile(self):
+        return self._match._volatile()
 
     @classmethod
     def is_valid(cls, string):
@@ -11,6 +11,9 @@ from __future__ import absolute_import
 
 import os
 import random
+import weakref
+from functools import partial
+from collections import OrderedDict
 
 from senf import fsnative, fsn2bytes, bytes2fsn
 
@@ -20,7 +23,7 @@ from quodlibet import config
 from quodlibet.formats._audio import TAG_TO_SORT, NUMERIC_ZERO_DEFAULT
 from quodlibet.formats._audio import PEOPLE as _PEOPLE
 from quodlibet.compat import xrange, text_type, number_types, string_types, \
-    swap_to_string, listmap
+    swap_to_string, iteritems
 from collections import Iterable
 from quodlibet.util.path import escape_filename, unescape_filename
 from quodlibet.util.dprint import print_d
@@ -45,9 +48,13 @@ def avg(nums):
 def bayesian_average(nums, c=None, m=None):
     """Returns the Bayesian average of an iterable of numbers,
     with parameters defaulting to config specific to ~#rating."""
+    return _bayesian_average(sum(nums), len(nums), c, m)
+
+
+def _bayesian_average(total, count, c=None, m=None):
     m = m or config.RATINGS.default
     c = c or config.getfloat("settings", "bayesian_rating_factor", 0.0)
-    ret = float(m * c + sum(nums)) / (c + len(nums))
+    ret = float(m * c + total) / (c + count)
     return ret
 
 NUM_DEFAULT_FUNCS = {
@@ -73,6 +80,351 @@ NUM_FUNCS = {
 }
 
 
+class _Aggregate(object):
+    """A value computed from all songs of a collection, which can be
+    updated when single songs get added or removed.
+
+    What each song contributes is kept, so removing a song doesn't depend
+    on its current tags.
+    """
+
+    def __init__(self, songs):
+        self._contributions = contributions = {}
+        get_contribution = self._get_contribution
+        add = self._add
+        for song in songs:
+            contribution = get_contribution(song)
+            if contribution is not None:
+                contributions[id(song)] = contribution
+                add(contribution)
+
+    def _get_contribution(self, song):
+        """Returns what the song adds to the value, or None"""
+
+        raise NotImplementedError
+
+    def _add(self, contribution):
+        raise NotImplementedError
+
+    def _remove(self, contribution):
+        raise NotImplementedError
+
+    def add(self, song):
+        contribution = self._get_contribution(song)
+        if contribution is not None:
+            self._contributions[id(song)] = contribution
+            self._add(contribution)
+
+    def remove(self, song):
+        contribution = self._contributions.pop(id(song), None)
+        if contribution is not None:
+            self._remove(contribution)
+
+    def __len__(self):
+        return len(self._contributions)
+
+    def get(self):
+        """Returns the value or None"""
+
+        raise NotImplementedError
+
+
+class _NumericAggregate(_Aggregate):
+    """The sum, average or Bayesian average of a numeric tag"""
+
+    def __init__(self, songs, key, func):
+        self._key = key
+        self._func = func
+        self._total = 0
+        self._count = 0
+        super(_NumericAggregate, self).__init__(songs)
+
+    def _get_contribution(self, song):
+        value = song(self._key)
+        return None if value == "" else value
+
+    def _add(self, value):
+        self._total += value
+        self._count += 1
+
+    def _remove(self, value):
+        self._total -= value
+        self._count -= 1
+
+    def get(self):
+        if not self._count:
+            return None
+        elif self._func == "sum":
+            return self._total
+        elif self._func == "bav":
+            return _bayesian_average(self._total, self._count)
+        return float(self._total) / self._count
+
+
+class _CountingAggregate(_Aggregate):
+    """Counts how often each value is contributed"""
+
+    def __init__(self, songs):
+        self._counts = {}
+        super(_CountingAggregate, self).__init__(songs)
+
+    def _add(self, value):
+        self._counts[value] = self._counts.get(value, 0) + 1
+
+    def _remove(self, value):
+        count = self._counts[value] - 1
+        if count:
+            self._counts[value] = count
+        else:
+            del self._counts[value]
+
+
+class _ExtremeAggregate(_CountingAggregate):
+    """The minimum or maximum of a numeric tag"""
+
+    def __init__(self, songs, key, func):
+        self._key = key
+        self._func = func
+        self._value = None
+        super(_ExtremeAggregate, self).__init__(songs)
+
+    def _get_contribution(self, song):
+        value = song(self._key)
+        return None if value == "" else value
+
+    def _add(self, value):
+        super(_ExtremeAggregate, self)._add(value)
+        if self._value is not None:
+            self._value = self._func(self._value, value)
+
+    def _remove(self, value):
+        super(_ExtremeAggregate, self)._remove(value)
+        if value == self._value:
+            self._value = None
+
+    def get(self):
+        if self._value is None and self._counts:
+            self._value = self._func(self._counts)
+        return self._value
+
+
+class _DiscsAggregate(_CountingAggregate):
+    """The number of different discs"""
+
+    def _get_contribution(self, song):
+        return song("~#disc", 1)
+
+    def get(self):
+        return len(self._counts)
+
+
+class _BitrateAggregate(_Aggregate):
+    """The bitrate of all songs, weighted by their length"""
+
+    def __init__(self, songs):
+        self._weighted = 0
+        self._length = 0
+        super(_BitrateAggregate, self).__init__(songs)
+
+    def _get_contribution(self, song):
+        # songs without a length don't count for the total length
+        length = song("~#length")
+        return (song("~#bitrate", 0) * song("~#length", 0),
+                0 if length == "" else length)
+
+    def _add(self, contribution):
+        self._weighted += contribution[0]
+        self._length += contribution[1]
+
+    def _remove(self, contribution):
+        self._weighted -= contribution[0]
+        self._length -= contribution[1]
+
+    def get(self):
+        if not self._length:
+            return 0
+        return self._weighted / self._length
+
+
+_UNKNOWN = object()
+
+
+class _ValuesAggregate(_Aggregate):
+    """All values of a tag, sorted by their number of appearances"""
+
+    def __init__(self, songs, key):
+        self._key = key
+        self._counts = {}
+        self._value = _UNKNOWN
+        super(_ValuesAggregate, self).__init__(songs)
+
+    def _get_contribution(self, song):
+        return song.list(self._key) or None
+
+    def _add(self, values):
+        counts = self._counts
+        for value in values:
+            counts[value] = counts.get(value, 0) + 1
+        self._value = _UNKNOWN
+
+    def _remove(self, values):
+        counts = self._counts
+        for value in values:
+            count = counts[value] - 1
+            if count:
+                counts[value] = count
+            else:
+                del counts[value]
+        self._value = _UNKNOWN
+
+    def get(self):
+        if self._value is _UNKNOWN:
+            counts = self._counts
+            values = sorted(counts, key=lambda v: (-counts[v], v))
+            self._value = "\n".join(values) if values else None
+        return self._value
+
+
+class _PeopleAggregate(_Aggregate):
+    """~people and ~peoplesort, it's cheaper to get both in one go"""
+
+    def __init__(self, songs):
+        self._people = {}
+        self._peoplesort = {}
+        self._values = {}
+        super(_PeopleAggregate, self).__init__(songs)
+
+    def _get_contribution(self, song):
+        # Rank people by "relevance" -- artists before composers
+        # before performers, then by number of appearances.
+        people = {}
+        peoplesort = {}
+        for w, k in enumerate(ELPOEP):
+            persons = song.list(k)
+            for person in persons:
+                people[person] = people.get(person, 0) - PEOPLE_SCORE[w]
+            if k in TAG_TO_SORT:
+                persons = song.list(TAG_TO_SORT[k]) or persons
+            for person in persons:
+                peoplesort[person] = (peoplesort.get(person, 0) -
+                                      PEOPLE_SCORE[w])
+        return (people, peoplesort) if people or peoplesort else None
+
+    def _update(self, contribution, sign):
+        for scores, totals in zip(contribution, (self._people,
+                                                 self._peoplesort)):
+            for person, score in scores.items():
+                total = totals.get(person, 0) + sign * score
+                if total:
+                    totals[person] = total
+                else:
+                    del totals[person]
+        self._values.clear()
+
+    def _add(self, contribution):
+        self._update(contribution, 1)
+
+    def _remove(self, contribution):
+        self._update(contribution, -1)
+
+    def get(self, sort=False):
+        if sort not in self._values:
+            totals = self._peoplesort if sort else self._people
+            # ties by name, since the order songs get added in can differ
+            names = sorted(totals, key=lambda p: (totals[p], p))[:100]
+            self._values[sort] = (names and "\n".join(names)) or None
+        return self._values[sort]
+
+
+class _AggregateCache(object):
+    """Tracks the cached aggregates of all collections and drops the least
+    recently used ones if they hold more song contributions than the
+    budget allows.
+
+    Every collection keeps its aggregates in its own OrderedDict, which is
+    only weakly referenced here. Once it is gone its entries get dropped
+    as well, so they don't use up the budget.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self._size = 0
+        # (id(cache), key) -> size
+        self._entries = OrderedDict()
+        # id(cache) -> (weakref to cache, set of keys)
+        self._caches = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, cache, key, size):
+        """Registers a new entry in cache and makes room for it"""
+
+        cache_id = id(cache)
+        self.forget(cache, key)
+        if cache_id not in self._caches:
+            ref = weakref.ref(cache, lambda r: self.__cache_gone(cache_id))
+            self._caches[cache_id] = (ref, set())
+        self._caches[cache_id][1].add(key)
+        self._entries[(cache_id, key)] = size
+        self._size += size
+        self.__make_room((cache_id, key))
+
+    def resize(self, cache, key, size):
+        """Updates the size of an entry, if it is known, and makes room
+        for it"""
+
+        entry_key = (id(cache), key)
+        old_size = self._entries.get(entry_key)
+        if old_size is None:
+            return
+        self._entries[entry_key] = size
+        self._size += size - old_size
+        self.__make_room(entry_key)
+
+    def __make_room(self, keep):
+        entries = self._entries
+        while self._size > self.budget and len(entries) > 1:
+            (old_id, old_key), old_size = entries.popitem(last=False)
+            if (old_id, old_key) == keep:
+                # never drop the entry making room, move it to the end
+                entries[keep] = old_size
+                continue
+            self._size -= old_size
+            ref, keys = self._caches[old_id]
+            keys.discard(old_key)
+            old_cache = ref()
+            if old_cache is not None:
+                old_cache.pop(old_key, None)
+
+    def touch(self, cache, key):
+        """Marks the entry as recently used"""
+
+        entry_key = (id(cache), key)
+        size = self._entries.pop(entry_key, None)
+        if size is not None:
+            self._entries[entry_key] = size
+
+    def forget(self, cache, key):
+        """Removes the entry, if it is known"""
+
+        cache_id = id(cache)
+        size = self._entries.pop((cache_id, key), None)
+        if size is not None:
+            self._size -= size
+            self._caches[cache_id][1].discard(key)
+
+    def __cache_gone(self, cache_id):
+        ref, keys = self._caches.pop(cache_id)
+        for key in keys:
+            self._size -= self._entries.pop((cache_id, key))
+
+
+_aggregates = _AggregateCache(500000)
+"""Shared by all collections. The budget is the number of songs all
+cached aggregates together are based on."""
+
+
 class Collection(object):
     """A collection of songs which implements some methods similar to the
     AudioFile class.
@@ -85,18 +437,35 @@ class Collection(object):
     songs = ()
 
     def __init__(self):
-        """Cache in _cache, LRU key order in _used, keys that return default
-        are in _default"""
-        self.__cache = {}
-        self.__default = set()
-        self.__used = []
+        """Cached aggregates in _cache, least recently used first"""
+        self.__cache = OrderedDict()
 
-    def finalize(self):
+    def finalize(self, added=None, removed=None, changed=None):
         """Finalize the collection.
-        Call this after songs get added or removed"""
-        self.__cache.clear()
-        self.__default.clear()
-        self.__used = []
+        Call this after songs get added or removed.
+
+        If the songs which were added, removed or changed get passed, the
+        cached values are updated for them instead of being recomputed
+        from all songs. This only works if the collection can't contain
+        the same song more than once.
+        """
+
+        if added is None and removed is None and changed is None:
+            for key in self.__cache:
+                _aggregates.forget(self.__cache, key)
+            self.__cache.clear()
+            return
+
+        # making room for a grown aggregate can drop others
+        for key, aggregate in list(iteritems(self.__cache)):
+            for song in removed or []:
+                aggregate.remove(song)
+            for song in changed or []:
+                aggregate.remove(song)
+                aggregate.add(song)
+            for song in added or []:
+                aggregate.add(song)
+            _aggregates.resize(self.__cache, key, max(len(aggregate), 1))
 
     def get(self, key, default=u"", connector=u" - "):
         if not self.songs:
@@ -105,7 +474,7 @@ class Collection(object):
             if not isinstance(default, string_types):
                 return default
             keys = util.tagsplit(key)
-            v = map(self.__get_cached_value, keys)
+            v = map(self.__get_value, keys)
 
             def default_funct(x):
                 if x is None:
@@ -117,7 +486,7 @@ class Collection(object):
                 lambda x: isinstance(x, string_types) and x or text_type(x), v)
             return connector.join(filter(None, v)) or default
         else:
-            value = self.__get_cached_value(key)
+            value = self.__get_value(key)
             if value is None:
                 return default
             return value
@@ -133,24 +502,25 @@ class Collection(object):
         v = self.get(key, connector=u"\n") if "~" in key[1:] else self.get(key)
         return [] if v == "" else v.split("\n")
 
-    def __get_cached_value(self, key):
-        if key in self.__cache:
-            self.__used.remove(key)
-            self.__used.insert(0, key)
-            return self.__cache[key]
-        elif key in self.__default:
-            return None
+    def __get_aggregate(self, key, factory):
+        """Returns the cached aggregate for key or creates one by passing
+        the songs to factory.
+        """
+
+        cache = self.__cache
+        aggregate = cache.pop(key, None)
+        if aggregate is not None:
+            _aggregates.touch(cache, key)
         else:
-            val = self.__get_value(key)
-            if val is None:
-                self.__default.add(key)
-            else:
-                self.__used.insert(0, key)
-                self.__cache[key] = val
+            aggregate = factory(self.songs)
             # Remove the oldest if the cache is full
-            if len(self.__used) > self._cache_size:
-                self.__cache.pop(self.__used.pop(-1))
-        return val
+            if len(cache) >= self._cache_size:
+                old_key = next(iter(cache))
+                del cache[old_key]
+                _aggregates.forget(cache, old_key)
+            _aggregates.add(cache, key, max(len(aggregate), 1))
+        cache[key] = aggregate
+        return aggregate
 
     def __get_value(self, key):
         """This is similar to __call__ in the AudioFile class.
@@ -169,13 +539,10 @@ class Collection(object):
             elif key == "tracks":
                 return len(self.songs)
             elif key == "discs":
-                return len({song("~#disc", 1) for song in self.songs})
+                return self.__get_aggregate("~#discs", _DiscsAggregate).get()
             elif key == "bitrate":
-                length = self.__get_value("~#length")
-                if not length:
-                    return 0
-                w = lambda s: s("~#bitrate", 0) * s("~#length", 0)
-                return sum(w(song) for song in self.songs) / length
+                return self.__get_aggregate(
+                    "~#bitrate", _BitrateAggregate).get()
             else:
                 # Standard or unknown numeric key.
                 # AudioFile will try to cast the values to int,
@@ -183,55 +550,24 @@ class Collection(object):
                 func = NUM_DEFAULT_FUNCS.get(key, "avg")
 
             key = "~#" + key
-            func = NUM_FUNCS.get(func)
-            if func:
+            if func in NUM_FUNCS:
                 # If none of the songs can return a numeric key,
                 # the album returns default
-                values = (song(key) for song in self.songs)
-                values = [v for v in values if v != ""]
-                return func(values) if values else None
+                if func in ("min", "max"):
+                    factory = partial(
+                        _ExtremeAggregate, key=key, func=NUM_FUNCS[func])
+                else:
+                    factory = partial(_NumericAggregate, key=key, func=func)
+                return self.__get_aggregate(key + ":" + func, factory).get()
             elif key in NUMERIC_ZERO_DEFAULT:
                 return 0
             return None
         elif key[:1] == "~":
             key = key[1:]
             numkey = key.split(":")[0]
-            keys = {"people": {}, "peoplesort": {}}
-            if key in keys:
-                people = keys["people"]
-                peoplesort = keys["peoplesort"]
-                for song in self.songs:
-                    # Rank people by "relevance" -- artists before composers
-                    # before performers, then by number of appearances.
-                    for w, k in enumerate(ELPOEP):
-                        persons = song.list(k)
-                        for person in persons:
-                            people[person] = (people.get(person, 0) -
-                                              PEOPLE_SCORE[w])
-                        if k in TAG_TO_SORT:
-                            persons = song.list(TAG_TO_SORT[k]) or persons
-                        for person in persons:
-                            peoplesort[person] = (peoplesort.get(person, 0) -
-                                                  PEOPLE_SCORE[w])
-                # It's cheaper to get people and peoplesort in one go
-                keys["people"] = sorted(people.keys(),
-                                        key=people.__getitem__)[:100]
-                keys["peoplesort"] = sorted(peoplesort.keys(),
-                                            key=peoplesort.__getitem__)[:100]
-
-                ret = keys.pop(key)
-                ret = (ret and "\n".join(ret)) or None
-
-                other, values = keys.popitem()
-                other = "~" + other
-                if not values:
-                    self.__default.add(other)
-                else:
-                    if other in self.__used:
-                        self.__used.remove(other)
-                    self.__used.append(other)
-                    self.__cache[other] = "\n".join(values)
-                return ret
+            if key in ("people", "peoplesort"):
+                people = self.__get_aggregate("~people", _PeopleAggregate)
+                return people.get(sort=(key == "peoplesort"))
             elif numkey == "length":
                 length = self.__get_value("~#" + key)
                 return None if length is None else util.format_time(length)
@@ -262,14 +598,8 @@ class Collection(object):
 
         # Nothing special was found, so just take all values of the songs
         # and sort them by their number of appearance
-        result = {}
-        for song in self.songs:
-            for value in song.list(key):
-                result[value] = result.get(value, 0) - 1
-
-        values = listmap(lambda x: x[0],
-                     sorted(result.items(), key=lambda x: (x[1], x[0])))
-        return "\n".join(values) if values else None
+        return self.__get_aggregate(
+            key, partial(_ValuesAggregate, key=key)).get()
 
 
 class Album(Collection):
@@ -303,9 +633,10 @@ class Album(Collection):
     def str_key(self):
         return str(self.key)
 
-    def finalize(self):
-        """Finalize this album. Call after songs get added or removed"""
-        super(Album, self).finalize()
+    def finalize(self, added=None, removed=None, changed=None):
+        """Finalize this album. Call after songs get added or removed,
+        see Collection.finalize()"""
+        super(Album, self).finalize(added, removed, changed)
         self.__dict__.pop("peoplesort", None)
         self.__dict__.pop("genre", None)
 
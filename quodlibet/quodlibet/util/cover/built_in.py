@@ -14,6 +14,9 @@ from senf import fsn2text
 from quodlibet import _
 from quodlibet.plugins.cover import CoverSourcePlugin
 from quodlibet.util.dprint import print_w
+from quodlibet.util.path import mtime
+from quodlibet.util.cover.index import cover_index
+from quodlibet.util.cover.embedded import save_image
 from quodlibet import config
 
 
@@ -39,9 +42,36 @@ class EmbeddedCover(CoverSourcePlugin):
 
     @property
     def cover(self):
-        if self.song.has_images:
-            image = self.song.get_primary_image()
-            return image.file if image else None
+        if not self.song.has_images:
+            return None
+
+        try:
+            path = cover_index.get_embedded(self.song)
+        except KeyError:
+            pass
+        else:
+            if path is None:
+                return None
+            try:
+                return open(path, "rb")
+            except IOError:
+                # the cache directory got cleaned up, extract it again
+                pass
+
+        image = self.song.get_primary_image()
+        if not image:
+            cover_index.set_embedded(self.song, None)
+            return None
+
+        path = save_image(image)
+        if path is None:
+            return image.file
+        cover_index.set_embedded(self.song, path)
+        image.file.close()
+        try:
+            return open(path, "rb")
+        except IOError:
+            return None
 
 
 class FilesystemCover(CoverSourcePlugin):
@@ -71,81 +101,125 @@ class FilesystemCover(CoverSourcePlugin):
     def priority():
         return 0.80
 
-    @property
-    def cover(self):
-        # TODO: Deserves some refactoring
-        if not self.song.is_file:
-            return None
-
-        base = self.song('~dirname')
+    def __get_tags(self):
+        # all tags used for scoring the images
+        labelid = self.song.get("labelid", "").lower()
+        values = self.song.list("~people") + [self.song("album")]
+        lowers = [value.lower().strip() for value in values
+                  if len(value) > 1]
+        return labelid, tuple(lowers)
+
+    def __find_images(self, base, tags):
+        """Returns a list of (score, path) for all images with a positive
+        score and a list of (directory, mtime) for all directories looked at.
+        """
+
+        labelid, lowers = tags
+        dirs = [(base, mtime(base))]
         images = []
 
-        # Issue 374: Specify artwork filename
-        if config.getboolean("albumart", "force_filename"):
-            path = os.path.join(base, config.get("albumart", "filename"))
-            if os.path.isfile(path):
-                images = [(100, path)]
+        entries = []
+        try:
+            entries = os.listdir(base)
+        except EnvironmentError:
+            print_w("Can't list album art directory %s" % base)
+
+        fns = []
+        for entry in entries:
+            lentry = entry.lower()
+            if get_ext(lentry) in self.cover_exts:
+                fns.append((None, entry))
+            if lentry in self.cover_subdirs:
+                subdir = os.path.join(base, entry)
+                sub_entries = []
+                dirs.append((subdir, mtime(subdir)))
+                try:
+                    sub_entries = os.listdir(subdir)
+                except EnvironmentError:
+                    pass
+                for sub_entry in sub_entries:
+                    lsub_entry = sub_entry.lower()
+                    if get_ext(lsub_entry) in self.cover_exts:
+                        fns.append((entry, sub_entry))
+
+        for sub, fn in fns:
+            dec_lfn = fsn2text(fn).lower()
+
+            score = 0
+            # check for the album label number
+            if labelid and labelid in dec_lfn:
+                score += 20
+
+            # Track-related keywords
+            score += 2 * sum([value in dec_lfn for value in lowers])
+
+            # Generic keywords
+            score += 3 * sum(r.search(dec_lfn) is not None
+                             for r in self.cover_positive_regexes)
+
+            score -= 2 * sum(r.search(dec_lfn) is not None
+                             for r in self.cover_negative_regexes)
+
+            # print("[%s - %s]: Album art \"%s\" scores %d." %
+            #         (self.song("artist"), self.song("title"), fn, score))
+            if score > 0:
+                if sub is not None:
+                    fn = os.path.join(sub, fn)
+                images.append((score, os.path.join(base, fn)))
+        images.sort(reverse=True)
+
+        return images, dirs
+
+    def __open_cover(self, base):
+        tags = self.__get_tags()
+        album_key = self.song.album_key
+        try:
+            path = cover_index.get(base, album_key, tags)
+        except KeyError:
+            pass
         else:
-            entries = []
+            if path is None:
+                return None
             try:
-                entries = os.listdir(base)
-            except EnvironmentError:
-                print_w("Can't list album art directory %s" % base)
-
-            fns = []
-            for entry in entries:
-                lentry = entry.lower()
-                if get_ext(lentry) in self.cover_exts:
-                    fns.append((None, entry))
-                if lentry in self.cover_subdirs:
-                    subdir = os.path.join(base, entry)
-                    sub_entries = []
-                    try:
-                        sub_entries = os.listdir(subdir)
-                    except EnvironmentError:
-                        pass
-                    for sub_entry in sub_entries:
-                        lsub_entry = sub_entry.lower()
-                        if get_ext(lsub_entry) in self.cover_exts:
-                            fns.append((entry, sub_entry))
-
-            for sub, fn in fns:
-                dec_lfn = fsn2text(fn).lower()
-
-                score = 0
-                # check for the album label number
-                labelid = self.song.get("labelid", "").lower()
-                if labelid and labelid in dec_lfn:
-                    score += 20
-
-                # Track-related keywords
-                values = self.song.list("~people") + [self.song("album")]
-                lowers = [value.lower().strip() for value in values
-                          if len(value) > 1]
-                score += 2 * sum([value in dec_lfn for value in lowers])
-
-                # Generic keywords
-                score += 3 * sum(r.search(dec_lfn) is not None
-                                 for r in self.cover_positive_regexes)
-
-                score -= 2 * sum(r.search(dec_lfn) is not None
-                                 for r in self.cover_negative_regexes)
-
-                # print("[%s - %s]: Album art \"%s\" scores %d." %
-                #         (self.song("artist"), self.song("title"), fn, score))
-                if score > 0:
-                    if sub is not None:
-                        fn = os.path.join(sub, fn)
-                    images.append((score, os.path.join(base, fn)))
-            images.sort(reverse=True)
+                return open(path, "rb")
+            except IOError:
+                # look for the next best one again
+                print_w("Failed reading album art \"%s\"" % path)
 
+        images, dirs = self.__find_images(base, tags)
         for score, path in images:
             # could be a directory
             if not os.path.isfile(path):
                 continue
             try:
-                return open(path, "rb")
+                fileobj = open(path, "rb")
             except IOError:
                 print_w("Failed reading album art \"%s\"" % path)
+            else:
+                cover_index.set(base, album_key, tags, path, dirs)
+                return fileobj
+
+        cover_index.set(base, album_key, tags, None, dirs)
+        return None
+
+    @property
+    def cover(self):
+        if not self.song.is_file:
+            return None
+
+        base = self.song('~dirname')
+
+        # Issue 374: Specify artwork filename
+        if config.getboolean("albumart", "force_filename"):
+            path = os.path.join(base, config.get("albumart", "filename"))
+            if not os.path.isfile(path):
+                return None
+        else:
+            return self.__open_cover(base)
+
+        try:
+            return open(path, "rb")
+        except IOError:
+            print_w("Failed reading album art \"%s\"" % path)
 
         return None
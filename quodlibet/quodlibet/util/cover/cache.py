@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+"""A cache of scaled cover pixbufs shared by everything showing covers,
+so switching between browsers doesn't load them again.
+"""
+
+import os
+import tempfile
+import threading
+import collections
+
+from senf import fsnative
+
+from quodlibet.util.path import mtime
+
+
+class PixbufCache(object):
+    """A LRU cache of pixbufs, bounded by their size in bytes.
+
+    Keyed by the path and mtime of the image file and the size the
+    pixbuf was scaled to. Thread-safe.
+    """
+
+    MAX_BYTES = 128 * 1024 * 1024
+    """Least recently used pixbufs get dropped once they take more"""
+
+    def __init__(self):
+        # key -> (pixbuf, size in bytes), least recently used first
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """Drop all pixbufs"""
+
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def get_key(self, fileobj, boundary):
+        """Returns a key for the pixbuf of fileobj scaled to fit into
+        boundary or None if it shouldn't be cached.
+        """
+
+        path = getattr(fileobj, "name", None)
+        if not isinstance(path, fsnative):
+            return
+        # embedded images get extracted to a new temp file every time
+        if os.path.dirname(path) == tempfile.gettempdir():
+            return
+        file_mtime = mtime(path)
+        if not file_mtime:
+            return
+        return (path, file_mtime, tuple(boundary))
+
+    def get(self, key):
+        """Returns the pixbuf for key or None"""
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return
+            self._entries[key] = entry
+            return entry[0]
+
+    def set(self, key, pixbuf):
+        """Caches the pixbuf for key"""
+
+        size = pixbuf.get_rowstride() * pixbuf.get_height()
+        if size > self.MAX_BYTES:
+            return
+
+        with self._lock:
+            entries = self._entries
+            old = entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            entries[key] = (pixbuf, size)
+            self.bytes += size
+            while self.bytes > self.MAX_BYTES:
+                self.bytes -= entries.popitem(last=False)[1][1]
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+"""A cache directory for images embedded in songs.
+
+Images get stored once per content, so songs of an album sharing the same
+embedded cover also share the file and with it the thumbnails of it.
+"""
+
+import os
+import hashlib
+
+from senf import fsnative
+
+import quodlibet
+from quodlibet import util
+from quodlibet.util.atomic import atomic_save
+from quodlibet.util.path import mkdir, xdg_get_cache_home
+
+
+def get_cache_dir():
+    """Returns the path to the directory containing the extracted images.
+
+    The returned path might not exist.
+    """
+
+    if os.name == "nt":
+        return os.path.join(quodlibet.get_user_dir(), "covers")
+    return os.path.join(xdg_get_cache_home(), "quodlibet", "covers")
+
+
+def save_image(image):
+    """Stores the data of an EmbeddedImage in the cache directory.
+
+    Returns the path of the file or None if storing it failed.
+    """
+
+    try:
+        data = image.read()
+    except EnvironmentError:
+        return
+
+    name = hashlib.sha1(data).hexdigest()
+    # "image/jpeg" -> "jpeg", only used for making the files recognizable
+    subtype = image.mime_type.rpartition("/")[-1]
+    if subtype.isalnum():
+        name += "." + subtype
+
+    cache_dir = get_cache_dir()
+    path = os.path.join(cache_dir, fsnative(u"%s" % name))
+    if os.path.isfile(path):
+        return path
+
+    try:
+        mkdir(cache_dir, 0o700)
+        with atomic_save(path, "wb") as fileobj:
+            fileobj.write(data)
+    except EnvironmentError:
+        util.print_exc()
+        return
+    return path
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+"""An index of the cover files found for songs.
+
+Finding them next to the songs means listing and scoring the content of
+the album directory and its cover sub directories. The result stays valid
+as long as none of these directories change, which only takes a stat()
+call per directory to check. For embedded covers it's the file the image
+was extracted to, valid until the song changes. The index can be saved,
+so showing many albums after starting doesn't do all of that again.
+"""
+
+import threading
+
+from quodlibet import util
+from quodlibet.util.atomic import atomic_save
+from quodlibet.util.picklehelper import pickle_loads, pickle_dumps, \
+    no_globals, PicklingError, UnpicklingError
+from quodlibet.util.path import mtime
+from quodlibet.util.dprint import print_d
+from quodlibet.compat import iteritems
+
+
+class CoverIndex(object):
+    """Maps the directory and album key of songs to the path of their
+    cover file, or None if there is none.
+
+    As the choice between several images can depend on the tags of the
+    song, the tags it was based on have to match as well.
+
+    Separately maps songs to the file their embedded cover was extracted
+    to. Thread-safe.
+    """
+
+    dirty = False
+    """If entries were added since the last save() or load()"""
+
+    def __init__(self):
+        # (dirname, album_key) -> (path, tags, ((directory, mtime), ...))
+        self._entries = {}
+        # ~filename -> (~#mtime, path)
+        self._embedded = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries) + len(self._embedded)
+
+    def clear(self):
+        """Forget all cover paths"""
+
+        with self._lock:
+            self._entries.clear()
+            self._embedded.clear()
+
+    def get(self, dirname, album_key, tags):
+        """Returns the cover path or None if there is none.
+
+        Raises KeyError if not known, if it was found for other tags or
+        if one of the directories looked at changed since.
+        """
+
+        path, entry_tags, dirs = self._entries[(dirname, album_key)]
+        if entry_tags != tags:
+            raise KeyError(dirname)
+        for directory, dir_mtime in dirs:
+            if mtime(directory) != dir_mtime:
+                raise KeyError(dirname)
+        return path
+
+    def set(self, dirname, album_key, tags, path, directories):
+        """Sets the cover path (or None) found by looking at the content
+        of directories, a list of (directory, mtime) pairs.
+
+        The mtimes have to be taken before listing the directories, or
+        changes in between might get missed.
+        """
+
+        with self._lock:
+            self._entries[(dirname, album_key)] = (
+                path, tags, tuple(directories))
+            self.dirty = True
+
+    def get_embedded(self, song):
+        """Returns the path of the extracted embedded cover or None if
+        the song has none.
+
+        Raises KeyError if not known or the song changed since.
+        """
+
+        song_mtime, path = self._embedded[song("~filename")]
+        if song_mtime != song("~#mtime"):
+            raise KeyError(song("~filename"))
+        return path
+
+    def set_embedded(self, song, path):
+        """Sets the path (or None) the embedded cover of song was
+        extracted to.
+        """
+
+        with self._lock:
+            self._embedded[song("~filename")] = (song("~#mtime"), path)
+            self.dirty = True
+
+    def forget(self, songs):
+        """Forget the cover paths of songs"""
+
+        with self._lock:
+            for song in songs:
+                key = (song("~dirname"), song.album_key)
+                if self._entries.pop(key, None) is not None:
+                    self.dirty = True
+                if self._embedded.pop(song("~filename"), None) is not None:
+                    self.dirty = True
+
+    def save(self, filename):
+        """Saves the index to filename"""
+
+        print_d("Saving cover index to %r" % filename, self)
+
+        with self._lock:
+            data = (list(iteritems(self._entries)),
+                    list(iteritems(self._embedded)))
+
+        try:
+            with atomic_save(filename, "wb") as fileobj:
+                fileobj.write(pickle_dumps(data, 2))
+        except (EnvironmentError, PicklingError):
+            util.print_exc()
+        else:
+            self.dirty = False
+
+    def load(self, filename):
+        """Loads an index saved with save()"""
+
+        try:
+            with open(filename, "rb") as fileobj:
+                data = pickle_loads(fileobj.read(), no_globals)
+        except EnvironmentError:
+            return
+        except UnpicklingError:
+            util.print_exc()
+            return
+
+        entries = {}
+        embedded = {}
+        try:
+            files, songs = data
+            for (dirname, album_key), (path, tags, dirs) in files:
+                entries[(dirname, album_key)] = (
+                    path, tags, tuple((d, m) for d, m in dirs))
+            for filename, (song_mtime, path) in songs:
+                embedded[filename] = (song_mtime, path)
+        except (TypeError, ValueError):
+            util.print_exc()
+            return
+
+        with self._lock:
+            self._entries = entries
+            self._embedded = embedded
+            self.dirty = False
+
+
+cover_index = CoverIndex()
+"""The index used by FilesystemCover and EmbeddedCover"""
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+"""Loading of covers in worker threads, for views showing many of them.
+
+Finding the cover file, reading it and scaling it all happen outside of
+the main loop, the most important requests first.
+"""
+
+import heapq
+import itertools
+import threading
+from multiprocessing import cpu_count
+
+from gi.repository import GLib
+
+from quodlibet import util
+from quodlibet.util.thread import Cancellable
+
+
+class CoverRequest(Cancellable):
+    """A request passed to CoverLoader.load()
+
+    Cancel it once the result isn't needed anymore, for example when the
+    row showing the cover was scrolled out of view.
+    """
+
+    def __init__(self, loader, args, callback, priority, cancelled):
+        super(CoverRequest, self).__init__()
+        self._loader = loader
+        self._args = args
+        self._callback = callback
+        self._cancelled_cb = cancelled
+        self.priority = priority
+        self.done = False
+
+    def cancel(self):
+        if self.done or self.is_cancelled():
+            return
+        super(CoverRequest, self).cancel()
+        self._loader._forget(self)
+        if self._cancelled_cb is not None:
+            self._cancelled_cb()
+
+    def set_priority(self, priority):
+        """Change the priority, if the request is still waiting"""
+
+        if priority != self.priority:
+            self._loader._reorder(self, priority)
+
+
+class CoverLoader(object):
+    """Calls load_func in worker threads and passes the results to
+    callbacks in the main loop. If load_func raises, None gets passed.
+
+    Requests with lower priority values get handled first.
+    """
+
+    MAX_PENDING = 500
+    """Waiting requests with the highest priority values get cancelled if
+    there are more"""
+
+    def __init__(self, load_func, workers=None):
+        if workers is None:
+            try:
+                workers = min(max(cpu_count(), 2), 4)
+            except NotImplementedError:
+                workers = 2
+
+        self._load_func = load_func
+        self._workers = workers
+        self._threads = []
+        self._cond = threading.Condition()
+        self._heap = []
+        self._pending = set()
+        self._counter = itertools.count()
+        self._stopped = False
+
+    def __len__(self):
+        """Number of waiting requests"""
+
+        return len(self._pending)
+
+    def load(self, args, callback, priority=0, cancelled=None):
+        """Calls load_func(*args) in a worker thread and callback(result)
+        in the main loop afterwards.
+
+        Returns a CoverRequest. If the request gets cancelled, either
+        by the caller or because too many requests are waiting, callback
+        doesn't get called but cancelled() does.
+        """
+
+        request = CoverRequest(self, args, callback, priority, cancelled)
+
+        with self._cond:
+            self._pending.add(request)
+            self.__push(request)
+            if len(self._pending) > self.MAX_PENDING:
+                dropped = max(self._pending,
+                              key=lambda r: (r.priority, r is not request))
+            else:
+                dropped = None
+            self.__start()
+            self._cond.notify()
+
+        if dropped is not None:
+            dropped.cancel()
+
+        return request
+
+    def destroy(self):
+        """Cancels all waiting requests and stops the worker threads"""
+
+        with self._cond:
+            pending = list(self._pending)
+            self._stopped = True
+            self._cond.notify_all()
+
+        for request in pending:
+            request.cancel()
+
+    def __start(self):
+        if self._stopped:
+            return
+        if len(self._threads) < min(self._workers, len(self._pending)):
+            thread = threading.Thread(target=self.__run, name="CoverLoader")
+            thread.daemon = True
+            self._threads.append(thread)
+            thread.start()
+
+    def __push(self, request):
+        heapq.heappush(
+            self._heap, (request.priority, next(self._counter), request))
+
+        # cancelled and reordered requests leave entries behind
+        if len(self._heap) > 2 * self.MAX_PENDING:
+            self._heap = [(r.priority, next(self._counter), r)
+                          for r in self._pending]
+            heapq.heapify(self._heap)
+
+    def _reorder(self, request, priority):
+        with self._cond:
+            request.priority = priority
+            if request in self._pending:
+                self.__push(request)
+
+    def _forget(self, request):
+        with self._cond:
+            self._pending.discard(request)
+
+    def __next_request(self):
+        with self._cond:
+            while not self._stopped:
+                while self._heap:
+                    priority, i, request = heapq.heappop(self._heap)
+                    if request in self._pending and \
+                            priority == request.priority:
+                        self._pending.remove(request)
+                        return request
+                self._cond.wait()
+
+    def __run(self):
+        while True:
+            request = self.__next_request()
+            if request is None:
+                return
+
+            try:
+                result = self._load_func(*request._args)
+            except Exception:
+                util.print_exc()
+                # still tell the requester, so it doesn't wait forever
+                result = None
+
+            if not request.is_cancelled():
+                GLib.idle_add(self.__deliver, request, result)
+
+    def __deliver(self, request, result):
+        if not request.is_cancelled():
+            request.done = True
+            request._callback(result)
+        return False
@@ -13,6 +13,9 @@ from gi.repository import GObject
 from quodlibet import config
 from quodlibet.plugins import PluginManager, PluginHandler
 from quodlibet.util.cover import built_in
+from quodlibet.util.cover.loader import CoverLoader
+from quodlibet.util.cover.cache import PixbufCache
+from quodlibet.util.cover.index import cover_index
 from quodlibet.util import print_d
 from quodlibet.util.thread import call_async
 from quodlibet.util.thumbnails import get_thumbnail_from_file
@@ -62,6 +65,14 @@ class CoverManager(GObject.Object):
     def __init__(self, use_built_in=True):
         super(CoverManager, self).__init__()
         self.plugin_handler = CoverPluginHandler(use_built_in)
+        self.loader = CoverLoader(self.get_pixbuf_many)
+        self.pixbuf_cache = PixbufCache()
+        self.connect("cover-changed", self.__cover_changed)
+
+    def __cover_changed(self, manager, songs):
+        # the cover file for a song might be a different one now
+        cover_index.forget(songs)
+        self.pixbuf_cache.clear()
 
     def init_plugins(self):
         """Register the cover sources plugin handler with the global
@@ -198,7 +209,20 @@ class CoverManager(GObject.Object):
         if fileobj is None:
             return
 
-        return get_thumbnail_from_file(fileobj, (width, height))
+        return self.__get_thumbnail(fileobj, (width, height))
+
+    def __get_thumbnail(self, fileobj, boundary):
+        cache = self.pixbuf_cache
+        key = cache.get_key(fileobj, boundary)
+        if key is not None:
+            pixbuf = cache.get(key)
+            if pixbuf is not None:
+                return pixbuf
+
+        pixbuf = get_thumbnail_from_file(fileobj, boundary)
+        if key is not None and pixbuf is not None:
+            cache.set(key, pixbuf)
+        return pixbuf
 
     def get_pixbuf(self, song, width, height):
         """see get_pixbuf_many()"""
@@ -216,5 +240,18 @@ class CoverManager(GObject.Object):
         if fileobj is None:
             return
 
-        call_async(get_thumbnail_from_file, cancel, callback,
+        call_async(self.__get_thumbnail, cancel, callback,
                    args=(fileobj, (width, height)))
+
+    def load_pixbuf_many(self, songs, width, height, callback, priority=0,
+                         cancelled=None):
+        """Like get_pixbuf_many_async(), but finding the cover happens in
+        a worker thread as well. Requests with lower priority values get
+        handled first.
+
+        Returns a CoverRequest which can be cancelled, see
+        CoverLoader.load().
+        """
+
+        return self.loader.load(
+            (list(songs), width, height), callback, priority, cancelled)
@@ -7,7 +7,9 @@
 # published by the Free Software Foundation
 
 import re
+from multiprocessing import cpu_count
 
+from gi.repository import GLib
 from senf import fsn2bytes, bytes2fsn, fsnative, expanduser
 
 from quodlibet import _
@@ -16,6 +18,8 @@ from quodlibet import config
 from quodlibet.qltk.notif import Task
 from quodlibet.util.dprint import print_d
 from quodlibet.util import copool, is_windows
+from quodlibet.util.thread import map_threaded
+from quodlibet.util.thumbnails import create_thumbnail, ThumbSize
 
 from quodlibet.query import Query
 from quodlibet.qltk.songlist import SongList
@@ -37,11 +41,25 @@ def background_filter():
     if not bg:
         return
     try:
-        return Query(bg, SongList.star).search
+        return get_query(bg, SongList.star).search
     except Query.error:
         pass
 
 
+def get_query(text, star=None):
+    """Returns a Query like Query(text, star) does, but shared through the
+    query cache of the main library if there is one.
+
+    Raises:
+        Query.error
+    """
+
+    cache = getattr(app.library, "query_cache", None)
+    if cache is not None:
+        return cache.get(text, star)
+    return Query(text, star)
+
+
 def split_scan_dirs(joined_paths):
     """Returns a list of paths
 
@@ -100,6 +118,22 @@ def get_exclude_dirs():
     return [expanduser(p) for p in paths]
 
 
+def get_scan_workers():
+    """Returns the number of threads to use for loading new files
+
+    Returns:
+        int
+    """
+
+    workers = config.getint("library", "scan_workers", 0)
+    if workers <= 0:
+        try:
+            workers = min(cpu_count(), 8)
+        except NotImplementedError:
+            workers = 2
+    return workers
+
+
 def scan_library(library, force):
     """Start the global library re-scan
 
@@ -111,7 +145,77 @@ def scan_library(library, force):
     paths = get_scan_dirs()
     exclude = get_exclude_dirs()
     copool.add(library.rebuild, paths, force, exclude,
-               cofuncid="library", funcid="library")
+               cofuncid="library", funcid="library",
+               workers=get_scan_workers(),
+               fast=config.getboolean("library", "fast_refresh"))
+
+
+def create_cover_thumbnails(songs):
+    """Creates the missing thumbnails of all sizes for the cover of songs.
+
+    Thread-safe.
+
+    Returns:
+        int: number of created thumbnails
+    """
+
+    fileobj = app.cover_manager.get_cover_many(songs)
+    if fileobj is None:
+        return 0
+
+    created = 0
+    try:
+        path = getattr(fileobj, "name", None)
+        if isinstance(path, fsnative):
+            for size in (ThumbSize.NORMAL, ThumbSize.LARGE):
+                created += create_thumbnail(path, size)
+    except GLib.GError:
+        pass
+    finally:
+        fileobj.close()
+    return created
+
+
+def iter_create_thumbnails(library, workers=1, cofuncid=None):
+    """Creates the cover thumbnails for all albums in the library, using
+    `workers` threads.
+
+    Albums get handled in a fixed order and thumbnails which exist already
+    get skipped, so running it again continues where it stopped last time.
+
+    Yields:
+        tuple: (albums done, number of albums, thumbnails created)
+    """
+
+    albums = {}
+    for song in library:
+        albums.setdefault(song.album_key, []).append(song)
+    albums = [albums[key] for key in sorted(albums)]
+
+    with Task(_("Library"), _("Creating cover thumbnails")) as task:
+        if cofuncid:
+            task.copool(cofuncid)
+
+        created = done = 0
+        for results in map_threaded(create_cover_thumbnails, albums, workers):
+            done += len(results)
+            created += sum(r for r in results if r)
+            if albums:
+                task.update(float(done) / len(albums))
+            yield done, len(albums), created
+        print_d("Created %d thumbnails for %d albums" % (created, done))
+
+
+def create_thumbnails(library):
+    """Start creating the cover thumbnails for the whole library
+
+    Args:
+        library (Library)
+    """
+
+    copool.add(iter_create_thumbnails, library,
+               workers=get_scan_workers(),
+               cofuncid="thumbnails", funcid="thumbnails")
 
 
 def emit_signal(songs, signal="changed", block_size=50, name=None,
@@ -361,6 +361,10 @@ def limit_path(path, ellipsis=True):
 
     assert isinstance(path, fsnative)
 
+    # no part can be too long
+    if len(path) <= 255:
+        return path
+
     main, ext = os.path.splitext(path)
     parts = main.split(sep)
     for i, p in enumerate(parts):
@@ -20,6 +20,16 @@ from pickle import PicklingError, UnpicklingError, PickleError
 PickleError
 
 
+def no_globals(base, module, name):
+    """A lookup_func for pickle_load() which only allows builtin types
+
+    Raises:
+        pickle.UnpicklingError
+    """
+
+    raise UnpicklingError("unexpected global %r" % name)
+
+
 def pickle_dumps(obj, protocol=0):
     """Like pickle.dumps
 
@@ -7,8 +7,10 @@
 
 """Utils for executing things in a thread controlled from the main loop"""
 
+import collections
 from multiprocessing import cpu_count
 try:
+    from concurrent import futures
     from concurrent.futures import ThreadPoolExecutor
 except ImportError as e:
     raise ImportError("python-futures is missing: %r" % e)
@@ -147,3 +149,56 @@ def call_async_background(function, cancellable, callback, args=None,
 
     _call_async(Priority.BACKGROUND, function, cancellable, callback,
                 args, kwargs)
+
+
+def map_threaded(func, items, workers, max_pending=None):
+    """Calls func for each item in a pool of worker threads.
+
+    Yields lists of results in the order of items whenever some are
+    ready. While waiting for results it blocks for a short time only and
+    yields empty lists, so it can be driven by the main loop (copool).
+    Closing the generator cancels all pending work.
+
+    If func raises, None is used as its result.
+
+    Args:
+        func (callable)
+        items (iterable)
+        workers (int): number of threads
+        max_pending (int or None): maximum number of queued items
+    Yields:
+        list
+    """
+
+    if max_pending is None:
+        max_pending = workers * 4
+
+    executor = ThreadPoolExecutor(workers)
+    pending = collections.deque()
+    items = iter(items)
+    try:
+        while True:
+            while len(pending) < max_pending:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    break
+                pending.append(executor.submit(func, item))
+
+            if not pending:
+                break
+
+            futures.wait([pending[0]], timeout=0.015)
+            results = []
+            while pending and pending[0].done():
+                future = pending.popleft()
+                try:
+                    results.append(future.result())
+                except Exception:
+                    util.print_exc()
+                    results.append(None)
+            yield results
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
@@ -177,3 +177,36 @@ def get_thumbnail(path, boundary):
         pass
 
     return scale(thumb_pb, boundary)
+
+
+def create_thumbnail(path, thumb_size):
+    """Creates the thumbnail of size `thumb_size` (a ThumbSize) for the image
+    at `path`, unless there is one which was written after the image got
+    last modified.
+
+    Returns True if a new thumbnail had to be created, False also for
+    images which are too small to need one.
+    Can raise GLib.GError. Thread-safe.
+    """
+
+    assert isinstance(path, fsnative)
+
+    path_mtime = mtime(path)
+    if path_mtime == 0 or path.startswith(tempfile.gettempdir()):
+        return False
+
+    boundary = (thumb_size, thumb_size)
+    thumb_path = get_cache_info(path, boundary)[0]
+    # checking the file mtime is enough here, get_thumbnail() still
+    # checks the one saved in the thumbnail
+    if mtime(thumb_path) >= path_mtime:
+        return False
+
+    # get_thumbnail() doesn't save any for images smaller than the
+    # thumbnail, don't load them each time
+    info, width, height = GdkPixbuf.Pixbuf.get_file_info(path)
+    if width < thumb_size and height < thumb_size:
+        return False
+
+    get_thumbnail(path, boundary)
+    return True
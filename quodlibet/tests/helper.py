@@ -17,8 +17,9 @@ from gi.repository import Gtk, Gdk
 from senf import fsnative, environ
 
 from quodlibet.qltk import find_widgets, get_primary_accel_mod
+from quodlibet.formats import AudioFile
 from quodlibet.util.path import normalize_path
-from quodlibet.compat import StringIO
+from quodlibet.compat import StringIO, text_type
 
 
 def dummy_path(path):
@@ -28,6 +29,19 @@ def dummy_path(path):
     return path
 
 
+def make_song(key, **kwargs):
+    """Returns an AudioFile for the file "/dir/<key>.ogg" with the tags
+    passed as keyword arguments.
+    """
+
+    song = AudioFile({
+        "~filename": fsnative(u"/dir/%s.ogg" % text_type(key)),
+        "~mountpoint": fsnative(u"/"),
+    })
+    song.update(kwargs)
+    return song
+
+
 @contextlib.contextmanager
 def locale_numeric_conv(
         decimal_point=".", grouping=[3, 3, 0], thousands_sep=","):
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+import json
+
+from tests import TestCase
+from tests.helper import capture_output
+
+from benchmarks import run, main
+from benchmarks.songs import generate_songs
+
+
+class TBenchmarks(TestCase):
+
+    def test_generate_songs(self):
+        songs = generate_songs(100, seed=42)
+        self.assertEqual(len(songs), 100)
+        self.assertEqual(len({s.key for s in songs}), 100)
+        self.assertEqual(
+            [dict(s) for s in songs],
+            [dict(s) for s in generate_songs(100, seed=42)])
+
+    def test_run(self):
+        with capture_output() as (out, err):
+            result = run(size=50, repeat=1, output=out)
+        self.assertEqual(result["size"], 50)
+        self.assertTrue(result["results"])
+        for value in result["results"].values():
+            self.assertEqual(len(value["runs"]), 1)
+
+        self.assertRaises(ValueError, run, size=50, names=["nope"])
+
+    def test_main(self):
+        with capture_output() as (out, err):
+            self.assertEqual(main(["-s", "20", "-r", "1", "query_parse"]), 0)
+        result = json.loads(out.getvalue())
+        self.assertEqual(list(result["results"]), ["query_parse"])
@@ -21,9 +21,10 @@ from quodlibet.browsers.albums import AlbumList
 from quodlibet.browsers.albums.models import AlbumItem
 from quodlibet.browsers.albums.prefs import Preferences, DEFAULT_PATTERN_TEXT
 from quodlibet.browsers.albums.main import (compare_title, compare_artist,
-    compare_genre, compare_rating, compare_date)
+    compare_genre, compare_rating, compare_date, VisibleUpdate)
 from quodlibet.formats import AudioFile
 from quodlibet.library import SongLibrary, SongLibrarian
+from quodlibet.qltk.models import ObjectStore
 from quodlibet.util.collection import Album
 
 
@@ -125,6 +126,42 @@ class TAlbumSort(TestCase):
         self.assertOrder(compare_rating, [AlbumItem(None), a, b, c, n])
 
 
+class FakeVisibleUpdate(VisibleUpdate):
+
+    def __init__(self):
+        self.updated = []
+        self._VisibleUpdate__requests = {}
+
+    def _row_needs_update(self, model, iter_):
+        return True
+
+    def _update_row(self, model, iter_, priority):
+        self.updated.append((model.get_value(iter_), priority))
+
+
+class TVisibleUpdate(TestCase):
+
+    def test_priority(self):
+        model = ObjectStore()
+        model.append_many(range(100))
+
+        class FakeView(object):
+
+            def get_model(self):
+                return model
+
+            def get_visible_range(self):
+                return Gtk.TreePath(10), Gtk.TreePath(20)
+
+        update = FakeVisibleUpdate()
+        update._VisibleUpdate__update_visible_rows(FakeView(), 3)
+        rows = [row for row, priority in sorted(
+            update.updated, key=lambda u: u[1])]
+        self.assertEqual(sorted(rows), list(range(7, 24)))
+        self.assertEqual(rows[0], 15)
+        self.assertEqual(set(rows[-2:]), {7, 23})
+
+
 class TAlbumBrowser(TestCase):
 
     def setUp(self):
@@ -15,7 +15,7 @@ from quodlibet.browsers.paned import PanedBrowser
 from quodlibet.browsers.paned.util import PaneConfig
 from quodlibet.browsers.paned.util import get_headers
 from quodlibet.browsers.paned.models import AllEntry, UnknownEntry, SongsEntry
-from quodlibet.browsers.paned.models import PaneModel
+from quodlibet.browsers.paned.models import PaneModel, PaneIndex
 from quodlibet.browsers.paned.prefs import PatternEditor, Preferences
 from quodlibet.browsers.paned.prefs import PreferencesButton
 from quodlibet.browsers.paned.pane import Pane
@@ -387,6 +387,53 @@ class TMultiPane(TestCase):
         config.quit()
 
 
+class TPaneIndex(TestCase):
+
+    def _keys(self, entries):
+        return [e.key for e in entries]
+
+    def test_get_entries(self):
+        index = PaneIndex(PaneConfig("artist"))
+        entries = index.get_entries(SONGS)
+        self.assertEqual(len(index), len(SONGS))
+        self.assertEqual(self._keys(entries), ["boris", "mu", "piman", ""])
+        self.assertTrue(isinstance(entries[-1], UnknownEntry))
+        self.assertEqual(entries[2].songs, set(SONGS[2:4]))
+
+        # few songs get grouped, many intersected
+        self.assertEqual(self._keys(index.get_entries([SONGS[3]])),
+                         ["piman"])
+        self.assertEqual(self._keys(index.get_entries(SONGS[1:])),
+                         ["mu", "piman", ""])
+        self.assertEqual(index.get_entries([]), [])
+
+    def test_entries_not_shared(self):
+        index = PaneIndex(PaneConfig("artist"))
+        entries = index.get_entries(SONGS)
+        entries[0].songs.clear()
+        self.assertEqual(index.get_entries(SONGS)[0].songs, {SONGS[0]})
+
+    def test_remove_songs(self):
+        index = PaneIndex(PaneConfig("artist"))
+        index.get_entries(SONGS)
+        self.assertEqual(index.remove_songs(SONGS[2:]), {"piman", ""})
+        self.assertEqual(len(index), 2)
+        self.assertEqual(self._keys(index.get_entries(SONGS[:2])),
+                         ["boris", "mu"])
+        self.assertEqual(index.remove_songs(SONGS[2:]), set())
+
+    def test_sort(self):
+        index = PaneIndex(PaneConfig("<artist>"))
+        entries = index.get_entries(SONGS)
+        self.assertEqual(self._keys(entries), ["boris", "mu", "piman", ""])
+
+        index = PaneIndex(PaneConfig("artist"))
+        songs = [AudioFile({"artist": a, "~filename": fsnative(u"/%d" % i)})
+                 for i, a in enumerate([u"b", u"A", u"c"])]
+        self.assertEqual(self._keys(index.get_entries(songs)),
+                         [u"A", u"b", u"c"])
+
+
 class TPaneModel(TestCase):
 
     def _verify_model(self, model):
@@ -514,6 +561,18 @@ class TPaneModel(TestCase):
         self.assertNotEqual(length, len(m))
         self.assertEqual(len(m), 0)
 
+    def test_set_songs(self):
+        conf = PaneConfig("artist")
+        m = PaneModel(conf)
+        m.set_songs(SONGS)
+        self._verify_model(m)
+        self.assertEqual([e.key for e in m.itervalues()],
+                         [None, "boris", "mu", "piman", ""])
+        m.set_songs(SONGS[2:4])
+        self.assertEqual([e.key for e in m.itervalues()], ["piman"])
+        m.set_songs([])
+        self.assertEqual(len(m), 0)
+
     def test_remove_steps(self):
         conf = PaneConfig("artist")
         m = PaneModel(conf)
@@ -14,7 +14,7 @@ from .helper import capture_output
 
 from quodlibet import formats
 from quodlibet.formats import AudioFile, load_audio_files, dump_audio_files, \
-    SerializationError
+    SerializationError, dump_audio_file, load_audio_file_entries
 from quodlibet.compat import PY3, long
 from quodlibet.util.picklehelper import pickle_dumps
 from quodlibet import config
@@ -219,6 +219,35 @@ class TPickle(TestCase):
             self.assertEqual(len(items), len(formats.types) - 1)
             assert all(isinstance(i, AudioFile) for i in items)
 
+    def test_dump_audio_file(self):
+        entries = [dump_audio_file(i, process=False) for i in self.instances]
+        items = load_audio_file_entries(entries)
+        assert len(items) == len(self.instances)
+        for a, b in zip(items, self.instances):
+            assert type(a) is type(b)
+            assert a["b"] == 42
+            assert a["c"] == 0.25
+
+    def test_load_shared(self):
+        songs = [AudioFile(album=u"foo", title=u"bar") for i in range(2)]
+        for items in [load_audio_files(dump_audio_files(songs)),
+                      load_audio_file_entries(
+                          [dump_audio_file(s) for s in songs])]:
+            a, b = items
+            assert dict(a) == dict(b)
+            assert a["album"] is b["album"]
+            assert [k for k in a if k == "title"][0] is \
+                [k for k in b if k == "title"][0]
+
+    def test_load_audio_file_entries_broken(self):
+        entries = [dump_audio_file(i, False).replace(b"SPCFile", b"FooFile")
+                   for i in self.instances]
+        entries.append(b"nope")
+        entries.append(pickle_dumps([42], 2))
+        items = load_audio_file_entries(entries)
+        assert len(items) == len(self.instances) - 1
+        assert all(isinstance(i, AudioFile) for i in items)
+
     def test_unpickle_random_class(self):
         for protocol in [0, 1, 2]:
             data = pickle_dumps([42], protocol)
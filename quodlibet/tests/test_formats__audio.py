@@ -147,6 +147,35 @@ class TAudioFile(TestCase):
             with self.assertRaises(ValueError):
                 af[b"\xff"] = u"bar"
 
+    def test_setitem_shared(self):
+        a = AudioFile()
+        b = AudioFile()
+        a["".join(["gen", "re"])] = "".join(["Ro", "ck"])
+        b["".join(["gen", "re"])] = "".join(["Ro", "ck"])
+        assert listkeys(a)[0] is listkeys(b)[0]
+        assert a["genre"] is b["genre"]
+
+        # unique values aren't kept around
+        a["title"] = "".join(["fo", "o"])
+        b["title"] = "".join(["fo", "o"])
+        assert a["title"] == b["title"]
+        assert a["title"] is not b["title"]
+
+    def test_compact(self):
+        a = AudioFile()
+        b = AudioFile()
+        for song in [a, b]:
+            dict.update(song, {
+                "".join(["alb", "um"]): "".join(["fo", "o"]),
+                "~#playcount": 3,
+                "~mountpoint": fsnative(u"".join([u"/mn", u"t"])),
+            })
+            song._compact()
+        assert dict(a) == dict(b)
+        for key in a:
+            assert a[key] is b[key]
+            assert [k for k in b if k == key][0] is key
+
     def test_call(self):
         # real keys should lookup the same
         for key in bar_1_1.realkeys():
@@ -208,6 +237,37 @@ class TAudioFile(TestCase):
             self.failUnlessEqual(
                 song("~title~~#tracks"), song("~title~~#tracks"))
 
+    def test_call_cached(self):
+        af = AudioFile(artist=u"a", tracknumber=u"2/3")
+        self.assertEqual(af("~people"), u"a")
+        self.assertEqual(af("~people", u"x"), u"a")
+        self.assertEqual(af("~#track"), 2)
+        self.assertEqual(af("~artist~~#track"), u"a - 2")
+
+        af["composer"] = u"b"
+        self.assertEqual(af("~people"), u"a\nb")
+        af.update(performer=u"c")
+        self.assertEqual(af("~people"), u"a\nb\nc")
+        af.pop("performer")
+        self.assertEqual(af("~people"), u"a\nb")
+        del af["tracknumber"]
+        self.assertEqual(af("~#track"), u"")
+        self.assertEqual(af("~#track", 42), 42)
+        self.assertEqual(af("~artist~~#track"), u"a")
+        af.clear()
+        self.assertEqual(af("~people", u"x"), u"x")
+
+    def test_call_uncached(self):
+        af = AudioFile(title=u"a")
+        default = config.RATINGS.default
+        try:
+            config.RATINGS.default = 0.25
+            self.assertEqual(af("~title~~#rating"), u"a - 0.25")
+            config.RATINGS.default = 0.75
+            self.assertEqual(af("~title~~#rating"), u"a - 0.75")
+        finally:
+            config.RATINGS.default = default
+
     def test_tied_filename_numeric(self):
         self.assertEqual(
             bar_1_2("~~filename~~#originalyear"), u'/fakepath/2 - 2005')
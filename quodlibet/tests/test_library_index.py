@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+import time
+
+from tests import TestCase
+from tests.helper import make_song
+
+from quodlibet import config
+
+from quodlibet.query import Query
+from quodlibet.library.libraries import SongLibrary
+from quodlibet.library.index import fold_text, get_tokens, get_literal_runs
+from quodlibet.compat import text_type
+
+
+class Tfunctions(TestCase):
+
+    def test_fold_text(self):
+        self.assertEqual(fold_text(u"FooBar"), u"foobar")
+        self.assertEqual(fold_text(u"Föhn Ǿ"), u"fohn o")
+        self.assertEqual(fold_text(u"ıx"), u"ix")
+        self.assertEqual(fold_text(u"straße"), u"strasse")
+        self.assertTrue(isinstance(fold_text(u"foo"), text_type))
+
+    def test_get_tokens(self):
+        self.assertEqual(
+            get_tokens(u"The Beatles - Abbey Road\nfoo"),
+            {u"the", u"beatles", u"abbey", u"road", u"foo"})
+
+    def test_get_literal_runs(self):
+        self.assertEqual(get_literal_runs(u"foo"), [u"foo"])
+        self.assertEqual(get_literal_runs(u"^Foo\\-Bar$"), [u"foo", u"bar"])
+        self.assertEqual(get_literal_runs(u"föhn"), [u"f", u"hn"])
+        self.assertEqual(get_literal_runs(u"foo bar"), [u"foo", u"bar"])
+        self.assertTrue(get_literal_runs(u"") is None)
+        self.assertTrue(get_literal_runs(u"\\-") is None)
+        self.assertTrue(get_literal_runs(u"fo.") is None)
+        self.assertTrue(get_literal_runs(u"a|b") is None)
+        self.assertTrue(get_literal_runs(u"\\d") is None)
+
+
+class TTagIndex(TestCase):
+
+    QUERIES = [
+        u"beatles", u"Beat", u"föhn", u"fohn", u"FÖHN", u"road abbey",
+        u"artist=beatles", u"title=/road/", u"title=\"Abbey Road\"",
+        u"title=|(road, help)", u"title=&(abbey, road)", u"!beatles",
+        u"&(beatles, !help)", u"|(beatles, föhn)", u"#(track > 2)",
+        u"#(track <= 2)", u"#(2 < track)", u"#(track = 3)",
+        u"#(track != 3)", u"#(1 < track < 4)", u"#(playcount > 0)",
+        u"#(rating > 0.5)", u"~people=beatles", u"~filename=abbey",
+        u"~basename=1", u"version=live", u"title=/ro+d/", u"straße",
+        u"strasse", u"-", u"&(#(track > 1), title=road)",
+    ]
+
+    def setUp(self):
+        config.init()
+        self.library = SongLibrary()
+        self.songs = [
+            make_song(1, artist=u"The Beatles", title=u"Abbey Road",
+                      tracknumber=u"1"),
+            make_song(2, artist=u"The Beatles", title=u"Help!",
+                      tracknumber=u"2/10", version=u"Live"),
+            make_song(3, artist=u"Föhn", title=u"Road Trip",
+                      tracknumber=u"3"),
+            make_song(4, artist=u"Straße", title=u"Abbey",
+                      tracknumber=u"4", composer=u"Beatles"),
+            make_song(5, title=u"Nothing"),
+        ]
+        self.songs[0]["~#playcount"] = 3
+        self.library.add(self.songs)
+        self.library.enable_tag_index()
+        self.index = self.library.tag_index
+
+    def tearDown(self):
+        self.library.destroy()
+        config.quit()
+
+    def _check(self):
+        for text in self.QUERIES:
+            query = Query(text)
+            expected = set(filter(query.search, self.songs))
+            candidates = self.index.candidates(query)
+            if candidates is not None:
+                self.assertTrue(expected <= set(candidates), msg=text)
+            self.assertEqual(set(query.filter(self.library)), expected,
+                             msg=text)
+
+    def test_superset(self):
+        self._check()
+
+    def _candidates(self, text):
+        return set(self.index.candidates(Query(text)))
+
+    def test_narrows(self):
+        self.assertEqual(self._candidates(u"beatles"), set(self.songs[:2]))
+        self.assertEqual(
+            self._candidates(u"#(track > 2)"), set(self.songs[2:4]))
+        self.assertEqual(
+            self._candidates(u"&(#(track > 1), beatles)"), {self.songs[1]})
+        self.assertTrue(self.index.candidates(Query(u"!beatles")) is None)
+        self.assertTrue(
+            self.index.candidates(Query(u"|(beatles, !foo)")) is None)
+        self.assertTrue(self.index.candidates(Query(u"~lyrics=x")) is None)
+
+    def _matches(self, text):
+        matches = self.index.matches(Query(text))
+        return matches if matches is None else set(matches)
+
+    def test_matches(self):
+        self.songs[0]["~#rating"] = 1.0
+        self.songs[1]["~#lastplayed"] = time.time() - 3600 * 24 * 2
+        self.songs[2]["~#lastplayed"] = time.time() - 60
+        self.songs[3]["date"] = u"2004"
+        self.library.changed(self.songs[:4])
+
+        self.assertTrue(self._matches(u"beatles") is None)
+        self.assertTrue(self._matches(u"&(beatles, #(track > 2))") is None)
+        self.assertEqual(self._matches(u""), set(self.songs))
+        self.assertEqual(
+            self._matches(u"#(track > 2)"), set(self.songs[2:4]))
+        self.assertEqual(
+            self._matches(u"!#(track > 2)"),
+            set(self.songs) - set(self.songs[2:4]))
+        self.assertEqual(
+            self._matches(u"#(lastplayed < 1 day)"), {self.songs[2]})
+        # never played counts as played at 0
+        self.assertEqual(
+            self._matches(u"#(lastplayed > 1 hour)"),
+            set(self.songs) - {self.songs[2]})
+        self.assertEqual(
+            self._matches(u"|(#(track = 1), #(year > 2000))"),
+            {self.songs[0], self.songs[3]})
+        for text in [u"#(lastplayed < 1 day)", u"#(lastplayed > 1 hour)",
+                     u"#(year > 2000)", u"#(rating < 1)"]:
+            self.assertEqual(self._matches(text),
+                             set(filter(Query(text).search, self.songs)))
+        self.assertEqual(self._matches(u"#(rating = 1)"), {self.songs[0]})
+        self.assertEqual(
+            self._matches(u"#(rating < 1)"), set(self.songs[1:]))
+
+        default = config.RATINGS.default
+        config.RATINGS.default = 1.0
+        try:
+            self.assertEqual(
+                self._matches(u"#(rating = 1)"), set(self.songs))
+        finally:
+            config.RATINGS.default = default
+
+        self.songs[0]["~#rating"] = 0.2
+        self.library.changed(self.songs[:1])
+        self.assertEqual(self._matches(u"#(rating < 0.5)"), {self.songs[0]})
+        self.library.remove(self.songs[:1])
+        self.assertEqual(self._matches(u"#(rating < 0.5)"), set())
+
+    def test_changes(self):
+        self._check()
+        self.songs[2]["~#playcount"] = 1
+        self.library.changed(self.songs[2:3])
+        self.assertEqual(
+            self._candidates(u"#(playcount > 0)"),
+            {self.songs[0], self.songs[2]})
+        self.songs[4]["artist"] = u"Beatles"
+        self.songs[0]["title"] = u"Something"
+        self.songs[0]["tracknumber"] = u"5"
+        self.library.changed(self.songs[::4])
+        self._check()
+        self.library.remove(self.songs[1:2])
+        self.songs.pop(1)
+        self._check()
+        song = make_song(6, artist=u"Beatles", title=u"Road")
+        self.library.add([song])
+        self.songs.append(song)
+        self._check()
+
+    def test_query(self):
+        self.assertEqual(
+            set(self.library.query(u"beatles")),
+            set(filter(Query(u"beatles").search, self.songs)))
+
+    def test_destroy(self):
+        self.library.destroy()
+        self.assertTrue(self.library.tag_index is None)
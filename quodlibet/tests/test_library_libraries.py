@@ -12,7 +12,7 @@ from senf import fsnative
 from quodlibet.formats import AudioFileError
 from quodlibet import config
 from quodlibet.util import connect_obj, is_windows
-from quodlibet.formats import AudioFile
+from quodlibet.formats import AudioFile, dump_audio_files
 from quodlibet.compat import text_type, iteritems, iterkeys, itervalues
 
 from tests import TestCase, get_data_path, mkstemp, mkdtemp, skipIf
@@ -234,6 +234,21 @@ class TLibrary(TestCase):
         self.failUnlessEqual(sorted(self.library.items()), expected)
         self.failUnlessEqual(sorted(iteritems(self.library)), expected)
 
+    def test_get_unsaved(self):
+        self.library.add(self.Frange(10))
+        unsaved, removed, keys = self.library._get_unsaved(set())
+        self.assertEqual(sorted(unsaved), self.Frange(10))
+        self.assertFalse(removed)
+
+        self.library._unsaved.clear()
+        self.library.remove(self.Frange(3))
+        self.library.changed(self.Frange(5))
+        saved_keys = {i.key for i in self.Frange(10)}
+        unsaved, removed, keys = self.library._get_unsaved(saved_keys)
+        self.assertEqual(sorted(unsaved), self.Frange(3, 5))
+        self.assertEqual(removed, {i.key for i in self.Frange(3)})
+        self.assertEqual(keys, {i.key for i in self.Frange(3, 10)})
+
     def test_has_key(self):
         self.failIf(self.library.has_key(10))
         new = self.Fake(10)
@@ -313,6 +328,76 @@ class TPicklingMixin(TestCase):
             os.unlink(filename)
 
 
+class TPicklingJournal(TestCase):
+
+    def setUp(self):
+        fd, self.filename = mkstemp()
+        os.close(fd)
+        os.unlink(self.filename)
+        self.journal = self.filename + ".journal"
+        self.library = SongLibrary()
+        self.library.load(self.filename)
+
+    def tearDown(self):
+        self.library.destroy()
+        for path in [self.filename, self.journal]:
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def _reload(self):
+        library = SongLibrary()
+        library.load(self.filename)
+        return library
+
+    def _assert_same(self, library):
+        self.assertEqual(
+            sorted(self.library.keys()), sorted(library.keys()))
+        for song in self.library:
+            self.assertEqual(dict(song), dict(library[song.key]))
+
+    def test_save_journal(self):
+        songs = FakeAudioFileRange(100)
+        self.library.add(songs)
+        self.library.save()
+        self.assertFalse(os.path.exists(self.journal))
+
+        songs[0]["title"] = u"foo"
+        self.library.changed([songs[0]])
+        self.library.remove(songs[1:3])
+        self.library.save()
+        self.assertFalse(self.library.dirty)
+        self.assertTrue(os.path.exists(self.journal))
+        self._assert_same(self._reload())
+
+    def test_compaction(self):
+        songs = FakeAudioFileRange(10)
+        self.library.add(songs)
+        self.library.save()
+        for i in range(10):
+            self.library.changed(songs)
+            self.library.save()
+            if not os.path.exists(self.journal):
+                break
+        else:
+            self.fail("journal never compacted")
+        self._assert_same(self._reload())
+
+    def test_journal_ignored_for_other_base(self):
+        songs = FakeAudioFileRange(10)
+        self.library.add(songs)
+        self.library.save()
+        self.library.remove(songs[:5])
+        self.library.save()
+        self.assertTrue(os.path.exists(self.journal))
+
+        # replace the library file, the journal no longer applies
+        with open(self.filename, "wb") as h:
+            h.write(dump_audio_files(songs))
+        library = self._reload()
+        self.assertEqual(len(library), 10)
+        library.destroy()
+
+
 class TSongLibrary(TLibrary):
     Fake = FakeSong
     Frange = staticmethod(FSrange)
@@ -525,6 +610,54 @@ class TSongFileLibrary(TSongLibrary):
         finally:
             os.unlink(filename)
 
+    def test_scan_threaded(self):
+        config.init()
+        dirname = mkdtemp()
+        try:
+            for i in range(20):
+                shutil.copy(get_data_path('empty.flac'),
+                            os.path.join(dirname, "%d.flac" % i))
+            for workers in [1, 4]:
+                for value in self.library.scan([dirname], workers=workers):
+                    pass
+                self.assertEqual(len(self.library), 20)
+            self.assertEqual(len(self.added), 20)
+        finally:
+            shutil.rmtree(dirname)
+            config.quit()
+
+    def test_rebuild_fast(self):
+        config.init()
+        dirname = mkdtemp()
+        try:
+            for i in range(5):
+                shutil.copy(get_data_path('empty.flac'),
+                            os.path.join(dirname, "%d.flac" % i))
+            for value in self.library.rebuild([dirname], fast=True):
+                pass
+            self.assertEqual(len(self.library), 5)
+            for value in self.library.rebuild([], fast=True):
+                pass
+            self.assertTrue(
+                os.path.realpath(dirname) in self.library._dir_mtimes)
+
+            # the folder didn't change, so the song doesn't get checked
+            song = list(self.library.values())[0]
+            song["~#mtime"] = 0
+            for value in self.library.rebuild([], fast=True):
+                pass
+            self.assertEqual(song["~#mtime"], 0)
+
+            # something changed the folder
+            os.utime(dirname, (0, 0))
+            for value in self.library.rebuild([], fast=True):
+                pass
+            self.assertNotEqual(song["~#mtime"], 0)
+            self.assertEqual(len(self.changed), 1)
+        finally:
+            shutil.rmtree(dirname)
+            config.quit()
+
     def test_add_filename_normalize_path(self):
         if not os.name == "nt":
             return
@@ -683,6 +816,41 @@ class TAlbumLibrarySignals(TestCase):
         self.failUnlessEqual(self.received,
             ["added", "a_added", "changed", "a_changed"])
 
+    def _album_titles(self):
+        return sorted((a.title, len(a.songs)) for a in self.albums.values())
+
+    def _set_album(self, song, album):
+        song["album"] = song["labelid"] = album
+
+    def test_change_key(self):
+        songs = [AlbumSong(1, "a1"), AlbumSong(2, "a1"), AlbumSong(4, "a2")]
+        self.lib.add(songs)
+        self._set_album(songs[0], "a2")
+        self.lib.changed(songs[:1])
+        self.assertEqual(self._album_titles(), [("a1", 1), ("a2", 2)])
+        self.assertEqual(self.received,
+                         ["added", "a_added", "changed", "a_changed"])
+
+        self._set_album(songs[1], "a3")
+        self.lib.changed(songs[1:2])
+        self.assertEqual(self._album_titles(), [("a2", 2), ("a3", 1)])
+        self.assertEqual(self.received[-3:],
+                         ["changed", "a_removed", "a_added"])
+
+        self.lib.remove(songs[1:2])
+        self.assertEqual(self._album_titles(), [("a2", 2)])
+
+    def test_change_key_swap(self):
+        songs = [AlbumSong(1, "a1"), AlbumSong(4, "a2")]
+        self.lib.add(songs)
+        albums = set(self.albums.values())
+        self._set_album(songs[0], "a2")
+        self._set_album(songs[1], "a1")
+        self.lib.changed(songs)
+        self.assertEqual(self._album_titles(), [("a1", 1), ("a2", 1)])
+        self.assertEqual(set(self.albums.values()), albums)
+        self.assertEqual(self.received[-2:], ["changed", "a_changed"])
+
     def tearDown(self):
         for s in self._asigs:
             self.albums.disconnect(s)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+from tests import TestCase
+from tests.helper import make_song
+
+from quodlibet import config
+from quodlibet.query import Query
+from quodlibet.library.libraries import SongLibrary
+from quodlibet.library.querycache import QueryCache
+
+
+class TQueryCache(TestCase):
+
+    def setUp(self):
+        config.init()
+        self.library = SongLibrary()
+        self.songs = [
+            make_song(1, artist=u"The Beatles", title=u"Help!"),
+            make_song(2, artist=u"The Beatles", title=u"Yesterday"),
+            make_song(3, artist=u"Nirvana", title=u"Lithium"),
+        ]
+        self.library.add(self.songs)
+        self.cache = QueryCache(self.library)
+
+    def tearDown(self):
+        self.cache.destroy()
+        self.library.destroy()
+        config.quit()
+
+    def _filter(self, text):
+        return set(self.cache.filter(text))
+
+    def test_get(self):
+        query = self.cache.get(u"beatles")
+        self.assertTrue(isinstance(query, Query))
+        self.assertTrue(self.cache.get(u"beatles") is query)
+        self.assertFalse(self.cache.get(u"beatles", ["title"]) is query)
+        self.assertRaises(Query.error, self.cache.get, u"#(foo")
+
+    def test_get_extension(self):
+        query = self.cache.get(u"@(nope)")
+        self.assertFalse(self.cache.get(u"@(nope)") is query)
+        self.assertEqual(len(self.cache._entries), 0)
+        self.assertEqual(self._filter(u"@(nope)"), set())
+
+    def test_filter(self):
+        self.assertEqual(self._filter(u"beatles"), set(self.songs[:2]))
+        self.assertEqual(self._filter(u"beatles"), set(self.songs[:2]))
+        self.assertRaises(Query.error, self.cache.filter, u"#(foo")
+
+    def test_changed(self):
+        self._filter(u"beatles")
+        self.songs[0]["artist"] = u"Someone"
+        self.songs[2]["artist"] = u"Beatles"
+        self.library.changed(self.songs)
+        self.assertEqual(
+            self._filter(u"beatles"), {self.songs[1], self.songs[2]})
+
+    def test_added_removed(self):
+        self._filter(u"beatles")
+        song = make_song(4, artist=u"Beatles")
+        self.library.add([song])
+        self.assertEqual(
+            self._filter(u"beatles"), set(self.songs[:2] + [song]))
+        self.library.remove(self.songs[:1])
+        self.assertEqual(self._filter(u"beatles"), {self.songs[1], song})
+
+    def test_update_limit(self):
+        self.cache.UPDATE_LIMIT = 1
+        self._filter(u"beatles")
+        self.songs[2]["artist"] = u"Beatles"
+        self.library.changed(self.songs)
+        self.assertEqual(self._filter(u"beatles"), set(self.songs))
+
+    def test_volatile(self):
+        self.assertEqual(self._filter(u"#(lastplayed > 1 hour)"),
+                         set(self.songs))
+        self.songs[0]["~#lastplayed"] = 0
+        self.assertEqual(self._filter(u"#(lastplayed > 1 hour)"),
+                         set(self.songs))
+
+        self.assertEqual(self._filter(u"#(rating > 0.6)"), set())
+        config.RATINGS.default = 0.8
+        try:
+            self.assertEqual(self._filter(u"#(rating > 0.6)"),
+                             set(self.songs))
+        finally:
+            config.RATINGS.default = 0.5
+
+    def test_limits(self):
+        self.cache.SIZE = 2
+        self.cache.RESULT_LIMIT = 3
+        self._filter(u"beatles")
+        self._filter(u"nirvana")
+        self.assertEqual(self.cache._result_count, 3)
+        self._filter(u"the")
+        self.assertEqual(self.cache._result_count, 3)
+        self._filter(u"beatles")
+        self.assertEqual(self.cache._result_count, 2)
+        self.assertEqual(len(self.cache._entries), 2)
+
+    def test_library_query(self):
+        self.assertEqual(
+            set(self.library.query(u"beatles")), set(self.songs[:2]))
+        self.assertTrue(
+            self.library.query_cache.get(u"beatles") is not None)
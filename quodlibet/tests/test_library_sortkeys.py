@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+import os
+
+from tests import TestCase, mkdtemp
+from tests.helper import make_song
+
+from quodlibet import config
+from quodlibet.formats import AudioFile
+from quodlibet.library.libraries import SongLibrary
+from quodlibet.library.sortkeys import SortKeyCache
+from quodlibet.util.path import mtime
+
+
+class TSortKeyCache(TestCase):
+
+    def setUp(self):
+        config.init()
+        self.library = SongLibrary()
+        self.songs = [
+            make_song(1, artist=u"b"),
+            make_song(2, artist=u"C"),
+            make_song(3, artist=u"a"),
+        ]
+        self.library.add(self.songs)
+        self.cache = SortKeyCache(self.library)
+        self.calls = []
+        self.temp = mkdtemp()
+
+    def tearDown(self):
+        self.cache.destroy()
+        self.library.destroy()
+        for name in os.listdir(self.temp):
+            os.remove(os.path.join(self.temp, name))
+        os.rmdir(self.temp)
+        config.quit()
+
+    def _func(self, song):
+        self.calls.append(song)
+        return AudioFile.sort_by_func("artist")(song)
+
+    def _sorted(self, name="artist"):
+        func = self.cache.get_func(name, self._func)
+        return sorted(self.songs, key=func)
+
+    def test_get_func(self):
+        self.assertEqual(self._sorted(), [self.songs[i] for i in [2, 0, 1]])
+        self.assertEqual(len(self.calls), 3)
+        self._sorted()
+        self.assertEqual(len(self.calls), 3)
+        self.assertTrue(self.cache.dirty)
+
+    def test_changed(self):
+        self._sorted()
+        self.songs[0]["artist"] = u"z"
+        self.library.changed([self.songs[0]])
+        self.assertEqual(self._sorted(), [self.songs[i] for i in [2, 1, 0]])
+        self.assertEqual(self.calls[3:], [self.songs[0]])
+
+    def test_removed(self):
+        self._sorted()
+        self.library.remove([self.songs[0]])
+        self._sorted()
+        self.assertEqual(self.calls[3:], [self.songs[0]])
+        # not in the library, so not cached
+        self._sorted()
+        self.assertEqual(self.calls[4:], [self.songs[0]])
+
+    def test_external(self):
+        func = self._func
+        self.assertTrue(self.cache.get_func(u"~#rating", func) is func)
+        self.assertTrue(self.cache.get_func(u"<~#rating>", func) is func)
+        self.assertFalse(self.cache.get_func(u"~#playcount", func) is func)
+
+    def test_volatile_pattern(self):
+        func = self._func
+        for name in [u"<#(rating \\> 0.5)|good|bad>",
+                     u"<#(lastplayed \\< 1 day)|new|old>"]:
+            self.assertTrue(self.cache.get_func(name, func) is func)
+        self.assertFalse(
+            self.cache.get_func(u"<#(playcount \\> 1)|a|b>", func) is func)
+        self.assertFalse(self.cache.get_func(u"<artist> - <album>", func)
+                         is func)
+
+    def test_size(self):
+        for i in range(SortKeyCache.SIZE + 1):
+            self._sorted(u"artist%d" % i)
+        self.assertEqual(len(self.calls), 3 * (SortKeyCache.SIZE + 1))
+        self._sorted(u"artist0")
+        self.assertEqual(len(self.calls), 3 * (SortKeyCache.SIZE + 2))
+        self._sorted(u"artist%d" % SortKeyCache.SIZE)
+        self.assertEqual(len(self.calls), 3 * (SortKeyCache.SIZE + 2))
+
+    def test_save_load(self):
+        filename = os.path.join(self.temp, "sortkeys")
+        self._sorted()
+        self.cache.save(filename)
+        self.assertFalse(self.cache.dirty)
+
+        cache = SortKeyCache(self.library)
+        try:
+            cache.load(filename)
+            func = cache.get_func("artist", self._func)
+            self.assertEqual(sorted(self.songs, key=func),
+                             [self.songs[i] for i in [2, 0, 1]])
+            self.assertEqual(len(self.calls), 3)
+        finally:
+            cache.destroy()
+
+    def test_load_outdated(self):
+        filename = os.path.join(self.temp, "sortkeys")
+        self._sorted()
+        self.cache.save(filename)
+
+        self.library.filename = os.path.join(self.temp, "library")
+        with open(self.library.filename, "wb"):
+            pass
+        os.utime(self.library.filename,
+                 (mtime(filename) + 10, mtime(filename) + 10))
+
+        cache = SortKeyCache(self.library)
+        try:
+            cache.load(filename)
+            sorted(self.songs, key=cache.get_func("artist", self._func))
+            self.assertEqual(len(self.calls), 6)
+        finally:
+            cache.destroy()
+
+    def test_load_broken(self):
+        filename = os.path.join(self.temp, "sortkeys")
+        with open(filename, "wb") as h:
+            h.write(b"nope")
+        self.cache.load(filename)
+        self.cache.load(os.path.join(self.temp, "missing"))
+        self._sorted()
+        self.assertEqual(len(self.calls), 3)
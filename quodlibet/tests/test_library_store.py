@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+import os
+
+from senf import fsnative
+
+from tests import TestCase, mkdtemp
+from tests.helper import make_song
+
+from quodlibet.formats import dump_audio_files
+from quodlibet.library.store import SongStore, StoreError, is_store
+from quodlibet.library.libraries import SongFileLibrary
+
+
+def make_store_song(key):
+    return make_song(key, title=u"Title %s" % key, **{"~#rating": 0.5})
+
+
+class TSongStore(TestCase):
+
+    def setUp(self):
+        self.dir = mkdtemp()
+        self.filename = os.path.join(self.dir, "store")
+
+    def tearDown(self):
+        for name in os.listdir(self.dir):
+            os.remove(os.path.join(self.dir, name))
+        os.rmdir(self.dir)
+
+    def test_empty(self):
+        store = SongStore(self.filename)
+        assert len(store) == 0
+        assert list(store.iter_chunks()) == []
+        store.close()
+        assert is_store(self.filename)
+
+    def test_update(self):
+        store = SongStore(self.filename)
+        songs = [make_store_song(i) for i in range(10)]
+        store.update(songs, [])
+        assert len(store) == 10
+        songs[0]["title"] = u"new"
+        store.update([songs[0]], [songs[1].key, songs[2].key])
+        assert len(store) == 8
+        loaded = [i for c in store.iter_chunks(chunk_size=3) for i in c]
+        assert len(loaded) == 8
+        expected = songs[:1] + songs[3:]
+        assert {s.key for s in loaded} == {s.key for s in expected}
+        assert {s["title"] for s in loaded if s.key == songs[0].key} == {"new"}
+        store.close()
+
+    def test_create_replaces(self):
+        store = SongStore.create(self.filename, [make_store_song(1)])
+        store.close()
+        store = SongStore.create(self.filename, [make_store_song(2)])
+        assert [s.key for c in store.iter_chunks() for s in c] == \
+            [make_song(2)("~filename")]
+        store.close()
+
+    def test_dir_mtimes(self):
+        store = SongStore(self.filename)
+        assert store.get_dir_mtimes() == {}
+        mtimes = {fsnative(u"/foo"): 1.5, fsnative(u"/bar"): 2.0}
+        store.set_dir_mtimes(mtimes)
+        store.close()
+        store = SongStore(self.filename)
+        assert store.get_dir_mtimes() == mtimes
+        store.close()
+
+    def test_invalid(self):
+        with open(self.filename, "wb") as h:
+            h.write(b"nope" * 100)
+        self.assertRaises(StoreError, SongStore, self.filename)
+        assert not is_store(self.filename)
+
+
+class TStoreMixin(TestCase):
+
+    def setUp(self):
+        self.dir = mkdtemp()
+        self.filename = os.path.join(self.dir, "songs")
+        self.library = SongFileLibrary()
+
+    def tearDown(self):
+        self.library.destroy()
+        for name in os.listdir(self.dir):
+            os.remove(os.path.join(self.dir, name))
+        os.rmdir(self.dir)
+
+    def _reload(self):
+        self.library.destroy()
+        self.library = SongFileLibrary()
+        self.library.load(self.filename)
+
+    def test_migrate_pickle(self):
+        songs = [make_store_song(i) for i in range(10)]
+        with open(self.filename, "wb") as h:
+            h.write(dump_audio_files(songs))
+        self.library.load(self.filename)
+        assert len(self.library) == 10
+        assert is_store(self.filename)
+        assert os.path.exists(self.filename + ".pickle")
+        self._reload()
+        assert len(self.library) == 10
+
+    def test_save_dir_mtimes(self):
+        self.library.load(self.filename)
+        self.library._dir_mtimes = {fsnative(u"/foo"): 1.0}
+        self.library.save()
+        self._reload()
+        assert self.library._dir_mtimes == {fsnative(u"/foo"): 1.0}
+
+    def test_save_changes(self):
+        self.library.load(self.filename)
+        songs = [make_store_song(i) for i in range(10)]
+        self.library.add(songs)
+        self.library.save()
+        songs[0]["title"] = u"changed"
+        self.library.changed([songs[0]])
+        self.library.remove([songs[1]])
+        assert self.library.dirty
+        self.library.save()
+        assert not self.library.dirty
+        self._reload()
+        assert len(self.library) == 9
+        assert self.library[songs[0].key]["title"] == u"changed"
+        assert songs[1].key not in self.library
+
+    def test_save_masked(self):
+        self.library.load(self.filename)
+        songs = [make_store_song(i) for i in range(2)]
+        self.library.add(songs[:1])
+        self.library.save()
+        songs[0]["title"] = u"changed"
+        self.library.changed([songs[0]])
+        self.library.add(songs[1:])
+        self.library.mask(songs[0].mountpoint)
+        assert not len(self.library)
+        self.library.save()
+        self._reload()
+        assert len(self.library) == 2
+        assert self.library[songs[0].key]["title"] == u"changed"
@@ -7,11 +7,14 @@ import os
 
 from senf import fsnative
 
-from tests import TestCase
+from tests import TestCase, mkdtemp
 
+from quodlibet import config
 from quodlibet.formats import AudioFile
 from quodlibet.pattern import (FileFromPattern, XMLFromPattern, Pattern,
     XMLFromMarkupPattern, ArbitraryExtensionFileFromPattern)
+from quodlibet.pattern._pattern import PatternCache, PatternFormatter, \
+    _XMLFromPattern, ResultCache, result_cache, PatternCompiler
 
 
 class _TPattern(TestCase):
@@ -232,6 +235,61 @@ class TPattern(_TPattern):
         s.assertEquals(pat.format(song),
             b"5. \xe3\x81\x99\xe3\x81\xbf\xe3\x82\x8c".decode('utf-8'))
 
+    def test_cache_revision(self):
+        song = AudioFile(artist=u"a", title=u"b")
+        pat = Pattern(u"<artist> - <title>")
+        revision = song.revision
+        self.assertEqual(pat.format(song), u"a - b")
+        self.assertEqual(song.revision, revision)
+        self.assertEqual(pat.format_list(song), {(u"a - b", u"a - b")})
+
+        song["title"] = u"c"
+        self.assertNotEqual(song.revision, revision)
+        self.assertEqual(pat.format(song), u"a - c")
+        self.assertEqual(pat.format_list(song), {(u"a - c", u"a - c")})
+        song.pop("artist")
+        self.assertEqual(pat.format(song), u" - c")
+
+        # returns a new set every time
+        pat.format_list(song).clear()
+        self.assertTrue(pat.format_list(song))
+
+    def test_cache_volatile(self):
+        song = AudioFile(title=u"a", artist=u"b")
+        default = config.RATINGS.default
+        try:
+            for text in [u"<~#rating>", u"<title~~#rating>",
+                         u"<#(rating = 0.25)|x|y>"]:
+                pat = Pattern(text)
+                config.RATINGS.default = 0.25
+                first = pat.format(song)
+                config.RATINGS.default = 0.75
+                self.assertNotEqual(pat.format(song), first, msg=text)
+                self.assertTrue(pat.volatile, msg=text)
+        finally:
+            config.RATINGS.default = default
+
+        result_cache.clear()
+        for text in [u"<~#rating|x|y>", u"<#(lastplayed \\< 1 day)|x|y>"]:
+            pat = Pattern(text)
+            pat.format(song)
+            self.assertFalse(result_cache, msg=text)
+
+        pat = Pattern(u"<artist|<title>>")
+        pat.format(song)
+        self.assertEqual(len(result_cache), 1)
+
+    def test_result_cache(self):
+        cache = ResultCache(2)
+        self.assertNotEqual(cache.new_id(), cache.new_id())
+        cache.set(1, u"a")
+        cache.set(2, u"b")
+        self.assertEqual(cache.get(1), u"a")
+        cache.set(3, u"c")
+        self.assertRaises(KeyError, cache.get, 2)
+        self.assertEqual(cache.get(1), u"a")
+        self.assertEqual(len(cache), 2)
+
 
 class _TFileFromPattern(_TPattern):
     def _create(self, string):
@@ -312,6 +370,16 @@ class _TFileFromPattern(_TPattern):
             assert isinstance(path, fsnative)
             s.failUnlessEqual(len(path), 255)
 
+    def test_format_many(s):
+        songs = [s.a, s.b, s.c, s.e, s.f, s.g, s.h]
+        for text in [u'', u'<title>', u'<tracknumber>. <title>.',
+                     u'~/<artist>/<title>', u'/a/b/<genre>',
+                     u'<~filename>']:
+            pat = s._create(text)
+            s.assertEqual(pat.format_many(songs),
+                          [pat.format(song) for song in songs])
+        s.assertEqual(s._create(u'<title>').format_many([]), [])
+
 
 class TFileFromPattern(_TFileFromPattern):
     def _create(self, string):
@@ -580,3 +648,99 @@ class TPatternFormatList(_TPattern):
     def test_string(s):
         pat = Pattern('display')
         s.assertEqual(pat.format_list(s.a), {("display", "display")})
+
+
+class TPatternCache(TestCase):
+
+    def setUp(self):
+        config.init()
+        self.cache = PatternCache()
+        self.temp = mkdtemp()
+        self.filename = os.path.join(self.temp, "patterns")
+        self.song = AudioFile({"artist": u"A<&>", "title": u"T",
+                               "~#rating": 0.5})
+
+    def tearDown(self):
+        for name in os.listdir(self.temp):
+            os.remove(os.path.join(self.temp, name))
+        os.rmdir(self.temp)
+        config.quit()
+
+    def test_get(self):
+        pat = self.cache.get(u"<artist>", PatternFormatter)
+        self.assertTrue(self.cache.get(u"<artist>", PatternFormatter) is pat)
+        self.assertFalse(self.cache.get(u"<artist>", _XMLFromPattern) is pat)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+        self.assertEqual(len(self.cache), 2)
+
+        self.cache.clear()
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 0))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru(self):
+        cache = self.cache
+        first = cache.get(u"0", PatternFormatter)
+        for i in range(1, cache.SIZE):
+            cache.get(u"%d" % i, PatternFormatter)
+        self.assertTrue(cache.get(u"0", PatternFormatter) is first)
+        cache.get(u"new", PatternFormatter)
+        self.assertEqual(len(cache), cache.SIZE)
+        self.assertTrue(cache.get(u"0", PatternFormatter) is first)
+        misses = cache.misses
+        cache.get(u"1", PatternFormatter)
+        self.assertEqual(cache.misses, misses + 1)
+
+    def test_save_load(self):
+        texts = [u"<artist> - <title>", u"<artist=A\\<&>|yes|no>",
+                 u"<~#rating>", u"<#(rating > 0.2)|x>"]
+        for text in texts:
+            self.cache.get(text, _XMLFromPattern)
+        self.cache.save(self.filename)
+
+        cache = PatternCache()
+        cache.load(self.filename)
+        for text in texts:
+            pat = cache.get(text, _XMLFromPattern)
+            expected = self.cache.get(text, _XMLFromPattern)
+            self.assertEqual(pat.format(self.song),
+                             expected.format(self.song))
+            self.assertEqual(pat.format_list(self.song),
+                             expected.format_list(self.song))
+            self.assertEqual(pat.tags, expected.tags)
+        self.assertEqual(cache.misses, len(texts))
+
+        # other kinds get compiled again
+        pat = cache.get(texts[0], PatternFormatter)
+        self.assertEqual(pat.format(self.song), u"A<&> - T")
+
+    def test_save_unused(self):
+        self.cache.get(u"<artist>", PatternFormatter)
+        self.cache.save(self.filename)
+
+        cache = PatternCache()
+        cache.load(self.filename)
+        cache.save(self.filename)
+        cache = PatternCache()
+        cache.load(self.filename)
+        self.assertEqual(len(cache._loaded), 1)
+
+    def test_load_other_code_version(self):
+        self.cache.get(u"<artist>", PatternFormatter)
+        self.cache.save(self.filename)
+
+        old_version = PatternCompiler.CODE_VERSION
+        PatternCompiler.CODE_VERSION = old_version + 1
+        try:
+            cache = PatternCache()
+            cache.load(self.filename)
+        finally:
+            PatternCompiler.CODE_VERSION = old_version
+        self.assertEqual(len(cache._loaded), 0)
+
+    def test_load_broken(self):
+        with open(self.filename, "wb") as h:
+            h.write(b"nope")
+        self.cache.load(self.filename)
+        self.cache.load(os.path.join(self.temp, "missing"))
+        pat = self.cache.get(u"<title>", PatternFormatter)
+        self.assertEqual(pat.format(self.song), u"T")
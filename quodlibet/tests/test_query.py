@@ -415,6 +415,72 @@ class TQuery(TestCase):
         self.assertEqual(
             q.filter(iter([self.s1, self.s2])), [self.s1, self.s2])
 
+    def test_compile(self):
+        songs = [self.s1, self.s2, self.s3, self.s4, self.s5]
+        queries = [
+            u"", u"piman", u"piman mu", u"!piman", u"|(piman, angstrom)",
+            u"artist=piman", u"artist=!piman", u"title=|(quux, rock)",
+            u"&(#(playcount > 10), piman)", u"#(track = 12)",
+            u"#(12 = track)", u"#(length != 224)", u"#(playcount >= 24)",
+            u"#(skipcount <= 13)", u"#(1 < track < 13)",
+            u"#(lastplayed > 1 day)", u"#(date > 2005-07-19)",
+            u"#(playcount > skipcount)", u"filename=foü", u"~filename=foo",
+            u"mountpoint=öä", u"~people=mu", u"~format=ogg",
+            u"&(artist=piman, |(title=quux, #(length < 100)))",
+            u"title=&(/o/, !/x/)", u"&(!artist=mu, !title=oh)",
+        ]
+        for text in queries:
+            q = Query(text)
+            func = q.compile()
+            for song in songs:
+                self.assertEqual(
+                    func(song), bool(q._match.search(song)), msg=text)
+
+    def test_volatile(self):
+        for text in [u"foo", u"", u"#(track > 2)", u"!artist=foo",
+                     u"&(#(date > 2000), |(foo, bar))", u"~people=foo"]:
+            self.assertFalse(Query(text)._volatile(), msg=text)
+        for text in [u"#(lastplayed > 1 day)", u"#(rating > 0.5)",
+                     u"#(added > today)", u"&(foo, !#(2 < lastplayed))",
+                     u"~rating=foo", u"|(foo, #(now - 1 < mtime))"]:
+            self.assertTrue(Query(text)._volatile(), msg=text)
+
+    def test_reorder(self):
+        q = Query(u"&(~people=piman, artist=/pi/, title=\"Quuxly\", "
+                  u"#(playcount > 10))")
+        res = q._match.res
+        self.assertTrue(isinstance(res[0].res[0], match.Numcmp))
+        self.assertEqual(res[1]._names, ["title"])
+        self.assertEqual(res[2]._names, ["artist"])
+        self.assertEqual(res[3]._names, [])
+
+        q = Query(u"|(title=/x/, #(playcount > 10))")
+        self.assertTrue(isinstance(q._match.res[0].res[0], match.Numcmp))
+
+    def test_learn(self):
+        songs = [self.s1, self.s2, self.s3, self.s4, self.s5]
+        # artist matches more songs, title decides more often
+        q = Query(u"&(artist=/m/, title=/o/)")
+        expected = q.filter(songs)
+        q.learn(songs)
+        self.assertTrue(q._learned)
+        self.assertEqual(q._match.res[0]._names, ["title"])
+        self.assertEqual(q.filter(songs), expected)
+
+        q = Query(u"|(title=/o/, artist=/m/)")
+        q.learn(songs)
+        self.assertEqual(q._match.res[0]._names, ["artist"])
+
+    def test_learn_filter(self):
+        songs = [self.s1, self.s2, self.s3] * 5
+        q = Query(u"&(title=/o/, artist=/m/)")
+        q.LEARN_SAMPLE = 1
+        self.assertEqual(len(q.filter(songs)), 5)
+        self.assertTrue(q._learned)
+        q = Query(u"&(title=/o/, artist=/m/)")
+        q.filter(iter(songs))
+        self.assertFalse(q._learned)
+
     def test_match_all(self):
         self.failUnless(Query.match_all(""))
         self.failUnless(Query.match_all("    "))
@@ -3,6 +3,7 @@
 # it under the terms of the GNU General Public License version 2 as
 # published by the Free Software Foundation
 
+import gc
 import shutil
 import os
 from collections import defaultdict
@@ -15,7 +16,7 @@ from tests import TestCase, mkdtemp
 from quodlibet.formats import AudioFile as Fakesong
 from quodlibet.formats._audio import NUMERIC_ZERO_DEFAULT, PEOPLE
 from quodlibet.util.collection import Album, Playlist, avg, bayesian_average, \
-    FileBackedPlaylist
+    FileBackedPlaylist, _aggregates
 from quodlibet.library.libraries import FileLibrary
 from quodlibet.util import format_rating
 from quodlibet.compat import long
@@ -257,6 +258,136 @@ class TAlbum(TestCase):
         s.failUnlessEqual(album.comma("c"), "cc3, cc1")
         s.failUnlessEqual(album.comma("~c~b"), "cc3, cc1 - bb1, bb4")
 
+    def test_finalize_incremental(self):
+        keys = ["~#length", "~#length:avg", "~#length:max", "~#added:min",
+                "~#rating", "~#bitrate", "~#discs", "~#tracks", "~people",
+                "~peoplesort", "artist", "~length", "~filename", "date"]
+
+        def check(album):
+            fresh = Album(songs[0])
+            fresh.songs = set(songs)
+            for key in keys:
+                value = album(key)
+                if isinstance(value, float):
+                    # the order of summing can differ
+                    self.assertAlmostEqual(value, fresh(key), msg=key)
+                else:
+                    self.assertEqual(value, fresh(key), msg=key)
+
+        songs = [Fakesong(dict(s)) for s in NUMERIC_SONGS]
+        songs[0]["artist"] = u"foo\nbar"
+        songs[1]["artist"] = u"bar"
+        songs[1]["performer"] = u"foo"
+        album = Album(songs[0])
+        album._cache_size = len(keys)
+        album.songs = set(songs)
+        check(album)
+
+        new = Fakesong({"~#length": 100, "~#added": 1, "artist": u"foo",
+                        "discnumber": u"2", "~#bitrate": 100})
+        songs.append(new)
+        album.songs.add(new)
+        album.finalize(added=[new])
+        check(album)
+
+        songs[0]["~#length"] = 20
+        songs[0]["artist"] = u"baz"
+        del songs[2]["discnumber"]
+        album.finalize(changed=songs[:3])
+        check(album)
+
+        removed = songs.pop(1)
+        album.songs.remove(removed)
+        album.finalize(removed=[removed])
+        check(album)
+
+    def test_aggregate_budget(self):
+        budget = _aggregates.budget
+        _aggregates.budget = 4
+        try:
+            first = Album(NUMERIC_SONGS[0])
+            first.songs = set(NUMERIC_SONGS)
+            second = Album(NUMERIC_SONGS[0])
+            second.songs = set(NUMERIC_SONGS)
+
+            self.assertEqual(first("~#length"), 12)
+            self.assertEqual(len(first._Collection__cache), 1)
+            self.assertEqual(second("~#length"), 12)
+            self.assertFalse(first._Collection__cache)
+            self.assertEqual(len(second._Collection__cache), 1)
+            self.assertTrue(_aggregates._size <= 4)
+
+            self.assertEqual(first("~#length"), 12)
+            self.assertFalse(second._Collection__cache)
+            first.finalize()
+            self.assertEqual(_aggregates._size, 0)
+        finally:
+            _aggregates.budget = budget
+
+    def test_aggregate_resize(self):
+        songs = [Fakesong(dict(s)) for s in NUMERIC_SONGS]
+        album = Album(songs[0])
+        album.songs = set(songs)
+        size = _aggregates._size
+        album("~#length")
+        self.assertEqual(_aggregates._size, size + len(songs))
+
+        new = Fakesong({"~#length": 100})
+        album.songs.add(new)
+        album.finalize(added=[new])
+        self.assertEqual(_aggregates._size, size + len(songs) + 1)
+
+        album.songs.difference_update(songs)
+        album.finalize(removed=songs)
+        self.assertEqual(_aggregates._size, size + 1)
+        self.assertEqual(album("~#length"), 100)
+
+        album.finalize()
+        self.assertEqual(_aggregates._size, size)
+
+    def test_aggregate_resize_budget(self):
+        budget = _aggregates.budget
+        _aggregates.budget = len(NUMERIC_SONGS) + 1
+        try:
+            first = Album(NUMERIC_SONGS[0])
+            first.songs = set(NUMERIC_SONGS)
+            second = Album(NUMERIC_SONGS[0])
+            second.songs = set(NUMERIC_SONGS[:1])
+            second("~#length")
+            first("~#length")
+
+            second.songs = set(NUMERIC_SONGS)
+            second.finalize(added=NUMERIC_SONGS[1:])
+            self.assertFalse(first._Collection__cache)
+            self.assertEqual(len(second._Collection__cache), 1)
+            self.assertTrue(_aggregates._size <= _aggregates.budget)
+            second.finalize()
+        finally:
+            _aggregates.budget = budget
+
+    def test_aggregate_collection_gone(self):
+        size, entries = _aggregates._size, len(_aggregates)
+        album = Album(NUMERIC_SONGS[0])
+        album.songs = set(NUMERIC_SONGS)
+        album("~#length")
+        album("~#added")
+        self.assertEqual(len(_aggregates), entries + 2)
+        del album
+        gc.collect()
+        self.assertEqual(len(_aggregates), entries)
+        self.assertEqual(_aggregates._size, size)
+
+    def test_cache_size(self):
+        album = Album(NUMERIC_SONGS[0])
+        album.songs = set(NUMERIC_SONGS)
+        album._cache_size = 2
+        album("~#length")
+        album("~#added")
+        album("~#length")
+        album("~#rating")
+        self.assertEqual(list(album._Collection__cache),
+                         ["~#length:sum", "~#rating:bav"])
+
     def tearDown(self):
         config.quit()
 
@@ -12,6 +12,8 @@ from senf import fsnative, bytes2fsn
 
 from quodlibet.formats import AudioFile
 from quodlibet.util.cover.manager import CoverManager
+from quodlibet.util.cover import built_in
+from quodlibet.util.cover.index import cover_index
 from quodlibet.util.path import normalize_path, path_equal
 from quodlibet.compat import text_type
 
@@ -30,6 +32,7 @@ bar_2_1 = AudioFile({
 class TCoverManager(TestCase):
 
     def setUp(self):
+        cover_index.clear()
         self.manager = CoverManager()
 
         self.dir = mkdtemp()
@@ -46,6 +49,7 @@ class TCoverManager(TestCase):
 
     def tearDown(self):
         shutil.rmtree(self.dir)
+        cover_index.clear()
 
     def _find_cover(self, song):
         return self.manager.get_cover(song)
@@ -154,6 +158,41 @@ class TCoverManager(TestCase):
             assert path_equal(
                 actual, f, "\"%s\" should trump \"%s\"" % (f, actual))
 
+    def test_index(self):
+        self.failIf(self._find_cover(self.song))
+        self.assertEqual(len(cover_index), 1)
+        os.mkdir(self.full_path("covers"))
+        f = self.add_file(os.path.join("covers", "front.jpg"))
+        self.assertEqual(self._find_cover(self.song).name, f)
+        f = self.add_file(os.path.join("covers", "front_cover.jpg"))
+        self.assertEqual(self._find_cover(self.song).name, f)
+        self.assertEqual(len(cover_index), 1)
+
+        self.manager.cover_changed([self.song])
+        self.assertEqual(len(cover_index), 0)
+
+    def test_unreadable(self):
+        os.mkdir(self.full_path("covers"))
+        best = self.add_file(os.path.join("covers", "front_cover.jpg"))
+        other = self.add_file(os.path.join("covers", "front.jpg"))
+
+        def fake_open(path, *args):
+            if path == best:
+                raise IOError
+            return open(path, *args)
+
+        built_in.open = fake_open
+        try:
+            for i in range(2):
+                cover = self._find_cover(self.song)
+                self.assertEqual(cover.name, other)
+                cover.close()
+        finally:
+            del built_in.open
+        cover = self._find_cover(self.song)
+        self.assertEqual(cover.name, other)
+        cover.close()
+
     def test_get_thumbnail(self):
         self.assertTrue(self.manager.get_pixbuf(self.song, 10, 10) is None)
         self.assertTrue(
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+import os
+import shutil
+
+from tests import TestCase, mkdtemp
+
+from quodlibet.util.cover.cache import PixbufCache
+from quodlibet.util.path import get_temp_cover_file
+
+
+class FakePixbuf(object):
+
+    def __init__(self, size):
+        self.size = size
+
+    def get_rowstride(self):
+        return self.size
+
+    def get_height(self):
+        return 1
+
+
+class TPixbufCache(TestCase):
+
+    def setUp(self):
+        self.cache = PixbufCache()
+        self.dir = mkdtemp()
+        self.path = os.path.join(self.dir, "cover.jpg")
+        with open(self.path, "wb") as h:
+            h.write(b"nope")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_get_key(self):
+        with open(self.path, "rb") as h:
+            key = self.cache.get_key(h, (10, 20))
+        self.assertTrue(key)
+        self.assertEqual(key, self.cache.get_key(open(self.path), (10, 20)))
+        self.assertNotEqual(key, self.cache.get_key(open(self.path), (10, 10)))
+
+        os.utime(self.path, (0, 42))
+        with open(self.path, "rb") as h:
+            self.assertNotEqual(key, self.cache.get_key(h, (10, 20)))
+
+    def test_get_key_uncached(self):
+        fileobj = get_temp_cover_file(b"nope")
+        self.assertTrue(self.cache.get_key(fileobj, (10, 10)) is None)
+        fileobj.close()
+
+        class NoName(object):
+            pass
+
+        self.assertTrue(self.cache.get_key(NoName(), (10, 10)) is None)
+
+    def test_get_set(self):
+        pixbuf = FakePixbuf(10)
+        self.assertTrue(self.cache.get("a") is None)
+        self.cache.set("a", pixbuf)
+        self.assertTrue(self.cache.get("a") is pixbuf)
+        self.assertEqual(self.cache.bytes, 10)
+        self.cache.set("a", FakePixbuf(20))
+        self.assertEqual(self.cache.bytes, 20)
+        self.assertEqual(len(self.cache), 1)
+
+        self.cache.clear()
+        self.assertTrue(self.cache.get("a") is None)
+        self.assertEqual(self.cache.bytes, 0)
+
+    def test_max_bytes(self):
+        self.cache.MAX_BYTES = 30
+        for key in "abc":
+            self.cache.set(key, FakePixbuf(10))
+        self.cache.get("a")
+        self.cache.set("d", FakePixbuf(10))
+        self.assertTrue(self.cache.get("b") is None)
+        self.assertTrue(self.cache.get("a") is not None)
+        self.assertEqual(self.cache.bytes, 30)
+
+        self.cache.set("e", FakePixbuf(31))
+        self.assertTrue(self.cache.get("e") is None)
+        self.assertEqual(len(self.cache), 3)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+import os
+import shutil
+
+from senf import fsnative
+
+from tests import TestCase
+
+from quodlibet.formats import AudioFile, EmbeddedImage
+from quodlibet.util.cover.built_in import EmbeddedCover
+from quodlibet.util.cover.embedded import get_cache_dir, save_image
+from quodlibet.util.cover.index import cover_index
+from quodlibet.util.path import get_temp_cover_file
+
+
+class TEmbeddedCache(TestCase):
+
+    def tearDown(self):
+        cover_index.clear()
+        if os.path.exists(get_cache_dir()):
+            shutil.rmtree(get_cache_dir())
+
+    def _image(self, data):
+        return EmbeddedImage(get_temp_cover_file(data), "image/png")
+
+    def test_save_image(self):
+        path = save_image(self._image(b"foo"))
+        self.assertTrue(path.startswith(get_cache_dir()))
+        with open(path, "rb") as h:
+            self.assertEqual(h.read(), b"foo")
+
+    def test_deduplicate(self):
+        path = save_image(self._image(b"foo"))
+        self.assertEqual(save_image(self._image(b"foo")), path)
+        self.assertNotEqual(save_image(self._image(b"bar")), path)
+        self.assertEqual(len(os.listdir(get_cache_dir())), 2)
+
+    def test_embedded_cover(self):
+        calls = []
+
+        class ImageSong(AudioFile):
+
+            def get_primary_image(song):
+                calls.append(song)
+                return self._image(b"foo")
+
+        songs = [ImageSong({"~filename": fsnative(f), "~picture": "y",
+                            "~#mtime": 1})
+                 for f in [u"/dev/null/a", u"/dev/null/b"]]
+        paths = []
+        for song in songs + songs:
+            with EmbeddedCover(song).cover as h:
+                paths.append(h.name)
+        self.assertEqual(len(set(paths)), 1)
+        self.assertEqual(calls, songs)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+import os
+import shutil
+
+from tests import TestCase, mkdtemp
+
+from quodlibet.formats import AudioFile
+from quodlibet.util.cover.index import CoverIndex
+from quodlibet.util.path import mtime
+
+
+class TCoverIndex(TestCase):
+
+    def setUp(self):
+        self.index = CoverIndex()
+        self.temp = mkdtemp()
+        self.dir = os.path.join(self.temp, "album")
+        os.mkdir(self.dir)
+        self.path = os.path.join(self.dir, "cover.jpg")
+        self.tags = ("", (u"album",))
+        self.dirs = [(self.dir, mtime(self.dir))]
+
+    def tearDown(self):
+        shutil.rmtree(self.temp)
+
+    def test_get_set(self):
+        self.assertRaises(KeyError, self.index.get, self.dir, (), self.tags)
+        self.index.set(self.dir, (), self.tags, self.path, self.dirs)
+        self.assertEqual(self.index.get(self.dir, (), self.tags), self.path)
+        self.assertTrue(self.index.dirty)
+        self.assertRaises(
+            KeyError, self.index.get, self.dir, (), ("", (u"other",)))
+        self.index.set(self.dir, (), self.tags, None, self.dirs)
+        self.assertTrue(self.index.get(self.dir, (), self.tags) is None)
+        self.assertEqual(len(self.index), 1)
+
+        self.index.clear()
+        self.assertEqual(len(self.index), 0)
+
+    def test_outdated(self):
+        self.index.set(self.dir, (), self.tags, self.path, self.dirs)
+        os.utime(self.dir, (0, 42))
+        self.assertRaises(KeyError, self.index.get, self.dir, (), self.tags)
+
+    def test_forget(self):
+        song = AudioFile({
+            "~filename": os.path.join(self.dir, "asong.ogg"),
+            "album": u"album",
+        })
+        self.index.set(
+            self.dir, song.album_key, self.tags, self.path, self.dirs)
+        self.index.forget([AudioFile({"~filename": self.path})])
+        self.assertEqual(len(self.index), 1)
+        self.index.forget([song])
+        self.assertEqual(len(self.index), 0)
+
+    def test_embedded(self):
+        song = AudioFile({"~filename": self.path, "~#mtime": 1})
+        self.assertRaises(KeyError, self.index.get_embedded, song)
+        self.index.set_embedded(song, self.path)
+        self.assertEqual(self.index.get_embedded(song), self.path)
+        self.index.set_embedded(song, None)
+        self.assertTrue(self.index.get_embedded(song) is None)
+        song["~#mtime"] = 2
+        self.assertRaises(KeyError, self.index.get_embedded, song)
+
+        self.index.forget([song])
+        self.assertEqual(len(self.index), 0)
+
+    def test_save_load(self):
+        filename = os.path.join(self.temp, "index")
+        self.index.set(self.dir, (u"a",), self.tags, self.path, self.dirs)
+        song = AudioFile({"~filename": self.path, "~#mtime": 1})
+        self.index.set_embedded(song, self.path)
+        self.index.save(filename)
+        self.assertFalse(self.index.dirty)
+
+        index = CoverIndex()
+        index.load(filename)
+        self.assertEqual(index.get(self.dir, (u"a",), self.tags), self.path)
+        self.assertEqual(index.get_embedded(song), self.path)
+
+    def test_load_broken(self):
+        filename = os.path.join(self.temp, "index")
+        with open(filename, "wb") as h:
+            h.write(b"nope")
+        self.index.set(self.dir, (), self.tags, self.path, self.dirs)
+        self.index.load(filename)
+        self.index.load(os.path.join(self.temp, "missing"))
+        self.assertEqual(len(self.index), 1)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation
+
+import threading
+
+from tests import TestCase
+
+from gi.repository import Gtk
+
+from quodlibet.util.cover.loader import CoverLoader
+
+
+class TCoverLoader(TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.block = threading.Event()
+        self.finished = threading.Event()
+        self.expected = 0
+        self.loader = CoverLoader(self._load, workers=1)
+
+    def tearDown(self):
+        self.block.set()
+        self.loader.destroy()
+
+    def _load(self, name):
+        self.block.wait()
+        self.calls.append(name)
+        if len(self.calls) == self.expected:
+            self.finished.set()
+        return name.upper()
+
+    def _run(self, expected):
+        self.expected = expected
+        self.block.set()
+        self.assertTrue(self.finished.wait(10))
+
+    def test_priority(self):
+        self.loader.load(("first",), lambda r: None)
+        self.loader.load(("a",), lambda r: None, priority=5)
+        self.loader.load(("b",), lambda r: None, priority=1)
+        c = self.loader.load(("c",), lambda r: None, priority=3)
+        c.set_priority(0)
+        self._run(4)
+        # the first one might have been taken before the others got added
+        self.assertEqual(self.calls[-3:], ["c", "b", "a"])
+        self.assertEqual(len(self.loader), 0)
+
+    def test_cancel(self):
+        cancelled = []
+        self.loader.load(("first",), lambda r: None)
+        a = self.loader.load(("a",), lambda r: None,
+                             cancelled=lambda: cancelled.append("a"))
+        self.loader.load(("b",), lambda r: None)
+        a.cancel()
+        a.cancel()
+        self._run(2)
+        self.assertEqual(self.calls, ["first", "b"])
+        self.assertEqual(cancelled, ["a"])
+
+    def test_max_pending(self):
+        cancelled = []
+        self.loader.MAX_PENDING = 2
+        requests = [
+            self.loader.load((n,), lambda r: None, priority=p,
+                             cancelled=lambda n=n: cancelled.append(n))
+            for n, p in [("a", 1), ("b", 3), ("c", 2)]]
+        self.assertTrue(len(self.loader) <= 2)
+        self.assertEqual(cancelled, ["b"])
+        self.assertTrue(requests[1].is_cancelled())
+
+    def test_callback(self):
+        results = []
+        self.loader.load(("a",), results.append)
+        self._run(1)
+        Gtk.main_iteration()
+        while Gtk.events_pending():
+            Gtk.main_iteration()
+        self.assertEqual(results, ["A"])
+
+    def test_error(self):
+        results = []
+
+        def load(name):
+            raise ValueError(name)
+
+        loader = CoverLoader(load, workers=1)
+        try:
+            loader.load(("a",), results.append)
+            for i in range(100):
+                Gtk.main_iteration_do(False)
+                if results:
+                    break
+                self.finished.wait(0.05)
+        finally:
+            loader.destroy()
+        self.assertEqual(results, [None])
+
+    def test_destroy(self):
+        cancelled = []
+        self.loader.load(("a",), lambda r: None)
+        self.loader.load(("b",), lambda r: None,
+                         cancelled=lambda: cancelled.append("b"))
+        self.loader.destroy()
+        self.assertEqual(cancelled, ["b"])
+        self.assertEqual(len(self.loader), 0)
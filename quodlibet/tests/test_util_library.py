@@ -9,9 +9,14 @@ import os
 
 from senf import fsnative, expanduser
 
+from quodlibet import app
 from quodlibet import config
+from quodlibet.formats import AudioFile
+from quodlibet.qltk.notif import TaskController
+from quodlibet.util import library
 from quodlibet.util.library import split_scan_dirs, set_scan_dirs, \
-    get_exclude_dirs, get_scan_dirs
+    get_exclude_dirs, get_scan_dirs, get_scan_workers, \
+    iter_create_thumbnails
 from quodlibet.util import is_windows
 from quodlibet.util.path import get_home_dir, unexpand
 
@@ -49,6 +54,12 @@ class Tlibrary_utils(TestCase):
 
         assert all([isinstance(p, fsnative) for p in get_exclude_dirs()])
 
+    def test_get_scan_workers(self):
+        config.set('library', 'scan_workers', 3)
+        self.assertEqual(get_scan_workers(), 3)
+        config.set('library', 'scan_workers', 0)
+        self.assertTrue(get_scan_workers() >= 1)
+
     def test_get_scan_dirs(self):
         some_path = os.path.join(unexpand(get_home_dir()), "foo")
         config.set('settings', 'scan', some_path)
@@ -80,3 +91,56 @@ class Tset_scan_dirs(TestCase):
         set_scan_dirs([STANDARD_PATH, GVFS_PATH])
         expected = GVFS_PATH if is_windows() else GVFS_PATH_ESCAPED
         self.assertEqual(self.scan_dirs, "%s:%s" % (STANDARD_PATH, expected))
+
+
+class FakeCoverManager(object):
+
+    class Cover(object):
+
+        def __init__(self, name):
+            self.name = name
+
+        def close(self):
+            pass
+
+    def get_cover_many(self, songs):
+        album = songs[0]("album")
+        if album:
+            return self.Cover(fsnative(u"/covers/%s.jpg" % album))
+
+
+class Titer_create_thumbnails(TestCase):
+
+    def setUp(self):
+        self.created = set()
+        self._orig = (app.cover_manager, library.create_thumbnail)
+        app.cover_manager = FakeCoverManager()
+        library.create_thumbnail = self._create_thumbnail
+
+    def tearDown(self):
+        app.cover_manager, library.create_thumbnail = self._orig
+
+    def _create_thumbnail(self, path, size):
+        if (path, size) in self.created:
+            return False
+        self.created.add((path, size))
+        return True
+
+    def _run(self, songs):
+        progress = []
+        for done, total, created in iter_create_thumbnails(songs, 2):
+            tasks = TaskController.default_instance.active_tasks
+            progress.extend(t.frac for t in tasks)
+        self.assertFalse(TaskController.default_instance.active_tasks)
+        self.assertEqual(done, total)
+        self.assertEqual(progress[-1], 1.0)
+        self.assertEqual(progress, sorted(progress))
+        return total, created
+
+    def test_main(self):
+        songs = [AudioFile({"~filename": fsnative(u"/%d.ogg" % i),
+                            "album": u"a%d" % (i % 3)}) for i in range(9)]
+        songs.append(AudioFile({"~filename": fsnative(u"/none.ogg")}))
+        self.assertEqual(self._run(songs), (4, 6))
+        self.assertEqual(len(self.created), 6)
+        self.assertEqual(self._run(songs), (4, 0))
@@ -9,7 +9,7 @@ from tests import TestCase
 
 from quodlibet.compat import cBytesIO
 from quodlibet.util.picklehelper import pickle_load, pickle_loads, \
-    pickle_dumps, pickle_dump, PicklingError, UnpicklingError
+    pickle_dumps, pickle_dump, no_globals, PicklingError, UnpicklingError
 
 
 class A(dict):
@@ -46,6 +46,13 @@ class Tpickle_load(TestCase):
         value = pickle_loads(pickle_dumps(A()), lookup_func)
         assert isinstance(value, B)
 
+    def test_no_globals(self):
+        data = ({u"a": (1, 2.0)}, [u"b", None])
+        assert pickle_loads(pickle_dumps(data, 2), no_globals) == data
+
+        with self.assertRaises(UnpicklingError):
+            pickle_loads(pickle_dumps(A(), 2), no_globals)
+
     def test_pickle_dumps(self):
         v = [u"foo", b"bar", 42]
         for protocol in [0, 1, 2]:
@@ -8,11 +8,12 @@
 import threading
 
 from tests import TestCase
+from .helper import capture_output
 
 from gi.repository import Gtk
 
 from quodlibet.util.thread import call_async, call_async_background, \
-    Cancellable, terminate_all
+    Cancellable, terminate_all, map_threaded
 
 
 class Tcall_async(TestCase):
@@ -61,3 +62,30 @@ class Tcall_async(TestCase):
 
     def test_terminate_all(self):
         terminate_all()
+
+
+class Tmap_threaded(TestCase):
+
+    def test_order(self):
+        def load(name):
+            if name % 3:
+                return name
+        results = []
+        for items in map_threaded(load, range(100), 4):
+            results.extend(items)
+        self.assertEqual(
+            results, [(i if i % 3 else None) for i in range(100)])
+
+    def test_error(self):
+        def load(name):
+            raise Exception
+
+        with capture_output():
+            results = [i for items in map_threaded(load, range(10), 2)
+                       for i in items]
+        self.assertEqual(results, [None] * 10)
+
+    def test_close(self):
+        gen = map_threaded(lambda x: x, range(1000), 2)
+        next(gen)
+        gen.close()
@@ -4,12 +4,14 @@
 # published by the Free Software Foundation
 
 from quodlibet.util.path import mtime
-from tests import TestCase, NamedTemporaryFile, get_data_path
+from tests import TestCase, NamedTemporaryFile, get_data_path, mkdtemp
 
 from gi.repository import GdkPixbuf
 from senf import fsn2uri, fsnative
 
 import os
+import shutil
+import tempfile
 
 try:
     import hashlib as hash
@@ -87,6 +89,45 @@ class TThumb(TestCase):
         thumb = thumbnails.get_thumbnail(self.filename, (50, 60))
         self.assertTrue(thumb)
 
+    def test_create_thumbnail(self):
+        size = thumbnails.ThumbSize.NORMAL
+        self.assertTrue(thumbnails.create_thumbnail(self.filename, size))
+        path = thumbnails.get_cache_info(self.filename, (size, size))[0]
+        self.assertTrue(os.path.isfile(path))
+        self.assertFalse(thumbnails.create_thumbnail(self.filename, size))
+
+    def test_create_thumbnail_temp(self):
+        fn = NamedTemporaryFile()
+        with open(self.filename, "rb") as h:
+            fn.write(h.read())
+        fn.flush()
+        size = thumbnails.ThumbSize.NORMAL
+        self.assertFalse(thumbnails.create_thumbnail(fn.name, size))
+        fn.close()
+
+    def test_create_thumbnail_small(self):
+        temp = mkdtemp()
+        path = os.path.join(temp, fsnative(u"small.png"))
+        self.small.savev(path, "png", [], [])
+
+        class FakeTempfile(object):
+
+            @staticmethod
+            def gettempdir():
+                return fsnative(u"/nope")
+
+        size = thumbnails.ThumbSize.NORMAL
+        thumbnails.tempfile = FakeTempfile
+        try:
+            for i in range(2):
+                self.assertFalse(thumbnails.create_thumbnail(path, size))
+        finally:
+            thumbnails.tempfile = tempfile
+            shutil.rmtree(temp)
+
+        thumb_path = thumbnails.get_cache_info(path, (size, size))[0]
+        self.assertFalse(os.path.exists(thumb_path))
+
     def test_thumb(s):
         thumb = thumbnails.get_thumbnail(s.filename, (50, 60))
 